@@ -1,12 +1,16 @@
 import os
+import time
+import zlib
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory
 from flask_cors import CORS
 from dotenv import load_dotenv
 
-from db import fetch_all, fetch_one, execute, execute_returning_one
+from db import fetch_all, fetch_one, execute, execute_returning_one, DB_POOL_MAX
+from cache import cached_json, invalidate as invalidate_cache, CACHE
 from psycopg2 import errors
 
 load_dotenv()
@@ -113,6 +117,22 @@ def health():
     return jsonify({"status": "ok"})
 
 
+# ----------------------------
+# Admin: Result cache
+# ----------------------------
+@app.get("/admin/cache")
+@require_admin
+def admin_cache_stats():
+    return jsonify(CACHE.stats())
+
+
+@app.post("/admin/cache/invalidate")
+@require_admin
+def admin_cache_invalidate():
+    invalidate_cache()
+    return jsonify({"message": "Cache cleared"})
+
+
 # ----------------------------
 # Admin: Users
 # ----------------------------
@@ -138,6 +158,7 @@ def admin_users():
 # ----------------------------
 @app.get("/admin/overview")
 @require_admin
+@cached_json("sessions", "crashes")
 def admin_overview():
     since = datetime.now() - timedelta(days=7)
 
@@ -234,34 +255,88 @@ def admin_delete_session(session_id: int):
     n = execute("DELETE FROM sessions WHERE session_id = %s;", [session_id])
     if n == 0:
         return jsonify({"error": "Not found"}), 404
+    invalidate_cache()
     return jsonify({"message": "Session deleted"})
 
 
 # ----------------------------
 # Admin: Logs
 # ----------------------------
+LOG_PREVIEW_CHARS = 200
+
+
+def gunzip_head(content, limit):
+    """First `limit` bytes of a (possibly cut off) gzip chunk."""
+    try:
+        return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(bytes(content), limit)
+    except zlib.error:
+        return b""
+
+
 @app.get("/admin/logs")
 @require_admin
 def admin_logs():
+    """
+    Log metadata with a short preview; the content itself comes from
+    /admin/logs/<log_id>/content. Logs uploaded in chunks keep an empty
+    log_content, so their preview is read from the start of the first chunk.
+    """
     user = request.args.get("user", "").strip()
     limit = int(request.args.get("limit", "200"))
 
     where = ""
-    params = []
+    params = [LOG_PREVIEW_CHARS]
     if user:
-        where = "WHERE user_id=%s"
+        where = "WHERE l.user_id=%s"
         params.append(user)
 
     sql = f"""
-    SELECT log_id, user_id, log_timestamp, log_content
-    FROM logs
+    SELECT l.log_id, l.user_id, l.log_timestamp,
+           COALESCE(l.log_size, OCTET_LENGTH(l.log_content)) AS log_size,
+           LEFT(l.log_content, %s) AS log_preview,
+           SUBSTRING(c.content FROM 1 FOR 4096) AS first_chunk
+    FROM logs l
+    LEFT JOIN log_chunks c
+      ON l.upload_key IS NOT NULL AND c.log_id = l.log_id AND c.byte_offset = 0
     {where}
-    ORDER BY log_timestamp DESC
+    ORDER BY l.log_timestamp DESC
     LIMIT %s;
     """
     params.append(limit)
 
-    return jsonify(make_json_safe(fetch_all(sql, params)))
+    rows = fetch_all(sql, params)
+    for r in rows:
+        first = r.pop("first_chunk")
+        if first is not None:
+            head = gunzip_head(first, LOG_PREVIEW_CHARS * 4)
+            r["log_preview"] = head.decode("utf-8", errors="replace")[:LOG_PREVIEW_CHARS]
+    return jsonify(make_json_safe(rows))
+
+
+@app.get("/admin/logs/<int:log_id>/content")
+@require_admin
+def admin_log_content(log_id):
+    """Whole log as text, streamed one stored chunk at a time."""
+    log = fetch_one("SELECT upload_key, log_content FROM logs WHERE log_id=%s", [log_id])
+    if not log:
+        return jsonify({"error": "Not found"}), 404
+    if log["upload_key"] is None:
+        return Response(log["log_content"] or "", mimetype="text/plain")
+
+    def chunks():
+        offset = 0
+        while True:
+            c = fetch_one("""
+                SELECT byte_offset, byte_length, content FROM log_chunks
+                WHERE log_id=%s AND byte_offset >= %s
+                ORDER BY byte_offset LIMIT 1
+            """, [log_id, offset])
+            if not c:
+                return
+            yield zlib.decompress(bytes(c["content"]), 16 + zlib.MAX_WBITS)
+            offset = c["byte_offset"] + c["byte_length"]
+
+    return Response(chunks(), mimetype="text/plain")
 
 
 # ----------------------------
@@ -314,10 +389,52 @@ def admin_crashes():
 
 @app.get("/admin/crashes/summary")
 @require_admin
+@cached_json("crashes")
 def admin_crashes_summary():
     user = request.args.get("user", "").strip()
     limit = int(request.args.get("limit", "50"))
 
+    # crash_groups / crash_group_daily are maintained by the tracker API at
+    # insert time (see TrackerTool/crash_groups.py): one row per signature
+    if user:
+        sql = """
+        SELECT
+          CONCAT(g.label, ' [', g.signature, ']') AS signature,
+          g.signature AS fingerprint,
+          SUM(d.crashes)::int AS count,
+          MAX(d.last_seen) AS last_seen,
+          LEFT(g.example, 120) AS example
+        FROM crash_group_daily d
+        JOIN crash_groups g USING (signature)
+        WHERE d.user_id = %s
+        GROUP BY g.signature
+        ORDER BY count DESC, last_seen DESC
+        LIMIT %s;
+        """
+        params = [user, limit]
+    else:
+        sql = """
+        SELECT
+          CONCAT(label, ' [', signature, ']') AS signature,
+          signature AS fingerprint,
+          crash_count::int AS count,
+          last_seen,
+          LEFT(example, 120) AS example
+        FROM crash_groups
+        ORDER BY crash_count DESC, last_seen DESC
+        LIMIT %s;
+        """
+        params = [limit]
+
+    try:
+        rows = fetch_all(sql, params)
+    except errors.UndefinedTable:
+        # tracker API hasn't created the crash index yet
+        rows = legacy_crash_summary(user, limit)
+    return jsonify(make_json_safe(rows))
+
+
+def legacy_crash_summary(user, limit):
     where = ""
     params = []
     if user:
@@ -339,17 +456,15 @@ def admin_crashes_summary():
     LIMIT %s;
     """
     params.append(limit)
-
-    return jsonify(make_json_safe(fetch_all(sql, params)))
+    return fetch_all(sql, params)
 
 
 # ----------------------------
-# Charts: Sessions
+# Chart queries
 # ----------------------------
-@app.get("/admin/charts/sessions_per_user")
-@require_admin
-def chart_sessions_per_user():
-    dt_from, dt_to = get_from_to()
+# Each takes the (dt_from, dt_to) range and returns JSON-ready rows, so the
+# per-chart endpoints and /admin/dashboard share the same SQL.
+def sessions_per_user_data(dt_from, dt_to):
     sql = """
     SELECT user_id, COUNT(*)::int AS sessions
     FROM sessions
@@ -357,13 +472,9 @@ def chart_sessions_per_user():
     GROUP BY user_id
     ORDER BY sessions DESC;
     """
-    return jsonify(make_json_safe(fetch_all(sql, [dt_from, dt_to])))
-
-@app.get("/admin/charts/session_duration_daily")
-@require_admin
-def chart_session_duration_daily():
-    dt_from, dt_to = get_from_to()
+    return fetch_all(sql, [dt_from, dt_to])
 
+def session_duration_daily_data(dt_from, dt_to):
     # Works if total_duration is INTERVAL
     sql = """
     SELECT
@@ -374,12 +485,9 @@ def chart_session_duration_daily():
     GROUP BY 1
     ORDER BY 1;
     """
-    return jsonify(make_json_safe(fetch_all(sql, [dt_from, dt_to])))
+    return fetch_all(sql, [dt_from, dt_to])
 
-@app.get("/admin/charts/activity_hourly")
-@require_admin
-def chart_activity_hourly():
-    dt_from, dt_to = get_from_to()
+def activity_hourly_data(dt_from, dt_to):
     sql = """
     SELECT
       EXTRACT(HOUR FROM session_start)::int AS hour,
@@ -389,12 +497,9 @@ def chart_activity_hourly():
     GROUP BY 1
     ORDER BY 1;
     """
-    return jsonify(make_json_safe(fetch_all(sql, [dt_from, dt_to])))
+    return fetch_all(sql, [dt_from, dt_to])
 
-@app.get("/admin/charts/daily_users")
-@require_admin
-def chart_daily_users():
-    dt_from, dt_to = get_from_to()
+def daily_users_data(dt_from, dt_to):
     sql = """
     SELECT
       to_char(date_trunc('day', session_start), 'YYYY-MM-DD') AS day,
@@ -404,13 +509,9 @@ def chart_daily_users():
     GROUP BY 1
     ORDER BY 1;
     """
-    return jsonify(make_json_safe(fetch_all(sql, [dt_from, dt_to])))
-
+    return fetch_all(sql, [dt_from, dt_to])
 
-@app.get("/admin/charts/weekly_users")
-@require_admin
-def chart_weekly_users():
-    dt_from, dt_to = get_from_to()
+def weekly_users_data(dt_from, dt_to):
     sql = """
     SELECT
       to_char(date_trunc('week', session_start), 'YYYY-MM-DD') AS week,
@@ -420,40 +521,32 @@ def chart_weekly_users():
     GROUP BY 1
     ORDER BY 1;
     """
-    return jsonify(make_json_safe(fetch_all(sql, [dt_from, dt_to])))
+    return fetch_all(sql, [dt_from, dt_to])
 
-@app.get("/admin/charts/new_vs_returning")
-@require_admin
-def chart_new_vs_returning():
-    dt_from, dt_to = get_from_to()
+def new_vs_returning_data(dt_from, dt_to):
+    # A user active in the range is new unless they have a session before it;
+    # one (user_id, session_start) index probe per active user instead of
+    # MIN(session_start) over the whole table
     sql = """
-    WITH first_seen AS (
-      SELECT user_id, MIN(session_start) AS first_time
-      FROM sessions
-      GROUP BY user_id
-    ),
-    active_in_range AS (
-      SELECT DISTINCT user_id
-      FROM sessions
-      WHERE session_start >= %s AND session_start <= %s
-    )
     SELECT
-      SUM(CASE WHEN f.first_time >= %s AND f.first_time <= %s THEN 1 ELSE 0 END)::int AS new_users,
-      SUM(CASE WHEN f.first_time < %s THEN 1 ELSE 0 END)::int AS returning_users
-    FROM active_in_range a
-    JOIN first_seen f USING(user_id);
+      COUNT(*) FILTER (WHERE NOT seen_before)::int AS new_users,
+      COUNT(*) FILTER (WHERE seen_before)::int AS returning_users
+    FROM (
+      SELECT EXISTS (
+        SELECT 1 FROM sessions s
+        WHERE s.user_id = a.user_id AND s.session_start < %s
+      ) AS seen_before
+      FROM (
+        SELECT DISTINCT user_id
+        FROM sessions
+        WHERE session_start >= %s AND session_start <= %s
+      ) a
+    ) t;
     """
-    row = fetch_one(sql, [dt_from, dt_to, dt_from, dt_to, dt_from])
-    return jsonify(make_json_safe(row or {"new_users": 0, "returning_users": 0}))
+    row = fetch_one(sql, [dt_from, dt_from, dt_to])
+    return row or {"new_users": 0, "returning_users": 0}
 
-
-# ----------------------------
-# Charts: Crashes
-# ----------------------------
-@app.get("/admin/charts/crashes_daily")
-@require_admin
-def chart_crashes_daily():
-    dt_from, dt_to = get_from_to()
+def crashes_daily_data(dt_from, dt_to):
     sql = """
     SELECT
       to_char(date_trunc('day', crash_time), 'YYYY-MM-DD') AS day,
@@ -463,12 +556,9 @@ def chart_crashes_daily():
     GROUP BY 1
     ORDER BY 1;
     """
-    return jsonify(make_json_safe(fetch_all(sql, [dt_from, dt_to])))
+    return fetch_all(sql, [dt_from, dt_to])
 
-@app.get("/admin/charts/crashes_hourly")
-@require_admin
-def chart_crashes_hourly():
-    dt_from, dt_to = get_from_to()
+def crashes_hourly_data(dt_from, dt_to):
     sql = """
     SELECT
       EXTRACT(HOUR FROM crash_time)::int AS hour,
@@ -478,13 +568,9 @@ def chart_crashes_hourly():
     GROUP BY 1
     ORDER BY 1;
     """
-    return jsonify(make_json_safe(fetch_all(sql, [dt_from, dt_to])))
-
+    return fetch_all(sql, [dt_from, dt_to])
 
-@app.get("/admin/charts/crashes_by_module")
-@require_admin
-def chart_crashes_by_module():
-    dt_from, dt_to = get_from_to()
+def crashes_by_module_data(dt_from, dt_to):
     sql = """
     SELECT COALESCE(faulting_module,'unknown') AS module, COUNT(*)::int AS crashes
     FROM crashes
@@ -493,13 +579,9 @@ def chart_crashes_by_module():
     ORDER BY crashes DESC
     LIMIT 12;
     """
-    return jsonify(make_json_safe(fetch_all(sql, [dt_from, dt_to])))
+    return fetch_all(sql, [dt_from, dt_to])
 
-
-@app.get("/admin/charts/crashes_by_exception")
-@require_admin
-def chart_crashes_by_exception():
-    dt_from, dt_to = get_from_to()
+def crashes_by_exception_data(dt_from, dt_to):
     sql = """
     SELECT COALESCE(exception_code,'unknown') AS exception, COUNT(*)::int AS crashes
     FROM crashes
@@ -508,40 +590,41 @@ def chart_crashes_by_exception():
     ORDER BY crashes DESC
     LIMIT 12;
     """
-    return jsonify(make_json_safe(fetch_all(sql, [dt_from, dt_to])))
+    return fetch_all(sql, [dt_from, dt_to])
 
-
-@app.get("/admin/charts/crashes_top_signatures")
-@require_admin
-def chart_crashes_top_signatures():
-    dt_from, dt_to = get_from_to()
+def crashes_top_signatures_data(dt_from, dt_to):
+    # Per-day group counts; whole days overlapping the range are included
     sql = """
     SELECT
-      CONCAT(COALESCE(exception_code,'no-code'),' | ',
-             COALESCE(faulting_module,'no-module'),' | ',
-             COALESCE(event_id::text,'0')) AS signature,
-      COUNT(*)::int AS crashes
-    FROM crashes
-    WHERE crash_time >= %s AND crash_time <= %s
-    GROUP BY 1
+      CONCAT(g.label, ' [', g.signature, ']') AS signature,
+      g.signature AS fingerprint,
+      SUM(d.crashes)::int AS crashes
+    FROM crash_group_daily d
+    JOIN crash_groups g USING (signature)
+    WHERE d.day >= %s::date AND d.day <= %s::date
+    GROUP BY g.signature
     ORDER BY crashes DESC
     LIMIT 10;
     """
-    return jsonify(make_json_safe(fetch_all(sql, [dt_from, dt_to])))
-# ----------------------------
-# Location: Charts + Map Data
-# ----------------------------
-
-@app.get("/admin/charts/sessions_by_country")
-@require_admin
-def chart_sessions_by_country():
-    """
-    Returns: [{ country: "...", sessions: 123 }, ...]
-    Uses sessions.location->>'country'
-    """
-    dt_from, dt_to = get_from_to()
-    limit = int(request.args.get("limit", "12"))
-
+    try:
+        return fetch_all(sql, [dt_from, dt_to])
+    except errors.UndefinedTable:
+        sql = """
+        SELECT
+          CONCAT(COALESCE(exception_code,'no-code'),' | ',
+                 COALESCE(faulting_module,'no-module'),' | ',
+                 COALESCE(event_id::text,'0')) AS signature,
+          COUNT(*)::int AS crashes
+        FROM crashes
+        WHERE crash_time >= %s AND crash_time <= %s
+        GROUP BY 1
+        ORDER BY crashes DESC
+        LIMIT 10;
+        """
+        return fetch_all(sql, [dt_from, dt_to])
+
+def sessions_by_country_data(dt_from, dt_to, limit=12):
+    """Uses sessions.location->>'country'"""
     sql = """
     SELECT
       COALESCE(NULLIF(location->>'country',''), 'Unknown') AS country,
@@ -552,68 +635,33 @@ def chart_sessions_by_country():
     ORDER BY sessions DESC
     LIMIT %s;
     """
-    rows = fetch_all(sql, [dt_from, dt_to, limit])
-    return jsonify(make_json_safe(rows))
+    return fetch_all(sql, [dt_from, dt_to, limit])
 
-
-@app.get("/admin/charts/location_coverage")
-@require_admin
-def chart_location_coverage():
-    """
-    Returns:
-      {
-        total_sessions: int,
-        with_location: int,
-        without_location: int
-      }
-
-    "with_location" means location is not null and has lat/lon
-    """
-    dt_from, dt_to = get_from_to()
-
-    sql_total = """
-    SELECT COUNT(*)::int AS c
+def location_coverage_data(dt_from, dt_to):
+    """"with_location" means location is not null and has lat/lon"""
+    sql = """
+    SELECT
+      COUNT(*)::int AS total_sessions,
+      COUNT(*) FILTER (
+        WHERE location IS NOT NULL
+          AND (location ? 'latitude')
+          AND (location ? 'longitude')
+          AND NULLIF(location->>'latitude','') IS NOT NULL
+          AND NULLIF(location->>'longitude','') IS NOT NULL
+      )::int AS with_location
     FROM sessions
     WHERE session_start >= %s AND session_start <= %s;
     """
-
-    sql_with = """
-    SELECT COUNT(*)::int AS c
-    FROM sessions
-    WHERE session_start >= %s AND session_start <= %s
-      AND location IS NOT NULL
-      AND (location ? 'latitude')
-      AND (location ? 'longitude')
-      AND NULLIF(location->>'latitude','') IS NOT NULL
-      AND NULLIF(location->>'longitude','') IS NOT NULL;
-    """
-
-    total = fetch_one(sql_total, [dt_from, dt_to])["c"]
-    with_loc = fetch_one(sql_with, [dt_from, dt_to])["c"]
-    without_loc = int(total) - int(with_loc)
-
-    return jsonify({
-        "total_sessions": int(total),
-        "with_location": int(with_loc),
-        "without_location": int(without_loc),
-    })
-
-
-@app.get("/admin/locations")
-@require_admin
-def admin_locations():
-    """
-    Map feed: returns session points with lat/lon.
-    Query params:
-      - user (optional)
-      - from, to (optional; defaults last 30 days)
-      - limit (optional; default 2000)
-    """
-    user = request.args.get("user", "").strip()
-    limit = int(request.args.get("limit", "2000"))
-
-    dt_from, dt_to = get_from_to()
-
+    row = fetch_one(sql, [dt_from, dt_to])
+    total = int(row["total_sessions"])
+    with_loc = int(row["with_location"])
+    return {
+        "total_sessions": total,
+        "with_location": with_loc,
+        "without_location": total - with_loc,
+    }
+
+def locations_data(dt_from, dt_to, user="", limit=2000):
     where = [
         "session_start >= %s",
         "session_start <= %s",
@@ -647,9 +695,196 @@ def admin_locations():
     LIMIT %s;
     """
     params.append(limit)
+    return fetch_all(sql, params)
+
+
+# name -> query function; the keys are what /admin/dashboard returns
+DASHBOARD_CHARTS = {
+    "sessions_per_user": sessions_per_user_data,
+    "session_duration_daily": session_duration_daily_data,
+    "activity_hourly": activity_hourly_data,
+    "daily_users": daily_users_data,
+    "weekly_users": weekly_users_data,
+    "new_vs_returning": new_vs_returning_data,
+    "crashes_daily": crashes_daily_data,
+    "crashes_hourly": crashes_hourly_data,
+    "crashes_by_module": crashes_by_module_data,
+    "crashes_by_exception": crashes_by_exception_data,
+    "crashes_top_signatures": crashes_top_signatures_data,
+    "sessions_by_country": sessions_by_country_data,
+    "location_coverage": location_coverage_data,
+    "locations": locations_data,
+}
+
+# Each worker holds one pooled connection while its query runs
+DASHBOARD_WORKERS = min(int(os.getenv("DASHBOARD_WORKERS", "8")), DB_POOL_MAX)
+_dashboard_executor = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS,
+                                         thread_name_prefix="dashboard")
 
-    rows = fetch_all(sql, params)
-    return jsonify(make_json_safe(rows))
+
+# ----------------------------
+# Admin: Dashboard bootstrap
+# ----------------------------
+@app.get("/admin/dashboard")
+@require_admin
+@cached_json("sessions", "crashes")
+def admin_dashboard():
+    """
+    Every chart for one date range in a single document. The queries run
+    concurrently on pooled connections, so the response takes about as long
+    as the slowest one rather than the sum of all of them.
+    """
+    dt_from, dt_to = get_from_to()
+
+    t0 = time.perf_counter()
+    futures = {
+        name: _dashboard_executor.submit(fn, dt_from, dt_to)
+        for name, fn in DASHBOARD_CHARTS.items()
+    }
+
+    out = {}
+    errors_by_chart = {}
+    for name, fut in futures.items():
+        try:
+            out[name] = fut.result()
+        except Exception as e:
+            print(f"[DASHBOARD] {name} failed:", repr(e), flush=True)
+            out[name] = None
+            errors_by_chart[name] = str(e)
+
+    if len(errors_by_chart) == len(futures):
+        return jsonify({"error": "Dashboard queries failed", "details": errors_by_chart}), 500
+
+    out["range"] = {"from": dt_from, "to": dt_to}
+    out["took_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+    if errors_by_chart:
+        out["errors"] = errors_by_chart
+    return jsonify(make_json_safe(out))
+
+
+# ----------------------------
+# Charts: Sessions
+# ----------------------------
+@app.get("/admin/charts/sessions_per_user")
+@require_admin
+@cached_json("sessions")
+def chart_sessions_per_user():
+    return jsonify(make_json_safe(sessions_per_user_data(*get_from_to())))
+
+@app.get("/admin/charts/session_duration_daily")
+@require_admin
+@cached_json("sessions")
+def chart_session_duration_daily():
+    return jsonify(make_json_safe(session_duration_daily_data(*get_from_to())))
+
+@app.get("/admin/charts/activity_hourly")
+@require_admin
+@cached_json("sessions")
+def chart_activity_hourly():
+    return jsonify(make_json_safe(activity_hourly_data(*get_from_to())))
+
+@app.get("/admin/charts/daily_users")
+@require_admin
+@cached_json("sessions")
+def chart_daily_users():
+    return jsonify(make_json_safe(daily_users_data(*get_from_to())))
+
+
+@app.get("/admin/charts/weekly_users")
+@require_admin
+@cached_json("sessions")
+def chart_weekly_users():
+    return jsonify(make_json_safe(weekly_users_data(*get_from_to())))
+
+@app.get("/admin/charts/new_vs_returning")
+@require_admin
+@cached_json("sessions")
+def chart_new_vs_returning():
+    return jsonify(make_json_safe(new_vs_returning_data(*get_from_to())))
+
+
+# ----------------------------
+# Charts: Crashes
+# ----------------------------
+@app.get("/admin/charts/crashes_daily")
+@require_admin
+@cached_json("crashes")
+def chart_crashes_daily():
+    return jsonify(make_json_safe(crashes_daily_data(*get_from_to())))
+
+@app.get("/admin/charts/crashes_hourly")
+@require_admin
+@cached_json("crashes")
+def chart_crashes_hourly():
+    return jsonify(make_json_safe(crashes_hourly_data(*get_from_to())))
+
+
+@app.get("/admin/charts/crashes_by_module")
+@require_admin
+@cached_json("crashes")
+def chart_crashes_by_module():
+    return jsonify(make_json_safe(crashes_by_module_data(*get_from_to())))
+
+
+@app.get("/admin/charts/crashes_by_exception")
+@require_admin
+@cached_json("crashes")
+def chart_crashes_by_exception():
+    return jsonify(make_json_safe(crashes_by_exception_data(*get_from_to())))
+
+
+@app.get("/admin/charts/crashes_top_signatures")
+@require_admin
+@cached_json("crashes")
+def chart_crashes_top_signatures():
+    return jsonify(make_json_safe(crashes_top_signatures_data(*get_from_to())))
+# ----------------------------
+# Location: Charts + Map Data
+# ----------------------------
+
+@app.get("/admin/charts/sessions_by_country")
+@require_admin
+@cached_json("sessions")
+def chart_sessions_by_country():
+    """
+    Returns: [{ country: "...", sessions: 123 }, ...]
+    """
+    dt_from, dt_to = get_from_to()
+    limit = int(request.args.get("limit", "12"))
+    return jsonify(make_json_safe(sessions_by_country_data(dt_from, dt_to, limit)))
+
+
+@app.get("/admin/charts/location_coverage")
+@require_admin
+@cached_json("sessions")
+def chart_location_coverage():
+    """
+    Returns:
+      {
+        total_sessions: int,
+        with_location: int,
+        without_location: int
+      }
+    """
+    return jsonify(location_coverage_data(*get_from_to()))
+
+
+@app.get("/admin/locations")
+@require_admin
+@cached_json("sessions")
+def admin_locations():
+    """
+    Map feed: returns session points with lat/lon.
+    Query params:
+      - user (optional)
+      - from, to (optional; defaults last 30 days)
+      - limit (optional; default 2000)
+    """
+    user = request.args.get("user", "").strip()
+    limit = int(request.args.get("limit", "2000"))
+
+    dt_from, dt_to = get_from_to()
+    return jsonify(make_json_safe(locations_data(dt_from, dt_to, user, limit)))
 
 # ----------------------------
 # Admin: Tasks
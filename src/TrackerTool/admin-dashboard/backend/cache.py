@@ -0,0 +1,138 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, request
+
+from db import pooled
+
+# ----------------------------
+# Config
+# ----------------------------
+CACHE_TTL_SECONDS = float(os.getenv("CHART_CACHE_TTL", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("CHART_CACHE_MAX_ENTRIES", "512"))
+VERSION_POLL_SECONDS = float(os.getenv("CHART_CACHE_VERSION_POLL", "2"))
+
+# A statement-level trigger bumps data_versions.version for a table whenever
+# rows are inserted/updated/deleted, including by the tracker API process.
+# Cached results are keyed by those versions, so new sessions/crashes
+# invalidate exactly the charts that read them. The table and triggers are
+# created by the tracker's migrations.py (0011); without them the cache
+# falls back to TTL-only.
+
+
+class ResultCache:
+    """Small thread-safe LRU of serialized JSON responses with TTL."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()   # key -> (expires_at, etag, body, mimetype)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.time():
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body: bytes, mimetype: str):
+        etag = hashlib.sha1(body).hexdigest()
+        entry = (time.time() + self.ttl, etag, body, mimetype)
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "ttl_seconds": self.ttl,
+                "max_entries": self.max_entries,
+            }
+
+
+CACHE = ResultCache()
+
+_versions_lock = threading.Lock()
+_versions = {}          # table -> version
+_versions_at = 0.0
+
+
+def current_versions(tables) -> tuple:
+    """
+    Versions of the given tables, re-read from the DB at most every
+    VERSION_POLL_SECONDS by one request while the others keep using the
+    last versions read. Falls back to TTL-only caching if unavailable.
+    """
+    global _versions, _versions_at
+    with _versions_lock:
+        stale = time.time() - _versions_at >= VERSION_POLL_SECONDS
+        if stale:
+            _versions_at = time.time()
+    if stale:
+        try:
+            with pooled() as conn, conn.cursor() as cur:
+                cur.execute("SELECT table_name, version FROM data_versions")
+                versions = dict(cur.fetchall())
+            with _versions_lock:
+                _versions = versions
+        except Exception as e:
+            print("[CACHE] Could not read data_versions (run the tracker's "
+                  "`python migrations.py up`):", repr(e), flush=True)
+    versions = _versions
+    return tuple(versions.get(t, 0) for t in tables)
+
+
+def invalidate():
+    """Drop every cached result and force a version re-read on the next request."""
+    global _versions_at
+    CACHE.clear()
+    with _versions_lock:
+        _versions_at = 0.0
+
+
+def cached_json(*tables):
+    """
+    Cache a GET endpoint's JSON body keyed by (path, query args, versions of
+    `tables`) and answer If-None-Match with 304.
+    """
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            versions = current_versions(tables)
+            key = (request.path, tuple(sorted(request.args.items(multi=True))), versions)
+
+            entry = CACHE.get(key)
+            if entry is None:
+                rv = fn(*args, **kwargs)
+                if not isinstance(rv, Response) or rv.status_code != 200:
+                    return rv
+                entry = CACHE.put(key, rv.get_data(), rv.mimetype)
+
+            _, etag, body, mimetype = entry
+            resp = Response(body, mimetype=mimetype)
+            resp.set_etag(etag)
+            resp.headers["Cache-Control"] = "private, no-cache"
+            return resp.make_conditional(request)
+        return wrapper
+    return deco
@@ -1,31 +1,82 @@
 import os
+import threading
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2 import pool as pg_pool
 from psycopg2.extras import RealDictCursor
 from datetime import datetime, date, timedelta
 
-def get_conn():
-    return psycopg2.connect(
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "12"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+def conn_kwargs():
+    return dict(
         host=os.getenv("DB_HOST", "localhost"),
         port=int(os.getenv("DB_PORT", "5435")),
         dbname=os.getenv("DB_NAME", "esim_tracker"),
         user=os.getenv("DB_USER", "postgres"),
         password=os.getenv("DB_PASSWORD", ""),
         sslmode=os.getenv("DB_SSLMODE", "prefer"),
+        connect_timeout=10,
+        keepalives=1,
+        keepalives_idle=30,
     )
 
-def execute_returning_one(sql: str, params=None):
-    conn = get_conn()
+def get_conn():
+    """Open a dedicated (non-pooled) connection."""
+    return psycopg2.connect(**conn_kwargs())
+
+# ----------------------------
+# Connection pool
+# ----------------------------
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pg_pool.ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, **conn_kwargs())
+    return _pool
+
+@contextmanager
+def pooled():
+    """
+    Borrow a connection from the shared pool. Commits on success, rolls back
+    on error; broken connections are closed instead of being reused.
+    """
+    if not _slots.acquire(timeout=DB_POOL_TIMEOUT):
+        raise RuntimeError(f"No database connection available after {DB_POOL_TIMEOUT:.0f}s")
+    p = get_pool()
+    conn = None
     try:
+        conn = p.getconn()
+        if conn.closed:
+            p.putconn(conn, close=True)
+            conn = p.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+    finally:
+        if conn is not None:
+            p.putconn(conn, close=bool(conn.closed))
+        _slots.release()
+
+def execute_returning_one(sql: str, params=None):
+    with pooled() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(sql, params or [])
             row = cur.fetchone()
-            conn.commit()
             return _row_to_dict(row) if row else None
-    finally:
-        conn.close()
 
-        
-from datetime import datetime, date, timedelta
 
 def _json_safe(v):
     if isinstance(v, datetime):
@@ -41,36 +92,21 @@ def _row_to_dict(row):
     return {k: _json_safe(v) for k, v in d.items()}
 
 def fetch_all(sql: str, params=None):
-    conn = get_conn()
-    try:
+    with pooled() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(sql, params or [])
             rows = cur.fetchall()
             return [_row_to_dict(r) for r in rows]
-    finally:
-        conn.close()
 
 def fetch_one(sql: str, params=None):
-    conn = get_conn()
-    try:
+    with pooled() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(sql, params or [])
             row = cur.fetchone()
-
-            sql_start = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
-            if sql_start in {"INSERT", "UPDATE", "DELETE"}:
-                conn.commit()
-
             return _row_to_dict(row) if row else None
-    finally:
-        conn.close()
 
 def execute(sql: str, params=None):
-    conn = get_conn()
-    try:
+    with pooled() as conn:
         with conn.cursor() as cur:
             cur.execute(sql, params or [])
-            conn.commit()
             return cur.rowcount
-    finally:
-        conn.close()
\ No newline at end of file
@@ -43,6 +43,17 @@ async function apiGet(path){
   return res.json();
 }
 
+async function apiText(path){
+  const res = await fetch(`${apiBase()}${path}`, {
+    headers: { "X-Admin-Token": adminToken() }
+  });
+  if(!res.ok){
+    const t = await res.text();
+    throw new Error(`${res.status} ${t}`);
+  }
+  return res.text();
+}
+
 async function apiPost(path, data){
   const res = await fetch(`${apiBase()}${path}`, {
     method: "POST",
@@ -372,7 +383,7 @@ async function renderLogs(){
       <div class="table-wrap">
         ${tableHtml(
           ["Log ID","User","Timestamp","Preview"],
-          rows.map(l => [l.log_id, l.user_id, l.log_timestamp, String(l.log_content||"").slice(0,80)])
+          rows.map(l => [l.log_id, l.user_id, l.log_timestamp, String(l.log_preview||"").slice(0,80)])
         )}
       </div>
 
@@ -390,17 +401,25 @@ async function renderLogs(){
   const table = wrap.querySelector("table");
   table.querySelectorAll("tbody tr").forEach((tr, idx)=>{
     tr.style.cursor = "pointer";
-    tr.onclick = () => {
-      $("logDetails").textContent =
-        `User: ${rows[idx].user_id}\nTimestamp: ${rows[idx].log_timestamp}\n\n${rows[idx].log_content || ""}`;
+    tr.onclick = async () => {
+      const l = rows[idx];
+      $("logDetails").textContent = `User: ${l.user_id}\nTimestamp: ${l.log_timestamp}\n\nLoading…`;
+      let content;
+      try{
+        content = await apiText(`/admin/logs/${l.log_id}/content`);
+      }catch(e){
+        content = `Failed to load log: ${e.message}`;
+      }
+      $("logDetails").textContent = `User: ${l.user_id}\nTimestamp: ${l.log_timestamp}\n\n${content}`;
     };
   });
 
-  $("exportLogs").onclick = () => {
-    const csvRows = [
-      ["log_id","user_id","log_timestamp","log_content"],
-      ...rows.map(l => [l.log_id, l.user_id, l.log_timestamp, l.log_content])
-    ];
+  $("exportLogs").onclick = async () => {
+    // content is fetched per log, one at a time
+    const csvRows = [["log_id","user_id","log_timestamp","log_content"]];
+    for(const l of rows){
+      csvRows.push([l.log_id, l.user_id, l.log_timestamp, await apiText(`/admin/logs/${l.log_id}/content`)]);
+    }
     downloadCSV("admin_logs.csv", csvRows);
   };
 }
@@ -1401,88 +1420,88 @@ async function renderVisuals(){
   async function loadAllCharts(){
     [...chartRegistry.keys()].forEach(k=>destroyChart(k));
 
-    const q = qsFromTo();
+    // one round trip; the backend runs the chart queries concurrently
+    const d = await apiGet(`/admin/dashboard${qsFromTo()}`);
 
-    const sessionsPerUser = await apiGet(`/admin/charts/sessions_per_user${q}`);
+    const sessionsPerUser = d.sessions_per_user || [];
     buildBar("sessions_per_user", "ch_sessions_per_user",
       sessionsPerUser.map(r=>r.user_id),
       sessionsPerUser.map(r=>r.sessions)
     );
 
-    const durationDaily = await apiGet(`/admin/charts/session_duration_daily${q}`);
+    const durationDaily = d.session_duration_daily || [];
     buildLine("duration_daily", "ch_duration_daily",
       durationDaily.map(r=>r.day),
       durationDaily.map(r=>Number(r.hours || 0))
     );
 
-    const hourly = await apiGet(`/admin/charts/activity_hourly${q}`);
+    const hourly = d.activity_hourly || [];
     buildBar("activity_hourly", "ch_activity_hourly",
       hourly.map(r=>String(r.hour).padStart(2,"0")),
       hourly.map(r=>r.sessions)
     );
 
-    const dailyUsers = await apiGet(`/admin/charts/daily_users${q}`);
+    const dailyUsers = d.daily_users || [];
     buildLine("daily_users", "ch_daily_users",
       dailyUsers.map(r=>r.day),
       dailyUsers.map(r=>r.active_users)
     );
 
-    const weeklyUsers = await apiGet(`/admin/charts/weekly_users${q}`);
+    const weeklyUsers = d.weekly_users || [];
     buildBar("weekly_users", "ch_weekly_users",
       weeklyUsers.map(r=>r.week),
       weeklyUsers.map(r=>r.active_users)
     );
 
-    const newVs = await apiGet(`/admin/charts/new_vs_returning${q}`);
+    const newVs = d.new_vs_returning || {};
     buildPie("new_vs_returning", "ch_new_vs_returning",
       ["New Users","Returning Users"],
       [newVs.new_users || 0, newVs.returning_users || 0]
     );
 
-    const crashesDaily = await apiGet(`/admin/charts/crashes_daily${q}`);
+    const crashesDaily = d.crashes_daily || [];
     buildLine("crashes_daily", "ch_crashes_daily",
       crashesDaily.map(r=>r.day),
       crashesDaily.map(r=>r.crashes)
     );
 
-    const crashesHourly = await apiGet(`/admin/charts/crashes_hourly${q}`);
+    const crashesHourly = d.crashes_hourly || [];
     buildBar("crashes_hourly", "ch_crashes_hourly",
       crashesHourly.map(r=>String(r.hour).padStart(2,"0")),
       crashesHourly.map(r=>r.crashes)
     );
 
-    const byModule = await apiGet(`/admin/charts/crashes_by_module${q}`);
+    const byModule = d.crashes_by_module || [];
     buildBar("crashes_by_module", "ch_crashes_module",
       byModule.map(r=>r.module),
       byModule.map(r=>r.crashes)
     );
 
-    const byExc = await apiGet(`/admin/charts/crashes_by_exception${q}`);
+    const byExc = d.crashes_by_exception || [];
     buildBar("crashes_by_exception", "ch_crashes_exception",
       byExc.map(r=>r.exception),
       byExc.map(r=>r.crashes)
     );
 
-    const sigs = await apiGet(`/admin/charts/crashes_top_signatures${q}`);
+    const sigs = d.crashes_top_signatures || [];
     buildBar("crashes_signatures", "ch_crashes_signatures",
       sigs.map(r=>r.signature),
       sigs.map(r=>r.crashes)
     );
 
-    const byCountry = await apiGet(`/admin/charts/sessions_by_country${q}`);
+    const byCountry = d.sessions_by_country || [];
     buildBar("sessions_by_country", "ch_sessions_country",
       byCountry.map(r => r.country),
       byCountry.map(r => r.sessions)
     );
 
-    const coverage = await apiGet(`/admin/charts/location_coverage${q}`);
+    const coverage = d.location_coverage || {};
     buildPie("location_coverage", "ch_location_coverage",
       ["With location","Without location"],
       [coverage.with_location || 0, coverage.without_location || 0]
     );
 
-    const pointsPath = q ? `/admin/locations${q}&limit=2000` : `/admin/locations?limit=2000`;
-    const points = await apiGet(pointsPath);
+    const points = d.locations || [];
     renderLocationMap(points);
   }
 
@@ -1,11 +1,14 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory, stream_with_context
 from flask_cors import CORS
 import psycopg2
 import os
-from datetime import timedelta
-from psycopg2.extras import Json
+import io
+import csv
+import json
+import uuid
+from urllib.parse import urlencode
+from psycopg2.extras import Json, execute_values
 import traceback
-from threading import Thread
 import hashlib
 
 # Initialize Flask app
@@ -23,122 +26,54 @@ CORS(app)  # Enable CORS for frontend interaction
  #       port="5432"
   #  )
 
-import os
-import requests
-
-def send_crash_email_to_admin(crash: dict):
-    api_key = os.getenv("RESEND_API_KEY")
-    admin_email = os.getenv("ADMIN_EMAIL")
-    from_email = os.getenv("FROM_EMAIL", "onboarding@resend.dev")
+from dotenv import load_dotenv
+load_dotenv()
 
-    print("[EMAIL] Attempting Resend...", flush=True)
+# -------------------------
+# ✅ DB helper functions (shared connection pool, see db.py)
+# -------------------------
+from db import get_conn, exec_sql, qall, q1, pool_stats, PoolTimeout
+import rollup
+import crash_groups
+import crash_feed
+import log_chunks
+import crash_notify
+import tasks
 
-    if not api_key:
-        print("[EMAIL] Missing RESEND_API_KEY", flush=True)
-        return
+# The schema comes from migrations.py: run `python migrations.py up` before
+# deploying. The modules above only check that their migration has run.
+rollup.start_refresher(float(os.getenv("ROLLUP_REFRESH_SECONDS", "0")))
+crash_notify.start_worker()
 
-    if not admin_email:
-        print("[EMAIL] Missing ADMIN_EMAIL", flush=True)
-        return
 
-    url = "https://api.resend.com/emails"
+@app.errorhandler(PoolTimeout)
+def handle_pool_timeout(e):
+    return jsonify({"error": str(e)}), 503
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
 
-    body = {
-        "from": from_email,
-        "to": [admin_email],
-        "subject": f"[eSim] Crash — {crash.get('user_id')}",
-        "text": f"""
-🚨 eSim Crash Alert
-
-User: {crash.get('user_id')}
-Crash Time: {crash.get('crash_time')}
-Session Start: {crash.get('session_start')}
-Session End: {crash.get('session_end')}
-Provider: {crash.get('provider')}
-Event ID: {crash.get('event_id')}
-Exception: {crash.get('exception_code')}
-Faulting Module: {crash.get('faulting_module')}
-
-Message:
-{(crash.get('message') or '')[:4000]}
-"""
-    }
+@app.route("/health/pool", methods=["GET"])
+def health_pool():
+    return jsonify(pool_stats())
 
-    try:
-        r = requests.post(url, json=body, headers=headers, timeout=15)
 
-        if r.status_code >= 400:
-            print("[EMAIL] Resend failed:", r.status_code, r.text, flush=True)
-        else:
-            print("[EMAIL] Resend sent OK", flush=True)
+@app.route("/health/crash-feed", methods=["GET"])
+def health_crash_feed():
+    return jsonify(crash_feed.stats())
 
-    except Exception as e:
-        print("[EMAIL] Resend exception:", repr(e), flush=True)
 
+@app.route("/health/notifications", methods=["GET"])
+def health_notifications():
+    return jsonify(crash_notify.stats())
 
-from dotenv import load_dotenv
-load_dotenv()
 
-def connect_db():
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url:
-        raise RuntimeError("DATABASE_URL is not set")
-    # ensure sslmode=require even if missing
-    if "sslmode=" not in db_url:
-        sep = "&" if "?" in db_url else "?"
-        db_url = db_url + f"{sep}sslmode=require"
-    return psycopg2.connect(db_url, connect_timeout=10)
+@app.route("/health/tasks", methods=["GET"])
+def health_tasks():
+    return jsonify(tasks.stats())
 
 
-# -------------------------
-# ✅ DB helper functions
-# -------------------------
-
-def exec_sql(sql, params=()):
-    """INSERT / UPDATE / DELETE"""
-    conn = connect_db()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(sql, params)
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
-
-import os
-import psycopg2
-
-def qall(sql, params=()):
-    """SELECT many rows (returns list of tuples)"""
-    conn = connect_db()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(sql, params)
-            return cur.fetchall()
-    finally:
-        conn.close()
-
-
-def q1(sql, params=()):
-    """SELECT single row (returns one tuple or None)"""
-    conn = connect_db()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(sql, params)
-            return cur.fetchone()
-    finally:
-        conn.close()
-
 @app.route("/debug/counts", methods=["GET"])
 def debug_counts():
-    with connect_db() as conn:
+    with get_conn() as conn:
         with conn.cursor() as cur:
             cur.execute("select current_database(), current_user;")
             who = cur.fetchone()
@@ -162,56 +97,22 @@ def serve_frontend():
 
 @app.route('/statstics', methods=['GET'])
 def get_stats():
-    conn = connect_db()
-    cursor = conn.cursor()
-
     user_id = request.args.get("user")  # Fetch user filter from API request
 
-    if user_id:
-        # Fetch stats for a specific user (Fixed: use %s instead of ?)
-        cursor.execute("SELECT COUNT(*) FROM sessions WHERE user_id = %s", (user_id,))
-        total_sessions = cursor.fetchone()[0] or 0
-
-        cursor.execute("SELECT SUM(total_duration) FROM sessions WHERE user_id = %s", (user_id,))
-        total_hours = cursor.fetchone()[0] or 0
-
-        cursor.execute("SELECT AVG(total_duration) FROM sessions WHERE user_id = %s", (user_id,))
-        avg_duration = cursor.fetchone()[0] or 0
-
-    else:
-        # Fetch overall stats (all users)
-        cursor.execute("SELECT COUNT(DISTINCT user_id) FROM sessions")
-        active_users = cursor.fetchone()[0] or 0
-
-        cursor.execute("SELECT COUNT(*) FROM sessions")
-        total_sessions = cursor.fetchone()[0] or 0
-
-        cursor.execute("SELECT SUM(total_duration) FROM sessions")
-        total_hours = cursor.fetchone()[0] or 0
-
-        cursor.execute("SELECT AVG(total_duration) FROM sessions")
-        avg_duration = cursor.fetchone()[0] or 0
-
-    conn.close()
-
-    # Convert `total_hours` and `avg_duration` from timedelta if needed
-    if isinstance(avg_duration, timedelta):
-        avg_duration = avg_duration.total_seconds() / 3600  # Convert to hours
-
-    if isinstance(total_hours, timedelta):
-        total_hours = total_hours.total_seconds() / 3600  # Convert to hours
+    # Answered from the session rollup (see rollup.py), not a scan of sessions
+    totals = rollup.user_totals(user_id) if user_id else rollup.overall_totals()
 
     return jsonify({
-        "total_sessions": total_sessions,
-        "active_users": active_users if not user_id else 1,  # Show active user count only for all users
-        "total_hours": float(total_hours),  # Convert to numeric format
-        "avg_duration": float(avg_duration),  # Convert to numeric format
+        "total_sessions": totals["total_sessions"],
+        "active_users": totals["active_users"] if not user_id else 1,  # Show active user count only for all users
+        "total_hours": totals["total_seconds"] / 3600,  # Convert to hours
+        "avg_duration": totals["avg_seconds"] / 3600,  # Convert to hours
     })
 
 @app.route("/health/db", methods=["GET"])
 def health_db():
     try:
-        with connect_db() as conn:
+        with get_conn() as conn:
             dsn = conn.get_dsn_parameters()
             with conn.cursor() as cur:
                 cur.execute("select current_database(), current_user;")
@@ -230,95 +131,244 @@ def health_db():
         return jsonify({"ok": False, "error": str(e)}), 500
     
 
-# API Endpoint: Get all sessions
+# -------------------------
+# Keyset pagination + field selection
+# -------------------------
+PAGE_DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", "500"))
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", "5000"))
+
+
+def fmt_ts(x):
+    return x.strftime('%Y-%m-%d %H:%M:%S') if x else ''
+
+
+# column -> JSON formatter (same output as the old unpaginated endpoints)
+SESSION_FIELDS = {
+    "session_id": lambda v: v,
+    "user_id": lambda v: v,
+    "session_start": fmt_ts,
+    "session_end": fmt_ts,
+    "total_duration": lambda v: str(v) if v else 'N/A',
+    "location": lambda v: v,
+}
+
+LOG_FIELDS = {
+    "log_id": lambda v: v,
+    "user_id": lambda v: v,
+    "log_timestamp": fmt_ts,
+    "log_content": lambda v: v,
+}
+
+# /logs lists metadata only: content is read per log (/logs/<log_id>[/content])
+LOG_LIST_FIELDS = {f: fmt for f, fmt in LOG_FIELDS.items() if f != "log_content"}
+
+
+def page_args():
+    """
+    ?after_id=<last id of previous page>&limit=<n>  (limit clamped to PAGE_MAX_LIMIT).
+    Every list is paged: without ?limit a page is PAGE_DEFAULT_LIMIT rows.
+    """
+    after_id = request.args.get("after_id")
+    after_id = int(after_id) if after_id not in (None, "") else None
+    limit = int(request.args.get("limit") or PAGE_DEFAULT_LIMIT)
+    return after_id, max(1, min(limit, PAGE_MAX_LIMIT))
+
+
+def select_fields(allowed: dict, id_field: str, default: list) -> list:
+    """?fields=a,b,c -> validated column list; the id column is always included (cursor)."""
+    raw = request.args.get("fields")
+    fields = [f.strip() for f in raw.split(",") if f.strip()] if raw else list(default)
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {unknown}")
+    if id_field not in fields:
+        fields.insert(0, id_field)
+    return fields
+
+
+def paged_query(table, id_field, allowed, default_fields, where=(), params=()):
+    """
+    Newest-first keyset page: WHERE id < after_id ORDER BY id DESC LIMIT n+1.
+    Returns a JSON list; the cursor for the next page is in X-Next-After-Id / Link.
+    """
+    try:
+        after_id, limit = page_args()
+        fields = select_fields(allowed, id_field, default_fields)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    clauses, params = list(where), list(params)
+    if after_id is not None:
+        clauses.append(f"{id_field} < %s")
+        params.append(after_id)
+
+    sql = f"SELECT {', '.join(fields)} FROM {table}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" ORDER BY {id_field} DESC LIMIT %s"
+    params.append(limit + 1)
+
+    rows = qall(sql, tuple(params))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = [{f: allowed[f](v) for f, v in zip(fields, r)} for r in rows]
+    resp = jsonify(items)
+    if has_more:
+        next_id = items[-1][id_field]
+        args = request.args.to_dict()
+        args.update({"after_id": next_id, "limit": limit})
+        resp.headers["X-Next-After-Id"] = str(next_id)
+        resp.headers["Link"] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return resp
+
+
+# API Endpoint: Get sessions (newest first, paginated)
 @app.route('/sessions', methods=['GET'])
 def get_sessions():
     user_filter = request.args.get('user')
-    conn = connect_db()
-    cursor = conn.cursor()
-
-    sql = """
-        SELECT session_id, user_id, session_start, session_end, total_duration, location
-        FROM sessions
-    """
-    params = ()
+    where, params = [], []
     if user_filter:
-        sql += " WHERE user_id = %s"
-        params = (user_filter,)
-    sql += " ORDER BY session_id DESC"
-
-    cursor.execute(sql, params)
-    sessions = cursor.fetchall()
-    conn.close()
-
-    formatted_sessions = []
-    for s in sessions:
-        formatted_sessions.append({
-            'session_id': s[0],
-            'user_id': s[1],
-            'session_start': s[2].strftime('%Y-%m-%d %H:%M:%S'),
-            'session_end': s[3].strftime('%Y-%m-%d %H:%M:%S') if s[3] else '',
-            'total_duration': str(s[4]) if s[4] else 'N/A',
-            'location': s[5]  # NEW
-        })
+        where.append("user_id = %s")
+        params.append(user_filter)
 
-    return jsonify(formatted_sessions)
+    return paged_query("sessions", "session_id", SESSION_FIELDS, list(SESSION_FIELDS), where, params)
 
 @app.route('/logs', methods=['GET'])
 def get_logs():
-    """Fetch logs only for the requested user."""
+    """
+    Fetch log metadata for the requested user (newest first, paginated).
+    The content of a log is read on its own: /logs/<log_id> or, in byte
+    ranges, /logs/<log_id>/content.
+    """
     user_filter = request.args.get('user')  # Get user filter from query parameter
-
-    conn = connect_db()
-    cursor = conn.cursor()
-
+    where, params = [], []
     if user_filter:
-        cursor.execute("SELECT log_id, user_id, log_timestamp, log_content FROM logs WHERE user_id = %s", (user_filter,))
+        where.append("user_id = %s")
+        params.append(user_filter)
+
+    return paged_query("logs", "log_id", LOG_LIST_FIELDS, list(LOG_LIST_FIELDS), where, params)
+
+@app.route('/logs/<int:log_id>', methods=['GET'])
+def get_log(log_id):
+    log_chunks.ensure()
+    row = q1("""
+        SELECT log_id, user_id, log_timestamp, log_content, upload_key
+        FROM logs WHERE log_id = %s
+    """, (log_id,))
+    if not row:
+        return jsonify({"error": "Log not found"}), 404
+    log = {f: LOG_FIELDS[f](v) for f, v in zip(LOG_FIELDS, row)}
+    if row[4] is not None:
+        # uploaded in chunks; prefer /logs/<log_id>/content for large logs
+        log["log_content"] = log_chunks.read_all(log_id)
+    return jsonify(log)
+
+
+def byte_range():
+    """
+    Requested byte range as (start, end) with end exclusive (None = to the end).
+    Accepts `Range: bytes=a-b` / `bytes=a-` or ?offset=&length=.
+    """
+    header = request.headers.get("Range")
+    if header:
+        unit, _, spec = header.partition("=")
+        first, _, last = spec.partition("-")
+        if unit.strip() != "bytes" or "," in spec or not first.strip().isdigit():
+            raise ValueError(f"Unsupported Range: {header}")
+        start = int(first)
+        end = int(last) + 1 if last.strip() else None
     else:
-        cursor.execute("SELECT log_id, user_id, log_timestamp, log_content FROM logs")
+        start = int(request.args.get("offset") or 0)
+        length = request.args.get("length")
+        end = start + int(length) if length not in (None, "") else None
+    if start < 0 or (end is not None and end <= start):
+        raise ValueError("Empty or negative range")
+    cap = start + log_chunks.LOG_RANGE_MAX_BYTES
+    return start, cap if end is None else min(end, cap)
+
 
-    logs = cursor.fetchall()
-    conn.close()
+@app.route('/logs/<int:log_id>/content', methods=['GET'])
+def get_log_content(log_id):
+    """
+    Raw log bytes (UTF-8 text), at most LOG_RANGE_MAX_BYTES per request; pick
+    the range with a Range header or ?offset=&length=. Anything short of the
+    whole log is a 206 with Content-Range: bytes a-b/<size>. Ranges are byte
+    offsets and can split a UTF-8 character.
+    """
+    try:
+        start, end = byte_range()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    got = log_chunks.read_range(log_id, start, end)
+    if got is None:
+        return jsonify({"error": "Log not found"}), 404
+    data, size = got
+
+    if start > 0 and start >= size:
+        resp = Response(status=416)
+        resp.headers["Content-Range"] = f"bytes */{size}"
+        return resp
+
+    partial = start > 0 or start + len(data) < size
+    resp = Response(data, status=206 if partial else 200, mimetype="text/plain")
+    resp.headers["Accept-Ranges"] = "bytes"
+    resp.headers["X-Log-Size"] = str(size)
+    if partial:
+        resp.headers["Content-Range"] = f"bytes {start}-{start + len(data) - 1}/{size}"
+    return resp
+
+
+@app.route('/logs/upload/<upload_key>', methods=['GET', 'PUT'])
+def upload_log_chunk(upload_key):
+    """
+    Incremental log upload (see log_chunks).
+    GET: {"log_id", "size", "complete"}, size = where the next chunk must start.
+    PUT ?offset=&user_id=&log_timestamp=[&final=1] with a gzip body: stores the
+    bytes past what the server already has; 409 + {"size"} if offset is past it.
+    """
+    if request.method == 'GET':
+        return jsonify(log_chunks.upload_status(upload_key))
 
-    # Format log data for JSON response
-    formatted_logs = [
-        {
-            "log_id": log[0],
-            "user_id": log[1],
-            "log_timestamp": log[2].strftime('%Y-%m-%d %H:%M:%S'),
-            "log_content": log[3]
-        }
-        for log in logs
-    ]
+    try:
+        offset = int(request.args.get("offset", ""))
+    except ValueError:
+        return jsonify({"error": "offset is required"}), 400
+    final = request.args.get("final") in ("1", "true")
+    if request.content_length and request.content_length > log_chunks.LOG_CHUNK_MAX_BYTES:
+        return jsonify({"error": "Chunk too large"}), 413
 
-    return jsonify(formatted_logs)
+    try:
+        result = log_chunks.append_chunk(
+            upload_key,
+            request.args.get("user_id"),
+            request.args.get("log_timestamp"),
+            offset,
+            request.get_data(cache=False),
+            final=final,
+        )
+    except log_chunks.ChunkError as e:
+        body = {"error": str(e)}
+        if e.size is not None:
+            body["size"] = e.size
+        return jsonify(body), e.status
+    return jsonify(result)
 
 @app.route("/get_users", methods=["GET"])
 def get_users():
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT user_id FROM sessions;")
-    users = [row[0] for row in cursor.fetchall()]
-    conn.close()
+    users = [row[0] for row in qall("SELECT DISTINCT user_id FROM sessions;")]
     return jsonify(users)
 
 @app.route("/get_summary", methods=["GET"])
 def get_summary():
     user = request.args.get("user", "All Users")
-    conn = connect_db()
-    cursor = conn.cursor()
-    
-    if user == "All Users":
-        cursor.execute("SELECT COUNT(*), SUM(total_duration) FROM sessions;")
-    else:
-        cursor.execute("SELECT COUNT(*), SUM(total_duration) FROM sessions WHERE user_id=%s;", (user,))
-    
-    result = cursor.fetchone()
-    conn.close()
-    
+
+    totals = rollup.overall_totals() if user == "All Users" else rollup.user_totals(user)
+
     summary = {
-        "total_sessions": result[0] if result else 0,
-        "total_duration": str(result[1]) if result[1] else "0:00:00"
+        "total_sessions": totals["total_sessions"],
+        "total_duration": str(totals["total_duration"]) if totals["total_seconds"] else "0:00:00"
     }
     return jsonify(summary)
 
@@ -374,49 +424,63 @@ def parse_dt(v):
     s = str(v).strip().replace("T", " ")
     return datetime.fromisoformat(s)
 
-@app.route('/add-session', methods=['POST'])
-def add_session():
-    data = request.get_json(silent=True) or {}
+SESSION_UPSERT_SQL = """
+    INSERT INTO sessions (user_id, session_start, session_end, total_duration, location)
+    VALUES %s
+    ON CONFLICT (user_id, session_start, session_end)
+    DO UPDATE SET
+        total_duration = EXCLUDED.total_duration,
+        location = COALESCE(EXCLUDED.location, sessions.location);
+"""
+SESSION_ROW_TEMPLATE = "(%s, %s, %s, make_interval(secs => %s), %s)"
 
+
+def session_row(data: dict) -> tuple:
+    """Validate an /add-session payload and return the sessions row (raises ValueError)."""
     required = ["user_id", "session_start", "session_end"]
     missing = [k for k in required if not data.get(k)]
     if missing:
-        return jsonify({"error": f"Missing fields: {missing}"}), 400
+        raise ValueError(f"Missing fields: {missing}")
 
     # Prefer seconds
     if data.get("total_duration_seconds") is not None:
         try:
             secs = float(data["total_duration_seconds"])
         except Exception:
-            return jsonify({"error": "total_duration_seconds must be numeric"}), 400
+            raise ValueError("total_duration_seconds must be numeric")
     elif data.get("total_duration") is not None:
         try:
             hours = float(data["total_duration"])
         except Exception:
-            return jsonify({"error": "total_duration must be numeric hours OR provide total_duration_seconds"}), 400
+            raise ValueError("total_duration must be numeric hours OR provide total_duration_seconds")
         secs = hours * 3600.0
     else:
-        return jsonify({"error": "Missing total_duration_seconds or total_duration"}), 400
+        raise ValueError("Missing total_duration_seconds or total_duration")
 
     location = data.get("location")
 
+    return (
+        data["user_id"],
+        parse_dt(data["session_start"]),
+        parse_dt(data["session_end"]),
+        secs,
+        Json(location) if location else None
+    )
+
+
+@app.route('/add-session', methods=['POST'])
+def add_session():
+    data = request.get_json(silent=True) or {}
+
+    try:
+        row = session_row(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
-        with connect_db() as conn:
+        with get_conn() as conn:
             with conn.cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO sessions (user_id, session_start, session_end, total_duration, location)
-                    VALUES (%s, %s, %s, make_interval(secs => %s), %s)
-                    ON CONFLICT (user_id, session_start, session_end)
-                    DO UPDATE SET
-                        total_duration = EXCLUDED.total_duration,
-                        location = COALESCE(EXCLUDED.location, sessions.location);
-                """, (
-                    data["user_id"],
-                    parse_dt(data["session_start"]),
-                    parse_dt(data["session_end"]),
-                    secs,
-                    Json(location) if location else None
-                ))
+                execute_values(cursor, SESSION_UPSERT_SQL, [row], template=SESSION_ROW_TEMPLATE)
         return jsonify({"message": "Session upserted"}), 200
 
     except Exception as e:
@@ -424,45 +488,39 @@ def add_session():
 
 
 
+LOG_INSERT_SQL = "INSERT INTO logs (user_id, log_timestamp, log_content) VALUES %s"
+LOG_ROW_TEMPLATE = "(%s, %s, %s)"
+
+
+def log_row(data: dict) -> tuple:
+    missing = [k for k in ("user_id", "log_timestamp", "log_content") if k not in data]
+    if missing:
+        raise ValueError(f"Missing fields: {missing}")
+    return (data['user_id'], data['log_timestamp'], data['log_content'])
+
+
 # API Endpoint: Add a log
 @app.route('/add-log', methods=['POST'])
 def add_log():
     data = request.json
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute('''INSERT INTO logs (user_id, log_timestamp, log_content)
-                      VALUES (%s, %s, %s)''',
-                   (data['user_id'], data['log_timestamp'], data['log_content']))
-    conn.commit()
-    conn.close()
+    with get_conn() as conn, conn.cursor() as cursor:
+        execute_values(cursor, LOG_INSERT_SQL, [log_row(data)], template=LOG_ROW_TEMPLATE)
     return jsonify({"message": "Log added successfully"})
 
 @app.route('/metrics', methods=['GET'])
 def get_metrics():
     try:
         user_filter = request.args.get('user')
-        conn = connect_db()
-        cursor = conn.cursor()
-
-        # Total active users
-        cursor.execute("SELECT COUNT(DISTINCT user_id) FROM sessions")
-        active_users = cursor.fetchone()[0]
 
-        # Total hours logged (Handle timedelta conversion)
-        cursor.execute("SELECT SUM(total_duration) FROM sessions")  # duration should be timedelta
-        total_duration = cursor.fetchone()[0] or timedelta(0)  # Handle null or empty result
+        # Total active users / hours / average per session, from the rollup
+        totals = rollup.overall_totals()
+        active_users = totals["active_users"]
 
         # Convert total_duration to hours
-        total_hours = total_duration.total_seconds() / 3600  # Convert to hours
-
-        # Average time spent per session (Handle timedelta conversion)
-        cursor.execute("SELECT AVG(total_duration) FROM sessions")  # duration should be timedelta
-        avg_time = cursor.fetchone()[0] or timedelta(0)  # Handle null or empty result
+        total_hours = totals["total_seconds"] / 3600  # Convert to hours
 
         # Convert avg_time to hours
-        avg_duration = avg_time.total_seconds() / 3600  # Convert to hours
-
-        conn.close()
+        avg_duration = totals["avg_seconds"] / 3600  # Convert to hours
 
         # Return as JSON
         return jsonify({
@@ -475,42 +533,96 @@ def get_metrics():
         return jsonify({"error": "There was a problem with the database query.", "details": str(e)}), 500
 
 
+EXPORT_ITERSIZE = int(os.getenv("EXPORT_ITERSIZE", "2000"))
+EXPORT_COLUMNS = ["user_id", "session_start", "session_end", "total_duration", "location"]
+
+
+def export_record(r):
+    return {
+        "user_id": r[0] if r[0] is not None else "Unknown",
+        "session_start": r[1].isoformat() if r[1] is not None else "N/A",
+        "session_end": r[2].isoformat() if r[2] is not None else "N/A",
+        "total_duration": r[3].total_seconds() if r[3] is not None else 0,
+        "location": r[4]  # ✅ NEW
+    }
+
+
+def iter_server_cursor(sql, params=()):
+    """
+    Stream rows through a named (server-side) cursor so only EXPORT_ITERSIZE rows
+    are held in memory at a time. The pooled connection is held until the
+    generator is exhausted or closed.
+    """
+    with get_conn() as conn:
+        with conn.cursor(name=f"export_{uuid.uuid4().hex}") as cur:
+            cur.itersize = EXPORT_ITERSIZE
+            cur.execute(sql, params)
+            for row in cur:
+                yield row
+
+
 @app.route('/export-data', methods=['GET'])
 def export_data():
-    """Fetches session data for export."""
+    """
+    Streams session data for export.
+    ?format=json (default, one JSON array) | ndjson | csv
+    """
     user_filter = request.args.get("user_filter")  
-    conn = connect_db()
-    cursor = conn.cursor()
+    fmt = (request.args.get("format") or "json").lower()
+    if fmt not in ("json", "ndjson", "csv"):
+        return jsonify({"error": f"Unsupported format: {fmt}"}), 400
 
+    sql = "SELECT user_id, session_start, session_end, total_duration, location FROM sessions"
+    params = ()
     if user_filter and user_filter != "All Users":
-        cursor.execute("SELECT user_id, session_start, session_end, total_duration FROM sessions WHERE user_id = %s", (user_filter,))
-    else:
-        cursor.execute("SELECT user_id, session_start, session_end, total_duration, location FROM sessions")
-
-
-    records = cursor.fetchall()
-    conn.close()
-
-    if not records:
-        return jsonify({"error": "No data found"}), 404  # Return error if no data
+        sql += " WHERE user_id = %s"
+        params = (user_filter,)
+    sql += " ORDER BY session_id"
 
+    rows = iter_server_cursor(sql, params)
     try:
-        data = [
-            {
-                "user_id": r[0] if r[0] is not None else "Unknown",
-                "session_start": r[1].isoformat() if r[1] is not None else "N/A",
-                "session_end": r[2].isoformat() if r[2] is not None else "N/A",
-                "total_duration": r[3].total_seconds() if r[3] is not None else 0,
-                "location": r[4]  # ✅ NEW
-            }
-            for r in records
-        ]
-
-        return jsonify(data)
+        first = next(rows)
+    except StopIteration:
+        return jsonify({"error": "No data found"}), 404  # Return error if no data
 
-    except Exception as e:
-        print(f"Error: {e}")
-        return jsonify({"error": "Failed to serialize data"}), 500
+    def records():
+        yield export_record(first)
+        for r in rows:
+            yield export_record(r)
+
+    def as_json():
+        yield "["
+        for i, rec in enumerate(records()):
+            yield ("," if i else "") + json.dumps(rec, default=str)
+        yield "]"
+
+    def as_ndjson():
+        for rec in records():
+            yield json.dumps(rec, default=str) + "\n"
+
+    def as_csv():
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(EXPORT_COLUMNS)
+        for rec in records():
+            loc = rec["location"]
+            writer.writerow([rec[c] for c in EXPORT_COLUMNS[:-1]] + [json.dumps(loc) if loc else ""])
+            if buf.tell() > 64 * 1024:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+
+    body, mimetype = {
+        "json": (as_json, "application/json"),
+        "ndjson": (as_ndjson, "application/x-ndjson"),
+        "csv": (as_csv, "text/csv"),
+    }[fmt]
+
+    resp = Response(stream_with_context(body()), mimetype=mimetype)
+    if fmt == "csv":
+        resp.headers["Content-Disposition"] = "attachment; filename=sessions_export.csv"
+    return resp
 
 @app.route('/delete-session', methods=['DELETE'])
 def delete_session():
@@ -519,21 +631,53 @@ def delete_session():
     user_id = data.get("user")  # Fix: Ensure correct key name
     session_start = data.get("session_start")
 
-    conn = connect_db()
-    cursor = conn.cursor()
+    deleted = exec_sql("DELETE FROM sessions WHERE user_id = %s AND session_start = %s", (user_id, session_start))
 
-    cursor.execute("DELETE FROM sessions WHERE user_id = %s AND session_start = %s", (user_id, session_start))
-    conn.commit()
-
-    if cursor.rowcount == 0:  # No rows deleted (session not found)
-        conn.close()
+    if deleted == 0:  # No rows deleted (session not found)
         return jsonify({"error": "Session not found or already deleted"}), 404
-
-    conn.close()
     return jsonify({"message": f"Session for {user_id} at {session_start} deleted successfully."})
 
 from psycopg2.extras import Json
 
+CRASH_INSERT_SQL = """
+    INSERT INTO crashes (
+        user_id, session_start, session_end, crash_time,
+        event_id, provider, exception_code, faulting_module, message,
+        location, signature
+    )
+    VALUES %s
+"""
+CRASH_ROW_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+
+
+def crash_row(data: dict) -> tuple:
+    """Validate an /add-crash payload and return the crashes row (raises ValueError)."""
+    if "user_id" not in data:
+        raise ValueError("Missing fields: ['user_id']")
+
+    crash_time = parse_dt_flexible(data.get("crash_time"))
+    sess_start = parse_dt_flexible(data.get("session_start"))
+    sess_end   = parse_dt_flexible(data.get("session_end"))
+    event_id = int(data.get("event_id") or 0)
+
+    return (
+        data.get("user_id"),
+        sess_start,
+        sess_end,
+        crash_time,
+        event_id,
+        data.get("provider", ""),
+        data.get("exception_code", ""),
+        data.get("faulting_module", ""),
+        data.get("message", ""),
+        Json(data.get("location")) if data.get("location") else None,
+        # fingerprint computed once here; crash_groups' trigger keeps the group counts
+        crash_groups.crash_signature(
+            data.get("exception_code"), data.get("faulting_module"), event_id, data.get("message")
+        ),
+    )
+
+
 @app.route('/add-crash', methods=['POST'])
 def add_crash():
     data = request.get_json(silent=True) or {}
@@ -542,44 +686,12 @@ def add_crash():
         return jsonify({"error": "Missing fields: ['user_id']"}), 400
 
     try:
-        crash_time = parse_dt_flexible(data.get("crash_time"))
-        sess_start = parse_dt_flexible(data.get("session_start"))
-        sess_end   = parse_dt_flexible(data.get("session_end"))
+        row = crash_row(data)
+        crash_notify.ensure()   # groups + email queue triggers
 
-        with connect_db() as conn:
+        with get_conn() as conn:
             with conn.cursor() as cursor:
-                cursor.execute('''
-                    INSERT INTO crashes (
-                        user_id, session_start, session_end, crash_time,
-                        event_id, provider, exception_code, faulting_module, message,
-                        location
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ''', (
-                    data.get("user_id"),
-                    sess_start,
-                    sess_end,
-                    crash_time,
-                    int(data.get("event_id") or 0),
-                    data.get("provider", ""),
-                    data.get("exception_code", ""),
-                    data.get("faulting_module", ""),
-                    data.get("message", ""),
-                    Json(data.get("location")) if data.get("location") else None
-                ))
-
-        # ✅ Build a safe payload for email (strings only)
-        email_payload = {
-            **data,
-            "crash_time": crash_time.strftime("%Y-%m-%d %H:%M:%S") if crash_time else data.get("crash_time"),
-            "session_start": sess_start.strftime("%Y-%m-%d %H:%M:%S") if sess_start else data.get("session_start"),
-            "session_end": sess_end.strftime("%Y-%m-%d %H:%M:%S") if sess_end else data.get("session_end"),
-        }
-
-        print("[EMAIL] Queuing crash email...", flush=True)
-
-        # ✅ Send email in background so request returns fast
-        Thread(target=send_crash_email_to_admin, args=(email_payload,), daemon=True).start()
+                execute_values(cursor, CRASH_INSERT_SQL, [row], template=CRASH_ROW_TEMPLATE)
 
         return jsonify({"message": "Crash recorded successfully"}), 200
 
@@ -592,15 +704,7 @@ def get_crashes():
     user_filter = request.args.get('user')
     since_id = request.args.get('since_id')
 
-    conn = connect_db()
-    cursor = conn.cursor()
-
-    sql = """
-      SELECT crash_id, user_id, session_start, session_end, crash_time,
-             event_id, provider, exception_code, faulting_module, message,
-             location
-      FROM crashes
-    """
+    sql = f"SELECT {crash_feed.CRASH_COLUMNS} FROM crashes"
     params = []
     clauses = []
 
@@ -617,30 +721,94 @@ def get_crashes():
 
     sql += " ORDER BY crash_id DESC LIMIT 200"
 
-    cursor.execute(sql, tuple(params))
-    rows = cursor.fetchall()
-    conn.close()
-
-    def fmt_dt(x):
-        return x.strftime('%Y-%m-%d %H:%M:%S') if x else ""
-
-    out = []
-    for r in rows:
-        out.append({
-            "crash_id": r[0],
-            "user_id": r[1],
-            "session_start": fmt_dt(r[2]),
-            "session_end": fmt_dt(r[3]),
-            "crash_time": fmt_dt(r[4]),
-            "event_id": r[5],
-            "provider": r[6],
-            "exception_code": r[7],
-            "faulting_module": r[8],
-            "message": r[9],
-            "location": r[10],  # ✅ NEW
-        })
+    crash_groups.ensure()
+    rows = qall(sql, tuple(params))
+
+    return jsonify([crash_feed.crash_record(r) for r in rows])
+
+
+def sse_event(event: str, data, event_id=None) -> str:
+    out = f"event: {event}\n"
+    if event_id is not None:
+        out += f"id: {event_id}\n"
+    return out + f"data: {json.dumps(data)}\n\n"
+
+
+@app.route('/crashes/stream', methods=['GET'])
+def stream_crashes():
+    """
+    Server-Sent Events feed of new crashes, replacing /crashes?since_id= polling.
+
+    Each `crashes` event carries a JSON list of crashes (oldest first) and the
+    newest crash_id as its event id, so a reconnecting EventSource (or ?since_id=)
+    first gets what it missed, in pages of CRASH_FEED_BACKLOG crashes. Comment
+    lines keep idle connections open.
+    """
+    user_filter = request.args.get('user')
+    since = request.headers.get('Last-Event-ID') or request.args.get('since_id')
+    try:
+        since_id = int(since) if since else None
+    except ValueError:
+        return jsonify({"error": "since_id must be an integer"}), 400
 
-    return jsonify(out)
+    try:
+        sub = crash_feed.subscribe(user_filter)
+    except crash_feed.FeedFull as e:
+        return jsonify({"error": str(e)}), 503
+
+    try:
+        # subscribed first, so nothing lands between the backlog and the feed
+        missed = crash_feed.backlog(user_filter, since_id) if since_id is not None else []
+    except Exception:
+        crash_feed.unsubscribe(sub)
+        raise
+
+    def generate():
+        last = since_id or 0
+        # notified rows may also be in the backlog; ids are notified only once
+        # otherwise, and may commit out of order, so only these are skipped
+        replayed = set()
+        try:
+            yield f"retry: {int(crash_feed.CRASH_FEED_HEARTBEAT * 1000)}\n\n"
+            page = missed
+            while page:
+                replayed.update(c["crash_id"] for c in page)
+                last = page[-1]["crash_id"]
+                yield sse_event("crashes", page, last)
+                if len(page) < crash_feed.CRASH_FEED_BACKLOG:
+                    break
+                # a full page: keep replaying until caught up with the feed
+                page = crash_feed.backlog(user_filter, last)
+            while True:
+                batch = sub.next(crash_feed.CRASH_FEED_HEARTBEAT)
+                if batch is None:
+                    return  # fell behind; the client reconnects from `last`
+                batch = [c for c in batch if c["crash_id"] not in replayed]
+                if not batch:
+                    yield ": keepalive\n\n"
+                    continue
+                last = max(last, batch[-1]["crash_id"])
+                yield sse_event("crashes", batch, last)
+        finally:
+            crash_feed.unsubscribe(sub)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route('/crash-groups', methods=['GET'])
+def get_crash_groups():
+    """Pre-grouped crashes (one row per signature), optionally for one user."""
+    user_filter = request.args.get('user')
+    try:
+        limit = max(1, min(int(request.args.get('limit', 100)), 1000))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    return jsonify(crash_groups.groups(user_filter, limit))
 
 
 
@@ -931,36 +1099,45 @@ def release_progress(release_id):
 
 from psycopg2.extras import Json
 
+ENV_SNAPSHOT_INSERT_SQL = """
+    INSERT INTO env_snapshots (
+      snapshot_id, user_id, session_id, timestamp,
+      os_name, os_release, os_version, machine, processor,
+      cpu_count_logical, cpu_count_physical, total_ram_gb, toolchain
+    )
+    VALUES %s
+    ON CONFLICT (snapshot_id) DO NOTHING
+"""
+ENV_SNAPSHOT_ROW_TEMPLATE = "(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)"
+
+
+def env_snapshot_row(data: dict) -> tuple:
+    return (
+        data.get("snapshot_id"),
+        data.get("user_id"),
+        data.get("session_id"),
+        data.get("timestamp"),
+        data.get("os_name"),
+        data.get("os_release"),
+        data.get("os_version"),
+        data.get("machine"),
+        data.get("processor"),
+        data.get("cpu_count_logical"),
+        data.get("cpu_count_physical"),
+        data.get("total_ram_gb"),
+        Json(data.get("toolchain")) if data.get("toolchain") else None
+    )
+
+
 @app.route("/add-env-snapshot", methods=["POST"])
 def add_env_snapshot():
     data = request.get_json(silent=True) or {}
 
     try:
-        with connect_db() as conn:
+        with get_conn() as conn:
             with conn.cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO env_snapshots (
-                      snapshot_id, user_id, session_id, timestamp,
-                      os_name, os_release, os_version, machine, processor,
-                      cpu_count_logical, cpu_count_physical, total_ram_gb, toolchain
-                    )
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                    ON CONFLICT (snapshot_id) DO NOTHING
-                """, (
-                    data.get("snapshot_id"),
-                    data.get("user_id"),
-                    data.get("session_id"),
-                    data.get("timestamp"),
-                    data.get("os_name"),
-                    data.get("os_release"),
-                    data.get("os_version"),
-                    data.get("machine"),
-                    data.get("processor"),
-                    data.get("cpu_count_logical"),
-                    data.get("cpu_count_physical"),
-                    data.get("total_ram_gb"),
-                    Json(data.get("toolchain")) if data.get("toolchain") else None
-                ))
+                execute_values(cursor, ENV_SNAPSHOT_INSERT_SQL, [env_snapshot_row(data)],
+                               template=ENV_SNAPSHOT_ROW_TEMPLATE)
 
         return jsonify({"message": "env snapshot stored"}), 200
 
@@ -968,6 +1145,171 @@ def add_env_snapshot():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+
+# =========================
+# BATCH INGEST (sessions, logs, crashes, env snapshots in one round trip)
+# =========================
+
+INGEST_BATCH_MAX = int(os.getenv("INGEST_BATCH_MAX", "1000"))
+
+# event type -> (row builder, multi-row INSERT, VALUES template)
+INGEST_TYPES = {
+    "session": (session_row, SESSION_UPSERT_SQL, SESSION_ROW_TEMPLATE),
+    "log": (log_row, LOG_INSERT_SQL, LOG_ROW_TEMPLATE),
+    "crash": (crash_row, CRASH_INSERT_SQL, CRASH_ROW_TEMPLATE),
+    "env_snapshot": (env_snapshot_row, ENV_SNAPSHOT_INSERT_SQL, ENV_SNAPSHOT_ROW_TEMPLATE),
+}
+
+
+def normalize_event_type(t) -> str:
+    """Accept 'session', 'add-session', 'env-snapshot', ... -> 'session' / 'env_snapshot'"""
+    t = str(t or "").strip().lower()
+    if t.startswith("add-") or t.startswith("add_"):
+        t = t[4:]
+    return t.replace("-", "_")
+
+
+def parse_ingest_body():
+    return parse_ingest_text(request.get_data(as_text=True))
+
+
+def parse_ingest_text(body: str) -> list:
+    """
+    Accept:
+    - JSON list of events
+    - {"events": [...]}
+    - NDJSON (one event per line); unparseable lines become per-item errors
+    """
+    body = (body or "").strip()
+    if not body:
+        return []
+
+    try:
+        doc = json.loads(body)
+    except ValueError:
+        doc = None
+
+    if isinstance(doc, list):
+        return doc
+    if isinstance(doc, dict):
+        return doc["events"] if isinstance(doc.get("events"), list) else [doc]
+
+    events = []
+    for line in body.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            events.append(json.loads(line))
+        except ValueError as e:
+            events.append(e)
+    return events
+
+
+def insert_ingest_group(cursor, sql, template, items, results):
+    """
+    One multi-row INSERT for all rows of a type. If it fails, retry row by row
+    under savepoints so only the offending items are reported as failed.
+    """
+    cursor.execute("SAVEPOINT ingest_group")
+    try:
+        execute_values(cursor, sql, [row for _, row in items], template=template, page_size=500)
+        cursor.execute("RELEASE SAVEPOINT ingest_group")
+        for i, _ in items:
+            results[i]["status"] = "ok"
+        return
+    except psycopg2.Error:
+        cursor.execute("ROLLBACK TO SAVEPOINT ingest_group")
+
+    for i, row in items:
+        cursor.execute("SAVEPOINT ingest_item")
+        try:
+            execute_values(cursor, sql, [row], template=template)
+            cursor.execute("RELEASE SAVEPOINT ingest_item")
+            results[i]["status"] = "ok"
+        except psycopg2.Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT ingest_item")
+            results[i].update({"status": "error", "error": str(e).strip()})
+
+
+def ingest_summary(results: list) -> dict:
+    failed = sum(1 for r in results if r["status"] != "ok")
+    return {"results": results, "ok": len(results) - failed, "failed": failed}
+
+
+def classify_ingest_events(events: list):
+    """
+    Validate events and group their rows by type.
+    Returns (results, {type: [(index, row)]}); items that failed validation
+    already carry their error in results.
+    """
+    results = []
+    groups = {t: [] for t in INGEST_TYPES}
+
+    for i, ev in enumerate(events):
+        res = {"index": i, "id": None, "type": None, "status": "error"}
+        results.append(res)
+
+        if isinstance(ev, ValueError):
+            res["error"] = f"Invalid JSON: {ev}"
+            continue
+        if not isinstance(ev, dict):
+            res["error"] = "Event must be an object"
+            continue
+
+        res["id"] = ev.get("id")
+        t = normalize_event_type(ev.get("type"))
+        res["type"] = t
+        data = ev["data"] if isinstance(ev.get("data"), dict) else ev
+
+        if t not in INGEST_TYPES:
+            res["error"] = f"Unknown event type: {ev.get('type')!r}"
+            continue
+
+        try:
+            row = INGEST_TYPES[t][0](data)
+        except (ValueError, TypeError) as e:
+            res["error"] = str(e)
+            continue
+
+        groups[t].append((i, row))
+
+    return results, groups
+
+
+@app.route("/ingest/batch", methods=["POST"])
+def ingest_batch():
+    """
+    Body: list of {"type": "session"|"log"|"crash"|"env_snapshot", "id": <client id>, "data": {...}}
+    (fields may also be given inline instead of under "data").
+
+    Returns per-item status so the client can retry only what failed:
+      {"results": [{"index", "id", "type", "status": "ok"|"error", "error"?}], "ok": n, "failed": m}
+    """
+    events = parse_ingest_body()
+    if len(events) > INGEST_BATCH_MAX:
+        return jsonify({"error": f"Batch too large ({len(events)} > {INGEST_BATCH_MAX})"}), 413
+
+    results, groups = classify_ingest_events(events)
+
+    try:
+        if groups["crash"]:
+            crash_notify.ensure()
+        with get_conn() as conn:
+            with conn.cursor() as cursor:
+                for t, items in groups.items():
+                    if items:
+                        _, sql, template = INGEST_TYPES[t]
+                        insert_ingest_group(cursor, sql, template, items, results)
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+    body = ingest_summary(results)
+    return jsonify(body), (207 if body["failed"] else 200)
+
 # Run the app
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=int(os.getenv("PORT", "5000")), debug=False)
@@ -0,0 +1,336 @@
+"""
+ASGI entry point for the tracker API.
+
+The ingestion endpoints (/add-session, /add-log, /add-crash,
+/add-env-snapshot, /ingest/batch) run as async handlers on an asyncpg pool,
+so a burst of session-end uploads waits on the database without holding a
+worker thread each. /crashes/stream is async too, so open dashboards do not
+hold threads either. Every other endpoint is the Flask app (app.py), mounted
+behind a2wsgi on a bounded thread pool.
+
+Validation, row building and the INSERT statements are the ones app.py
+uses; only the driver differs. Crash emails are queued by a trigger and sent
+by the crash_notify worker, so no endpoint waits on them.
+
+Run:
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT --workers N
+
+The Flask-only deployment (gunicorn app:app) keeps working unchanged.
+"""
+import asyncio
+import json
+import os
+import re
+import traceback
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from decimal import Decimal
+
+import asyncpg
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as api
+import crash_feed
+import crash_notify
+import db
+from psycopg2.extras import Json
+
+
+# ----------------------------
+# Config
+# ----------------------------
+ASYNC_DB_POOL_MIN = int(os.getenv("ASYNC_DB_POOL_MIN", str(db.DB_POOL_MIN)))
+ASYNC_DB_POOL_MAX = int(os.getenv("ASYNC_DB_POOL_MAX", str(db.DB_POOL_MAX)))
+ASYNC_DB_POOL_TIMEOUT = float(os.getenv("ASYNC_DB_POOL_TIMEOUT", str(db.DB_POOL_TIMEOUT)))
+WSGI_THREADS = int(os.getenv("WSGI_THREADS", "32"))   # threads serving the mounted Flask app
+
+
+# ----------------------------
+# Pool
+# ----------------------------
+_pool = None
+
+
+async def _init_conn(conn):
+    for typename in ("json", "jsonb"):
+        await conn.set_type_codec(typename, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    global _pool
+    _pool = await asyncpg.create_pool(
+        db.database_url(),
+        min_size=ASYNC_DB_POOL_MIN,
+        max_size=ASYNC_DB_POOL_MAX,
+        init=_init_conn,
+        max_inactive_connection_lifetime=db.DB_POOL_MAX_AGE,
+    )
+    print(f"[ASGI] asyncpg pool ready ({ASYNC_DB_POOL_MIN}-{ASYNC_DB_POOL_MAX})", flush=True)
+    try:
+        yield
+    finally:
+        await _pool.close()
+        _pool = None
+
+
+def acquire():
+    return _pool.acquire(timeout=ASYNC_DB_POOL_TIMEOUT)
+
+
+# ----------------------------
+# Statements and parameters
+# ----------------------------
+def numbered(sql: str, template: str) -> str:
+    """psycopg2 'VALUES %s' + row template -> asyncpg single-row statement with $1..$n."""
+    n = iter(range(1, template.count("%s") + 1))
+    row = re.sub(r"%s", lambda _: f"${next(n)}", template)
+    return sql.replace("VALUES %s", f"VALUES {row}")
+
+
+INGEST_SQL = {t: numbered(sql, template) for t, (_, sql, template) in api.INGEST_TYPES.items()}
+
+_TIME_TYPES = {"timestamp", "timestamptz", "date"}
+_INT_TYPES = {"int2", "int4", "int8"}
+
+
+def coerce(value, typename: str):
+    """
+    Adapt a row value built for psycopg2 to what asyncpg expects for the
+    parameter's type (asyncpg does not parse strings into timestamps etc.).
+    """
+    if isinstance(value, Json):
+        value = value.adapted
+    if value is None:
+        return None
+    if typename in _TIME_TYPES:
+        if isinstance(value, (datetime, date)):
+            return value
+        parsed = api.parse_dt_flexible(value)
+        if parsed is None:
+            raise ValueError(f"Invalid timestamp: {value!r}")
+        return parsed.date() if typename == "date" else parsed
+    if typename in _INT_TYPES:
+        return int(value)
+    if typename in ("float4", "float8"):
+        return float(value)
+    if typename == "numeric":
+        return Decimal(str(value))
+    if typename in ("text", "varchar", "bpchar", "name"):
+        return value if isinstance(value, str) else str(value)
+    return value
+
+
+_param_types = {}   # statement -> parameter type names (same on every connection)
+
+
+async def prepare_rows(conn, sql, items, results) -> list:
+    """Coerce each (index, row) to the statement's parameter types; bad rows become item errors."""
+    types = _param_types.get(sql)
+    if types is None:
+        types = _param_types[sql] = [p.name for p in (await conn.prepare(sql)).get_parameters()]
+    ready = []
+    for i, row in items:
+        try:
+            ready.append((i, tuple(coerce(v, t) for v, t in zip(row, types))))
+        except (ValueError, TypeError, ArithmeticError) as e:
+            results[i].update({"status": "error", "error": str(e)})
+    return ready
+
+
+async def insert_group(conn, sql, items, results):
+    """Async twin of app.insert_ingest_group: one executemany, then row by row under savepoints."""
+    try:
+        async with conn.transaction():
+            await conn.executemany(sql, [row for _, row in items])
+        for i, _ in items:
+            results[i]["status"] = "ok"
+        return
+    except (asyncpg.PostgresError, asyncpg.DataError):
+        pass
+
+    for i, row in items:
+        try:
+            async with conn.transaction():
+                await conn.execute(sql, *row)
+            results[i]["status"] = "ok"
+        except (asyncpg.PostgresError, asyncpg.DataError) as e:
+            results[i].update({"status": "error", "error": str(e).strip()})
+
+
+async def ingest(groups, results):
+    if groups.get("crash"):
+        await run_in_threadpool(crash_notify.ensure)
+    async with acquire() as conn:
+        async with conn.transaction():
+            for t, items in groups.items():
+                if items:
+                    items = await prepare_rows(conn, INGEST_SQL[t], items, results)
+                    if items:
+                        await insert_group(conn, INGEST_SQL[t], items, results)
+
+
+async def json_body(request) -> dict:
+    try:
+        data = json.loads(await request.body() or b"{}")
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def error(message, status):
+    return JSONResponse({"error": str(message)}, status_code=status)
+
+
+# ----------------------------
+# Endpoints
+# ----------------------------
+async def add_single(request, event_type, message):
+    """Shared body of the /add-* endpoints: validate, insert one row, report."""
+    data = await json_body(request)
+    try:
+        row = api.INGEST_TYPES[event_type][0](data)
+    except (ValueError, TypeError) as e:
+        return error(e, 400)
+
+    results = [{"index": 0, "status": "error"}]
+    try:
+        await ingest({event_type: [(0, row)]}, results)
+    except asyncio.TimeoutError:
+        return error("No database connection available", 503)
+    except Exception as e:
+        traceback.print_exc()
+        return error(e, 500)
+
+    if results[0]["status"] != "ok":
+        return error(results[0].get("error"), 500)
+    return JSONResponse({"message": message})
+
+
+async def add_session(request):
+    return await add_single(request, "session", "Session upserted")
+
+
+async def add_log(request):
+    return await add_single(request, "log", "Log added successfully")
+
+
+async def add_crash(request):
+    return await add_single(request, "crash", "Crash recorded successfully")
+
+
+async def add_env_snapshot(request):
+    return await add_single(request, "env_snapshot", "env snapshot stored")
+
+
+async def ingest_batch(request):
+    """Same contract as app.ingest_batch (per-item results, 207 on partial failure)."""
+    events = api.parse_ingest_text((await request.body()).decode("utf-8", errors="replace"))
+    if len(events) > api.INGEST_BATCH_MAX:
+        return error(f"Batch too large ({len(events)} > {api.INGEST_BATCH_MAX})", 413)
+
+    results, groups = api.classify_ingest_events(events)
+    try:
+        await ingest(groups, results)
+    except asyncio.TimeoutError:
+        return error("No database connection available", 503)
+    except Exception as e:
+        traceback.print_exc()
+        return error(e, 500)
+
+    body = api.ingest_summary(results)
+    return JSONResponse(body, status_code=207 if body["failed"] else 200)
+
+
+async def stream_crashes(request):
+    """
+    Async twin of app.stream_crashes: same events and backlog replay, but an
+    open stream waits on the event loop instead of holding one of the
+    WSGI_THREADS, so CRASH_FEED_MAX_CLIENTS streams cannot starve the
+    Flask endpoints.
+    """
+    user_filter = request.query_params.get("user")
+    since = request.headers.get("last-event-id") or request.query_params.get("since_id")
+    try:
+        since_id = int(since) if since else None
+    except ValueError:
+        return error("since_id must be an integer", 400)
+
+    try:
+        sub = crash_feed.subscribe(user_filter, kind=crash_feed.AsyncSubscription)
+    except crash_feed.FeedFull as e:
+        return error(e, 503)
+
+    try:
+        # subscribed first, so nothing lands between the backlog and the feed
+        missed = await run_in_threadpool(crash_feed.backlog, user_filter, since_id) if since_id is not None else []
+    except Exception:
+        crash_feed.unsubscribe(sub)
+        raise
+
+    async def generate():
+        last = since_id or 0
+        replayed = set()
+        try:
+            yield f"retry: {int(crash_feed.CRASH_FEED_HEARTBEAT * 1000)}\n\n"
+            page = missed
+            while page:
+                replayed.update(c["crash_id"] for c in page)
+                last = page[-1]["crash_id"]
+                yield api.sse_event("crashes", page, last)
+                if len(page) < crash_feed.CRASH_FEED_BACKLOG:
+                    break
+                page = await run_in_threadpool(crash_feed.backlog, user_filter, last)
+            while True:
+                batch = await sub.next_async(crash_feed.CRASH_FEED_HEARTBEAT)
+                if batch is None:
+                    return  # fell behind; the client reconnects from `last`
+                batch = [c for c in batch if c["crash_id"] not in replayed]
+                if not batch:
+                    yield ": keepalive\n\n"
+                    continue
+                last = max(last, batch[-1]["crash_id"])
+                yield api.sse_event("crashes", batch, last)
+        finally:
+            crash_feed.unsubscribe(sub)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def health_async_pool(request):
+    if _pool is None:
+        return error("Pool not started", 503)
+    return JSONResponse({
+        "size": _pool.get_size(),
+        "idle": _pool.get_idle_size(),
+        "min": _pool.get_min_size(),
+        "max": _pool.get_max_size(),
+    })
+
+
+app = Starlette(
+    routes=[
+        Route("/add-session", add_session, methods=["POST"]),
+        Route("/add-log", add_log, methods=["POST"]),
+        Route("/add-crash", add_crash, methods=["POST"]),
+        Route("/add-env-snapshot", add_env_snapshot, methods=["POST"]),
+        Route("/ingest/batch", ingest_batch, methods=["POST"]),
+        Route("/crashes/stream", stream_crashes, methods=["GET"]),
+        Route("/health/async-pool", health_async_pool, methods=["GET"]),
+        # everything else: the Flask app
+        Mount("/", app=WSGIMiddleware(api.app, workers=WSGI_THREADS)),
+    ],
+    # same open CORS policy as flask_cors.CORS(app)
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+    lifespan=lifespan,
+)
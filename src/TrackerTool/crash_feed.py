@@ -0,0 +1,278 @@
+"""
+Push feed of new crashes.
+
+A trigger on `crashes` sends NOTIFY crash_feed with the crash_id of every
+inserted row, whichever endpoint inserted it (/add-crash, /ingest/batch).
+Each API process runs one listener thread on a dedicated connection
+(db.connect_db) that reads the notified rows once and hands them to every
+subscribed /crashes/stream client, so open dashboards no longer poll
+/crashes?since_id= or hold pooled connections.
+
+Under asgi.py the stream is an async handler (AsyncSubscription), so an
+open stream holds no thread. The Flask route holds a request thread per
+client: when serving app.py alone, run a threaded worker (gunicorn -k
+gthread --threads N) and keep CRASH_FEED_MAX_CLIENTS below the thread count.
+"""
+import asyncio
+import os
+import queue
+import select
+import threading
+import time
+
+import migrations
+from db import connect_db, qall
+
+
+# ----------------------------
+# Config
+# ----------------------------
+CRASH_FEED_CHANNEL = "crash_feed"
+CRASH_FEED_HEARTBEAT = float(os.getenv("CRASH_FEED_HEARTBEAT", "15"))      # seconds between keepalive comments
+CRASH_FEED_QUEUE = int(os.getenv("CRASH_FEED_QUEUE", "100"))               # batches buffered per client
+CRASH_FEED_MAX_CLIENTS = int(os.getenv("CRASH_FEED_MAX_CLIENTS", "100"))   # concurrent streams per process
+CRASH_FEED_BACKLOG = int(os.getenv("CRASH_FEED_BACKLOG", "1000"))          # rows per page replayed on reconnect
+
+FEED_MIGRATION = 8    # the NOTIFY trigger, see migrations.py
+
+# Columns of a crash as served by /crashes and the stream
+CRASH_COLUMNS = """
+    crash_id, user_id, session_start, session_end, crash_time,
+    event_id, provider, exception_code, faulting_module, message,
+    location, signature
+"""
+
+
+def crash_record(r) -> dict:
+    def fmt_dt(x):
+        return x.strftime('%Y-%m-%d %H:%M:%S') if x else ""
+
+    return {
+        "crash_id": r[0],
+        "user_id": r[1],
+        "session_start": fmt_dt(r[2]),
+        "session_end": fmt_dt(r[3]),
+        "crash_time": fmt_dt(r[4]),
+        "event_id": r[5],
+        "provider": r[6],
+        "exception_code": r[7],
+        "faulting_module": r[8],
+        "message": r[9],
+        "location": r[10],
+        "signature": r[11],
+    }
+
+
+class FeedFull(RuntimeError):
+    """Raised when CRASH_FEED_MAX_CLIENTS streams are already open."""
+
+
+# ----------------------------
+# Subscribers
+# ----------------------------
+class Subscription:
+    """One connected client: batches of new crashes, optionally for one user."""
+
+    def __init__(self, user_id=None):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=CRASH_FEED_QUEUE)
+        self.lagged = False
+
+    def offer(self, records):
+        if self.user_id:
+            records = [c for c in records if c["user_id"] == self.user_id]
+        if not records or self.lagged:
+            return
+        try:
+            self.queue.put_nowait(records)
+        except queue.Full:
+            # too slow to keep up: end its stream, it resumes from its last id
+            self.lagged = True
+            try:
+                while True:
+                    self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.queue.put_nowait(None)
+        self.wake()
+
+    def wake(self):
+        """Called after queueing (queue.Queue already wakes a blocked next())."""
+
+    def next(self, timeout):
+        """
+        Next batch; [] after `timeout` seconds without one, None once the
+        client fell behind and must reconnect.
+        """
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None if self.lagged else []
+
+
+class AsyncSubscription(Subscription):
+    """A Subscription read from an event loop instead of a request thread."""
+
+    def __init__(self, user_id=None):
+        super().__init__(user_id)
+        self.loop = asyncio.get_running_loop()
+        self.ready = asyncio.Event()
+
+    def wake(self):
+        self.loop.call_soon_threadsafe(self.ready.set)
+
+    async def next_async(self, timeout):
+        """Same as next(), without blocking the loop."""
+        self.ready.clear()
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            # offer() sets `ready` on the loop, so it cannot fire between
+            # the check above and this wait
+            await asyncio.wait_for(self.ready.wait(), timeout)
+            return self.queue.get_nowait()
+        except (asyncio.TimeoutError, queue.Empty):
+            return None if self.lagged else []
+
+
+_lock = threading.Lock()
+_subscribers = set()
+_listener = None
+
+
+def subscribe(user_id=None, kind=Subscription) -> Subscription:
+    sub = kind(user_id)
+    with _lock:
+        if len(_subscribers) >= CRASH_FEED_MAX_CLIENTS:
+            raise FeedFull(f"Too many crash feed clients ({CRASH_FEED_MAX_CLIENTS})")
+        _subscribers.add(sub)
+    _start_listener()
+    return sub
+
+
+def unsubscribe(sub):
+    with _lock:
+        _subscribers.discard(sub)
+
+
+def publish(records):
+    if not records:
+        return
+    with _lock:
+        subs = list(_subscribers)
+    for sub in subs:
+        sub.offer(records)
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "clients": len(_subscribers),
+            "max_clients": CRASH_FEED_MAX_CLIENTS,
+            "listening": _listener is not None and _listener.is_alive(),
+        }
+
+
+# ----------------------------
+# Queries
+# ----------------------------
+def backlog(user_id=None, since_id=0, limit=CRASH_FEED_BACKLOG) -> list:
+    """
+    Crashes after `since_id`, oldest first (pooled connection). A full page
+    means there may be more: ask again from its last crash_id.
+    """
+    sql = f"SELECT {CRASH_COLUMNS} FROM crashes WHERE crash_id > %s"
+    params = [since_id]
+    if user_id:
+        sql += " AND user_id = %s"
+        params.append(user_id)
+    sql += " ORDER BY crash_id LIMIT %s"
+    params.append(limit)
+    return [crash_record(r) for r in qall(sql, tuple(params))]
+
+
+def _fetch(conn, sql, params) -> list:
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        return [crash_record(r) for r in cur.fetchall()]
+
+
+# ----------------------------
+# Listener
+# ----------------------------
+def ensure():
+    """Fail early, once per process, if the NOTIFY trigger is missing."""
+    migrations.require(FEED_MIGRATION)
+
+
+def _start_listener():
+    global _listener
+    with _lock:
+        if _listener is not None and _listener.is_alive():
+            return
+        _listener = threading.Thread(target=_listen_forever, name="crash-feed", daemon=True)
+        _listener.start()
+
+
+def _listen_forever():
+    last_id = None
+    backoff = 1.0
+    while True:
+        conn = None
+        try:
+            ensure()
+            conn = connect_db()
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CRASH_FEED_CHANNEL}")
+                cur.execute("SELECT COALESCE(MAX(crash_id), 0) FROM crashes")
+                newest = cur.fetchone()[0]
+            while last_id is not None and newest > last_id:
+                # rows that landed while the listener was reconnecting
+                missed = _fetch(conn, f"""
+                    SELECT {CRASH_COLUMNS} FROM crashes
+                    WHERE crash_id > %s ORDER BY crash_id LIMIT %s
+                """, (last_id, CRASH_FEED_BACKLOG))
+                publish(missed)
+                if len(missed) < CRASH_FEED_BACKLOG:
+                    break
+                last_id = missed[-1]["crash_id"]
+            last_id = max(last_id or 0, newest)
+            print(f"[CRASH-FEED] Listening on {CRASH_FEED_CHANNEL}", flush=True)
+            backoff = 1.0
+
+            while True:
+                if select.select([conn], [], [], CRASH_FEED_HEARTBEAT) == ([], [], []):
+                    # idle: make sure the connection is still there
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT 1")
+                    continue
+                conn.poll()
+                ids = []
+                while conn.notifies:
+                    note = conn.notifies.pop(0)
+                    try:
+                        ids.append(int(note.payload))
+                    except ValueError:
+                        pass
+                if not ids:
+                    continue
+                # one query per wake-up, however many clients are connected
+                records = _fetch(conn, f"""
+                    SELECT {CRASH_COLUMNS} FROM crashes
+                    WHERE crash_id = ANY(%s) ORDER BY crash_id
+                """, (ids,))
+                last_id = max([last_id] + ids)
+                publish(records)
+        except Exception as e:
+            print(f"[CRASH-FEED] Listener error: {e}; retrying in {backoff:.0f}s", flush=True)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
@@ -0,0 +1,205 @@
+"""
+Pre-grouped crash index.
+
+Every crash gets a `signature` fingerprint when it is inserted: a hash of
+exception_code / faulting_module / event_id plus the crash message reduced
+to stable tokens (addresses, offsets, versions, GUIDs and install paths are
+masked), so the same fault on different machines lands in the same group.
+
+crash_groups       (signature)                -> crash_count, first/last seen, example
+crash_group_daily  (signature, user_id, day)  -> crashes, last_seen
+
+Both are kept up to date by a trigger on `crashes`, so grouped views read
+one row per group instead of re-grouping every crash. The column, tables and
+trigger are created by migrations.py (0007). rebuild() recomputes them from
+scratch:
+
+    python crash_groups.py backfill   # fingerprint crashes that have none
+    python crash_groups.py rebuild
+"""
+import re
+import sys
+import hashlib
+
+from psycopg2.extras import execute_values
+
+import migrations
+from db import get_conn
+
+
+GROUPS_MIGRATION = 7
+MESSAGE_TOKENS = 40        # tokens of the normalized message that go into the fingerprint
+BACKFILL_BATCH = 1000
+
+# Order matters: mask the most specific patterns first
+_MASKS = [
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.I), " <guid> "),
+    (re.compile(r"\b0x[0-9a-f]+\b", re.I), " <hex> "),
+    (re.compile(r"\b(?=[0-9a-f]*\d)(?=[0-9a-f]*[a-f])[0-9a-f]{4,}\b", re.I), " <hex> "),
+    (re.compile(r"\b\d+(?:[.:/-]\d+)*\b"), " <n> "),
+]
+# Windows / POSIX paths: keep only the file name, drop the install location
+# (Windows paths may contain spaces, so they run to the end of the field)
+_PATH = re.compile(r"[a-z]:\\[^\r\n,;'\"]*|(?:/[^/\s,;:'\"]+){2,}/?", re.I)
+_TOKEN = re.compile(r"<\w+>|[a-z_][a-z0-9_.]*", re.I)
+
+
+def normalize_message(message: str) -> str:
+    """Reduce a crash message to the tokens that identify the fault."""
+    if not message:
+        return ""
+    text = _PATH.sub(lambda m: " " + re.split(r"[\\/]", m.group(0).rstrip("\\/"))[-1] + " ", message)
+    for rx, repl in _MASKS:
+        text = rx.sub(repl, text)
+    tokens = _TOKEN.findall(text.lower())
+    return " ".join(tokens[:MESSAGE_TOKENS])
+
+
+def signature_label(exception_code, faulting_module, event_id) -> str:
+    """Human-readable group name (the format the dashboards always showed)."""
+    exc = (exception_code or "").strip() or "no-code"
+    mod = (faulting_module or "").strip() or "no-module"
+    return f"{exc} | {mod} | {int(event_id or 0)}"
+
+
+def crash_signature(exception_code, faulting_module, event_id, message) -> str:
+    """Stable fingerprint (16 hex chars) of a crash."""
+    key = "\x1f".join([
+        (exception_code or "").strip().lower(),
+        (faulting_module or "").strip().lower(),
+        str(int(event_id or 0)),
+        normalize_message(message),
+    ])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+REBUILD_SQL = """
+TRUNCATE crash_groups, crash_group_daily;
+
+INSERT INTO crash_groups (
+    signature, label, exception_code, faulting_module, event_id,
+    crash_count, first_seen, last_seen, last_crash_id, example
+)
+SELECT DISTINCT ON (signature)
+       signature,
+       CONCAT(COALESCE(NULLIF(exception_code, ''), 'no-code'), ' | ',
+              COALESCE(NULLIF(faulting_module, ''), 'no-module'), ' | ',
+              COALESCE(event_id, 0)::text),
+       exception_code, faulting_module, event_id,
+       COUNT(*) OVER w, MIN(crash_time) OVER w, MAX(crash_time) OVER w,
+       MAX(crash_id) OVER w, LEFT(message, 500)
+FROM crashes
+WHERE signature IS NOT NULL
+WINDOW w AS (PARTITION BY signature)
+ORDER BY signature, crash_time DESC NULLS LAST, crash_id DESC;
+
+INSERT INTO crash_group_daily (signature, user_id, day, crashes, last_seen)
+SELECT signature, user_id, COALESCE(crash_time::date, DATE '1970-01-01'), COUNT(*), MAX(crash_time)
+FROM crashes
+WHERE signature IS NOT NULL
+GROUP BY 1, 2, 3;
+"""
+
+
+def ensure():
+    """Fail early, once per process, if the groups migration has not run."""
+    migrations.require(GROUPS_MIGRATION)
+
+
+def backfill(batch_size: int = BACKFILL_BATCH) -> int:
+    """Fingerprint crashes inserted before signatures existed (the trigger groups them)."""
+    total = 0
+    while True:
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT crash_id, exception_code, faulting_module, event_id, message
+                FROM crashes
+                WHERE signature IS NULL
+                ORDER BY crash_id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (batch_size,))
+            rows = cur.fetchall()
+            if not rows:
+                break
+            execute_values(cur, """
+                UPDATE crashes AS c SET signature = v.signature
+                FROM (VALUES %s) AS v (crash_id, signature)
+                WHERE c.crash_id = v.crash_id
+            """, [(r[0], crash_signature(r[1], r[2], r[3], r[4])) for r in rows])
+        total += len(rows)
+    if total:
+        print(f"[CRASH-GROUPS] Fingerprinted {total} crashes", flush=True)
+    return total
+
+
+def rebuild():
+    """Recompute both group tables from `crashes` (repair)."""
+    ensure()
+    with get_conn() as conn, conn.cursor() as cur:
+        # SHARE lock: concurrent crash inserts wait instead of racing the trigger
+        cur.execute("LOCK TABLE crashes IN SHARE MODE")
+        cur.execute(REBUILD_SQL)
+
+
+def groups(user_id: str = None, limit: int = 100) -> list:
+    """
+    Crash groups ordered by count: one row per group overall, or the user's
+    slice aggregated from crash_group_daily.
+    """
+    ensure()
+    with get_conn() as conn, conn.cursor() as cur:
+        if user_id:
+            cur.execute("""
+                SELECT g.signature, g.label, g.exception_code, g.faulting_module, g.event_id,
+                       SUM(d.crashes)::bigint AS crash_count, g.first_seen, MAX(d.last_seen) AS last_seen,
+                       g.example
+                FROM crash_group_daily d
+                JOIN crash_groups g USING (signature)
+                WHERE d.user_id = %s
+                GROUP BY g.signature
+                ORDER BY crash_count DESC, last_seen DESC
+                LIMIT %s
+            """, (user_id, limit))
+        else:
+            cur.execute("""
+                SELECT signature, label, exception_code, faulting_module, event_id,
+                       crash_count, first_seen, last_seen, example
+                FROM crash_groups
+                ORDER BY crash_count DESC, last_seen DESC
+                LIMIT %s
+            """, (limit,))
+        rows = cur.fetchall()
+
+    def fmt(x):
+        return x.strftime("%Y-%m-%d %H:%M:%S") if x else ""
+
+    return [
+        {
+            "signature": r[0],
+            "label": r[1],
+            "exception_code": r[2],
+            "faulting_module": r[3],
+            "event_id": r[4],
+            "count": int(r[5]),
+            "first_seen": fmt(r[6]),
+            "last_seen": fmt(r[7]),
+            "example": r[8] or "",
+        }
+        for r in rows
+    ]
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    if cmd == "backfill":
+        ensure()
+        print(f"[CRASH-GROUPS] Backfilled {backfill()} crashes")
+    elif cmd == "rebuild":
+        rebuild()
+        print("[CRASH-GROUPS] Rebuilt crash groups")
+    else:
+        print("Usage: python crash_groups.py backfill|rebuild")
@@ -0,0 +1,280 @@
+"""
+Crash notification queue.
+
+Crash emails are queued in the database, not sent from the request. A
+trigger on `crashes` (migrations.py 0009) adds every inserted crash to its
+signature's row:
+
+crash_notify_queue  (signature) -> pending crashes, users, last crash, next_attempt_at
+
+One worker thread per API process claims the due rows and hands one digest
+per row to the tasks.py workers, which send it and clear what was sent. A signature gets at most one email per CRASH_NOTIFY_WINDOW,
+and the first one goes out CRASH_NOTIFY_GATHER seconds after its first crash,
+so a storm of the same fault is one email however many users hit it. Failed
+sends are retried with backoff. The queue is a table, so it survives
+restarts. It is bounded: one row per signature, at most
+CRASH_NOTIFY_MAX_PENDING of them pending (crashes of further signatures share
+the '*' row), and CRASH_NOTIFY_USERS user names per digest.
+
+Rows are claimed with FOR UPDATE SKIP LOCKED and a lease, so several API
+processes can run the worker without sending anything twice.
+"""
+import os
+import threading
+import time
+
+import requests
+
+import crash_feed
+import crash_groups
+import migrations
+import tasks
+from db import get_conn
+
+
+# ----------------------------
+# Config
+# ----------------------------
+CRASH_NOTIFY_WINDOW = int(os.getenv("CRASH_NOTIFY_WINDOW", "3600"))             # min seconds between emails per signature
+CRASH_NOTIFY_GATHER = int(os.getenv("CRASH_NOTIFY_GATHER", "60"))               # wait after a first crash to batch a burst
+CRASH_NOTIFY_POLL = float(os.getenv("CRASH_NOTIFY_POLL", "15"))                 # seconds between queue checks
+CRASH_NOTIFY_LEASE = int(os.getenv("CRASH_NOTIFY_LEASE", "120"))                # a claimed row is retried after this
+CRASH_NOTIFY_MAX_BACKOFF = int(os.getenv("CRASH_NOTIFY_MAX_BACKOFF", "3600"))
+CRASH_NOTIFY_MAX_PENDING = int(os.getenv("CRASH_NOTIFY_MAX_PENDING", "200"))    # distinct signatures waiting
+CRASH_NOTIFY_USERS = int(os.getenv("CRASH_NOTIFY_USERS", "20"))                 # user names kept per digest
+CRASH_NOTIFY_BATCH = 10
+
+NOTIFY_MIGRATION = 9
+OVERFLOW_SIGNATURE = "*"     # crash_notify_enqueue() in migrations.py uses it too
+
+_worker = None
+_inflight = set()           # signatures handed to tasks.py and not finished
+_inflight_lock = threading.Lock()
+
+
+def ensure():
+    """Fail early, once per process, if the queue migration has not run."""
+    migrations.require(NOTIFY_MIGRATION)
+
+
+def configure():
+    """Hand this process's CRASH_NOTIFY_* limits to the enqueue trigger."""
+    ensure()
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            UPDATE crash_notify_settings
+               SET max_pending = %s, users = %s, gather_secs = %s, window_secs = %s
+        """, (CRASH_NOTIFY_MAX_PENDING, CRASH_NOTIFY_USERS,
+              CRASH_NOTIFY_GATHER, CRASH_NOTIFY_WINDOW))
+
+
+# ----------------------------
+# Email
+# ----------------------------
+class EmailNotConfigured(RuntimeError):
+    pass
+
+
+def send_email(subject: str, text: str):
+    """Send one email through Resend; raises on failure so the worker retries."""
+    api_key = os.getenv("RESEND_API_KEY")
+    admin_email = os.getenv("ADMIN_EMAIL")
+    from_email = os.getenv("FROM_EMAIL", "onboarding@resend.dev")
+    if not api_key or not admin_email:
+        raise EmailNotConfigured("RESEND_API_KEY / ADMIN_EMAIL not set")
+
+    r = requests.post(
+        "https://api.resend.com/emails",
+        json={"from": from_email, "to": [admin_email], "subject": subject, "text": text},
+        headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+        timeout=15,
+    )
+    if r.status_code >= 400:
+        raise RuntimeError(f"Resend HTTP {r.status_code}: {r.text[:200]}")
+
+
+def crash_details(crash: dict) -> str:
+    return (
+        f"User: {crash.get('user_id')}\n"
+        f"Crash Time: {crash.get('crash_time')}\n"
+        f"Session Start: {crash.get('session_start')}\n"
+        f"Session End: {crash.get('session_end')}\n"
+        f"Provider: {crash.get('provider')}\n"
+        f"Event ID: {crash.get('event_id')}\n"
+        f"Exception: {crash.get('exception_code')}\n"
+        f"Faulting Module: {crash.get('faulting_module')}\n\n"
+        f"Message:\n{(crash.get('message') or '')[:4000]}\n"
+    )
+
+
+def digest_email(item: dict, crash: dict) -> tuple:
+    """(subject, text) for one queue row; a single crash reads like the old per-crash alert."""
+    n, users = item["pending"], item["users"]
+    if n == 1 and crash:
+        return f"[eSim] Crash — {crash.get('user_id')}", "🚨 eSim Crash Alert\n\n" + crash_details(crash)
+
+    if item["signature"] == OVERFLOW_SIGNATURE:
+        label = "various signatures"
+    elif crash:
+        label = crash_groups.signature_label(crash.get("exception_code"), crash.get("faulting_module"),
+                                             crash.get("event_id"))
+    else:
+        label = item["signature"]
+    more = " (+ more)" if len(users) >= CRASH_NOTIFY_USERS else ""
+    text = (
+        f"🚨 eSim Crash Digest\n\n"
+        f"{n} crashes of {label}\n"
+        f"Signature: {item['signature']}\n"
+        f"Users: {', '.join(users)}{more}\n\n"
+    )
+    if crash:
+        text += "Latest crash:\n" + crash_details(crash)
+    return f"[eSim] {n} crashes — {label}", text
+
+
+# ----------------------------
+# Worker
+# ----------------------------
+def claim(limit: int = CRASH_NOTIFY_BATCH) -> list:
+    """Lease due rows so no other process sends them meanwhile."""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(f"""
+            UPDATE crash_notify_queue q
+               SET next_attempt_at = now() + interval '{int(CRASH_NOTIFY_LEASE)} seconds'
+              FROM (SELECT signature FROM crash_notify_queue
+                     WHERE pending > 0 AND next_attempt_at <= now()
+                     ORDER BY next_attempt_at
+                     LIMIT %s
+                     FOR UPDATE SKIP LOCKED) due
+             WHERE q.signature = due.signature
+            RETURNING q.signature, q.pending, q.users, q.last_crash_id, q.attempts
+        """, (limit,))
+        keys = ("signature", "pending", "users", "last_crash_id", "attempts")
+        return [dict(zip(keys, r)) for r in cur.fetchall()]
+
+
+def fetch_crash(crash_id):
+    if crash_id is None:
+        return None
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(f"SELECT {crash_feed.CRASH_COLUMNS} FROM crashes WHERE crash_id = %s", (crash_id,))
+        row = cur.fetchone()
+    return crash_feed.crash_record(row) if row else None
+
+
+def mark_sent(item: dict):
+    """Remove what was sent; crashes that arrived meanwhile wait for the next window."""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(f"""
+            UPDATE crash_notify_queue
+               SET pending = GREATEST(pending - %s, 0),
+                   users = CASE WHEN pending > %s THEN users ELSE '{{}}' END,
+                   last_sent_at = now(),
+                   next_attempt_at = now() + interval '{int(CRASH_NOTIFY_WINDOW)} seconds',
+                   attempts = 0,
+                   last_error = NULL
+             WHERE signature = %s
+        """, (item["pending"], item["pending"], item["signature"]))
+
+
+def mark_failed(item: dict, err) -> float:
+    delay = min(CRASH_NOTIFY_MAX_BACKOFF, 30 * 2 ** item["attempts"])
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            UPDATE crash_notify_queue
+               SET attempts = attempts + 1,
+                   next_attempt_at = now() + make_interval(secs => %s),
+                   last_error = %s
+             WHERE signature = %s
+        """, (delay, str(err)[:500], item["signature"]))
+    return delay
+
+
+def send_digest(item: dict):
+    """Send one claimed row's digest and clear or reschedule it (on a tasks.py worker)."""
+    try:
+        subject, text = digest_email(item, fetch_crash(item["last_crash_id"]))
+        send_email(subject, text)
+    except EmailNotConfigured as e:
+        # same as before: nothing to send with, so drop instead of retrying forever
+        print(f"[NOTIFY] {e}, dropping {item['pending']} crash(es) of {item['signature']}", flush=True)
+        mark_sent(item)
+    except Exception as e:
+        delay = mark_failed(item, e)
+        print(f"[NOTIFY] Email for {item['signature']} failed: {e}; retrying in {delay:.0f}s", flush=True)
+    else:
+        mark_sent(item)
+        print(f"[NOTIFY] Sent digest of {item['pending']} crash(es) for {item['signature']}", flush=True)
+    finally:
+        with _inflight_lock:
+            _inflight.discard(item["signature"])
+
+
+def send_due() -> int:
+    """
+    Hand due digests to the task workers; returns how many were handed off.
+    At most CRASH_NOTIFY_BATCH are in flight per process, so none waits in
+    the task queue past its lease and gets claimed a second time.
+    """
+    ensure()
+    with _inflight_lock:
+        room = CRASH_NOTIFY_BATCH - len(_inflight)
+    if room <= 0:
+        return 0
+    queued = 0
+    for item in claim(room):
+        with _inflight_lock:
+            if item["signature"] in _inflight:
+                continue
+            _inflight.add(item["signature"])
+        if not tasks.submit(send_digest, item):
+            # task queue full: the lease runs out and the row is claimed again
+            with _inflight_lock:
+                _inflight.discard(item["signature"])
+            continue
+        queued += 1
+    return queued
+
+
+def start_worker(poll_seconds: float = CRASH_NOTIFY_POLL):
+    """The process's notification thread (0 disables, e.g. for one-off scripts)."""
+    global _worker
+    if poll_seconds <= 0 or (_worker is not None and _worker.is_alive()):
+        return _worker
+
+    def loop():
+        configured = False
+        while True:
+            try:
+                if not configured:
+                    configure()
+                    configured = True
+                while send_due() >= CRASH_NOTIFY_BATCH:
+                    pass  # a full batch: more may be due once it is sent
+            except Exception as e:
+                print("[NOTIFY] Worker error:", repr(e), flush=True)
+            time.sleep(poll_seconds)
+
+    _worker = threading.Thread(target=loop, name="crash-notify", daemon=True)
+    _worker.start()
+    return _worker
+
+
+def stats() -> dict:
+    ensure()
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT COUNT(*), COALESCE(SUM(pending), 0),
+                   MIN(next_attempt_at), COALESCE(MAX(attempts), 0),
+                   COUNT(*) FILTER (WHERE attempts > 0)
+            FROM crash_notify_queue WHERE pending > 0
+        """)
+        signatures, crashes, next_due, max_attempts, failing = cur.fetchone()
+    return {
+        "pending_signatures": signatures,
+        "pending_crashes": int(crashes),
+        "next_due": next_due.strftime('%Y-%m-%d %H:%M:%S') if next_due else None,
+        "max_attempts": max_attempts,
+        "failing": failing,
+        "worker_alive": _worker is not None and _worker.is_alive(),
+    }
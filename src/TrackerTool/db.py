@@ -0,0 +1,231 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+
+# ----------------------------
+# Config
+# ----------------------------
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))          # seconds to wait for a free connection
+DB_POOL_CHECK_AFTER = float(os.getenv("DB_POOL_CHECK_AFTER", "30"))  # ping connections idle longer than this
+DB_POOL_MAX_AGE = float(os.getenv("DB_POOL_MAX_AGE", "1800"))        # recycle connections older than this
+
+
+class PoolTimeout(RuntimeError):
+    """Raised when no pooled connection becomes free within DB_POOL_TIMEOUT."""
+
+
+def database_url() -> str:
+    db_url = os.getenv("DATABASE_URL")
+    if not db_url:
+        raise RuntimeError("DATABASE_URL is not set")
+    # ensure sslmode=require even if missing
+    if "sslmode=" not in db_url:
+        sep = "&" if "?" in db_url else "?"
+        db_url = db_url + f"{sep}sslmode=require"
+    return db_url
+
+
+CONNECT_KWARGS = {
+    "connect_timeout": 10,
+    # TCP keepalives so the hosted DB / load balancer doesn't silently drop idle sockets
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 3,
+}
+
+
+def connect_db():
+    """Open a dedicated (non-pooled) connection, e.g. for LISTEN or long jobs."""
+    return psycopg2.connect(database_url(), **CONNECT_KWARGS)
+
+
+# ----------------------------
+# Pool state
+# ----------------------------
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+
+_born_at = {}     # id(conn) -> time the connection was opened
+_last_used = {}   # id(conn) -> time the connection was last returned
+
+_stats_lock = threading.Lock()
+_stats = {
+    "checkouts": 0,
+    "in_use": 0,
+    "peak_in_use": 0,
+    "waiting": 0,
+    "peak_waiting": 0,
+    "timeouts": 0,
+    "reconnects": 0,
+    "wait_ms_total": 0.0,
+    "wait_ms_max": 0.0,
+}
+
+
+def _bump(**deltas):
+    with _stats_lock:
+        for k, v in deltas.items():
+            _stats[k] += v
+        _stats["peak_in_use"] = max(_stats["peak_in_use"], _stats["in_use"])
+        _stats["peak_waiting"] = max(_stats["peak_waiting"], _stats["waiting"])
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pg_pool.ThreadedConnectionPool(
+                    DB_POOL_MIN, DB_POOL_MAX, database_url(), **CONNECT_KWARGS
+                )
+                print(f"[DB] Pool created (min={DB_POOL_MIN}, max={DB_POOL_MAX})", flush=True)
+    return _pool
+
+
+def _is_healthy(conn) -> bool:
+    if conn.closed:
+        return False
+
+    now = time.time()
+    born = _born_at.setdefault(id(conn), now)
+    if now - born > DB_POOL_MAX_AGE:
+        return False
+
+    # Only ping connections that sat idle long enough to have gone stale
+    if now - _last_used.get(id(conn), born) < DB_POOL_CHECK_AFTER:
+        return True
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        return False
+
+
+def _discard(p, conn):
+    _born_at.pop(id(conn), None)
+    _last_used.pop(id(conn), None)
+    try:
+        p.putconn(conn, close=True)
+    except Exception:
+        pass
+
+
+def _checkout():
+    p = get_pool()
+
+    # attempts: every pooled connection may be stale after a DB restart
+    for _ in range(DB_POOL_MAX + 1):
+        conn = p.getconn()
+        if _is_healthy(conn):
+            return conn
+        print("[DB] Dropping stale pooled connection", flush=True)
+        _discard(p, conn)
+        _bump(reconnects=1)
+
+    raise psycopg2.OperationalError("Could not obtain a healthy database connection")
+
+
+@contextmanager
+def get_conn():
+    """
+    Check a connection out of the shared pool for the duration of a request.
+
+    Commits on success, rolls back on error, and always returns the connection
+    to the pool (broken connections are closed instead of being reused).
+    """
+    t0 = time.perf_counter()
+    _bump(waiting=1)
+    acquired = _slots.acquire(timeout=DB_POOL_TIMEOUT)
+    waited_ms = (time.perf_counter() - t0) * 1000.0
+    _bump(waiting=-1)
+
+    if not acquired:
+        _bump(timeouts=1)
+        raise PoolTimeout(f"No database connection available after {DB_POOL_TIMEOUT:.0f}s")
+
+    conn = None
+    try:
+        conn = _checkout()
+        with _stats_lock:
+            _stats["checkouts"] += 1
+            _stats["wait_ms_total"] += waited_ms
+            _stats["wait_ms_max"] = max(_stats["wait_ms_max"], waited_ms)
+        _bump(in_use=1)
+
+        try:
+            yield conn
+            if not conn.closed:
+                conn.commit()
+        except Exception:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+            raise
+    finally:
+        if conn is not None:
+            _bump(in_use=-1)
+            p = get_pool()
+            if conn.closed:
+                _discard(p, conn)
+            else:
+                _last_used[id(conn)] = time.time()
+                p.putconn(conn)
+        _slots.release()
+
+
+def pool_stats() -> dict:
+    """Saturation metrics for sizing DB_POOL_MAX under load."""
+    with _stats_lock:
+        s = dict(_stats)
+
+    p = _pool
+    s["max_size"] = DB_POOL_MAX
+    s["min_size"] = DB_POOL_MIN
+    s["open"] = (len(p._used) + len(p._pool)) if p is not None else 0
+    s["idle"] = len(p._pool) if p is not None else 0
+    s["utilization"] = round(s["in_use"] / DB_POOL_MAX, 3) if DB_POOL_MAX else 0.0
+    s["wait_ms_avg"] = round(s["wait_ms_total"] / s["checkouts"], 3) if s["checkouts"] else 0.0
+    s["wait_ms_total"] = round(s["wait_ms_total"], 3)
+    s["wait_ms_max"] = round(s["wait_ms_max"], 3)
+    return s
+
+
+# ----------------------------
+# Query helpers
+# ----------------------------
+def exec_sql(sql, params=()):
+    """INSERT / UPDATE / DELETE"""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.rowcount
+
+
+def qall(sql, params=()):
+    """SELECT many rows (returns list of tuples)"""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchall()
+
+
+def q1(sql, params=()):
+    """SELECT single row (returns one tuple or None)"""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchone()
@@ -0,0 +1,179 @@
+"""
+Load test for the tracker API's ingestion endpoints.
+
+Simulates labs ending sessions at once: each request is what tracker.py
+sends at session end (a session, its log and optionally a crash), either as
+one /ingest/batch call or as separate /add-* calls. Prints requests/sec and
+latency percentiles, and can save/compare runs:
+
+    # before: Flask under gunicorn
+    gunicorn -w 4 -k gthread --threads 8 app:app
+    python loadtest.py --url http://localhost:8000 -c 64 -d 30 --save flask.json
+
+    # after: ASGI ingestion
+    uvicorn asgi:app --workers 4
+    python loadtest.py --url http://localhost:8000 -c 64 -d 30 --save asgi.json
+
+    python loadtest.py --compare flask.json asgi.json
+
+Rows are written for users named loadtest-*; run it against a staging
+database, and with RESEND_API_KEY unset if --crashes is used.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+
+
+LOG_LINE = "2024-01-01 10:00:00 [CMD]: ngspice -b /home/user/eSim-Workspace/project/project.cir.out\n"
+
+
+def session_events(user_id, log_bytes, crashes):
+    end = datetime.now()
+    start = end - timedelta(minutes=random.randint(5, 240))
+    fmt = "%Y-%m-%d %H:%M:%S"
+    events = [
+        {"id": str(uuid.uuid4()), "type": "session", "data": {
+            "user_id": user_id,
+            "session_start": start.strftime(fmt),
+            "session_end": end.strftime(fmt),
+            "total_duration": (end - start).total_seconds() / 3600,
+        }},
+        {"id": str(uuid.uuid4()), "type": "log", "data": {
+            "user_id": user_id,
+            "log_timestamp": end.strftime(fmt),
+            "log_content": LOG_LINE * max(1, log_bytes // len(LOG_LINE)),
+        }},
+    ]
+    if crashes:
+        events.append({"id": str(uuid.uuid4()), "type": "crash", "data": {
+            "user_id": user_id,
+            "session_start": start.strftime(fmt),
+            "session_end": end.strftime(fmt),
+            "crash_time": end.strftime(fmt),
+            "event_id": 1000,
+            "provider": "Application Error",
+            "exception_code": "0xc0000005",
+            "faulting_module": "ngspice.dll",
+            "message": "loadtest",
+        }})
+    return events
+
+
+ENDPOINTS = {"session": "/add-session", "log": "/add-log", "crash": "/add-crash"}
+
+
+def worker(args, deadline, latencies, statuses, lock):
+    http = requests.Session()
+    user_id = f"loadtest-{uuid.uuid4().hex[:8]}"
+    while time.perf_counter() < deadline:
+        events = session_events(user_id, args.log_bytes, args.crashes)
+        if args.mode == "batch":
+            calls = [(f"{args.url}/ingest/batch", events)]
+        else:
+            calls = [(f"{args.url}{ENDPOINTS[ev['type']]}", ev["data"]) for ev in events]
+
+        for url, body in calls:
+            t0 = time.perf_counter()
+            try:
+                status = http.post(url, json=body, timeout=args.timeout).status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] += 1
+
+
+def run(args) -> dict:
+    latencies, statuses, lock = [], Counter(), threading.Lock()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(worker, args, deadline, latencies, statuses, lock)
+                   for _ in range(args.concurrency)]
+        for f in futures:
+            f.result()
+    wall = time.perf_counter() - started
+
+    ok = sum(n for s, n in statuses.items() if isinstance(s, int) and s < 300)
+    lat = sorted(latencies) or [0.0]
+
+    def pct(p):
+        return lat[min(len(lat) - 1, int(p / 100 * len(lat)))] * 1000
+
+    return {
+        "url": args.url,
+        "mode": args.mode,
+        "concurrency": args.concurrency,
+        "seconds": round(wall, 2),
+        "requests": len(latencies),
+        "ok": ok,
+        "rps": round(len(latencies) / wall, 1),
+        "ok_rps": round(ok / wall, 1),
+        "p50_ms": round(pct(50), 1),
+        "p95_ms": round(pct(95), 1),
+        "p99_ms": round(pct(99), 1),
+        "mean_ms": round(statistics.fmean(lat) * 1000, 1),
+        "statuses": {str(k): v for k, v in statuses.items()},
+    }
+
+
+def print_result(r, label=""):
+    print(f"{label}{r['url']} mode={r['mode']} c={r['concurrency']} {r['seconds']}s")
+    print(f"  requests={r['requests']} ok={r['ok']} rps={r['rps']} ok_rps={r['ok_rps']}")
+    print(f"  latency ms: p50={r['p50_ms']} p95={r['p95_ms']} p99={r['p99_ms']} mean={r['mean_ms']}")
+    print(f"  statuses: {r['statuses']}")
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print_result(before, "before: ")
+    print_result(after, "after:  ")
+    for key in ("ok_rps", "p50_ms", "p95_ms", "p99_ms"):
+        b, a = before[key], after[key]
+        change = f"{(a - b) / b * 100:+.0f}%" if b else "n/a"
+        print(f"  {key:7s} {b:>9} -> {a:<9} ({change})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("-c", "--concurrency", type=int, default=32, help="simulated clients")
+    parser.add_argument("-d", "--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--mode", choices=("batch", "single"), default="batch",
+                        help="one /ingest/batch per session end, or one /add-* per event")
+    parser.add_argument("--log-bytes", type=int, default=8192, help="size of each session's log")
+    parser.add_argument("--crashes", action="store_true", help="add a crash to every session end")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--save", help="write the result as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two saved runs")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    args.url = args.url.rstrip("/")
+    result = run(args)
+    print_result(result)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0 if result["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
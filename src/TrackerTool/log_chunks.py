@@ -0,0 +1,164 @@
+"""
+Chunked, incremental tracker log storage.
+
+The agent uploads the session log while the session runs, as gzip chunks
+tagged with the byte offset they start at:
+
+    PUT /logs/upload/<upload_key>?offset=<n>[&final=1]   body: gzip bytes
+
+logs        one row per uploaded log (upload_key, log_size = bytes stored)
+log_chunks  (log_id, byte_offset) -> byte_length, gzip content
+
+Chunks must continue the stored log: a chunk that starts past the end is
+refused with the current size (409) so the agent resends from there, and
+bytes the server already has are skipped, so a retried chunk is harmless.
+Reads decompress only the chunks that overlap the requested byte range.
+"""
+import gzip
+import os
+import zlib
+
+import migrations
+from db import get_conn
+
+
+LOG_CHUNK_MAX_BYTES = int(os.getenv("LOG_CHUNK_MAX_BYTES", str(4 * 1024 * 1024)))   # decompressed, per chunk
+LOG_RANGE_MAX_BYTES = int(os.getenv("LOG_RANGE_MAX_BYTES", str(1024 * 1024)))        # per range read
+
+CHUNKS_MIGRATION = 10   # upload columns and log_chunks, see migrations.py
+
+
+class ChunkError(ValueError):
+    """Bad chunk upload; `status` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400, size=None):
+        super().__init__(message)
+        self.status = status
+        self.size = size
+
+
+def ensure():
+    """Fail early, once per process, if the chunk migration has not run."""
+    migrations.require(CHUNKS_MIGRATION)
+
+
+def gunzip(body: bytes, limit: int = LOG_CHUNK_MAX_BYTES) -> bytes:
+    """Decompress one gzip chunk, refusing more than `limit` bytes of output."""
+    d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = d.decompress(body, limit + 1)
+    except zlib.error as e:
+        raise ChunkError(f"Chunk is not valid gzip: {e}")
+    if len(data) > limit or d.unconsumed_tail:
+        raise ChunkError(f"Chunk larger than {limit} bytes", status=413)
+    if not d.eof:
+        raise ChunkError("Chunk is truncated")
+    return data
+
+
+def append_chunk(upload_key, user_id, log_timestamp, offset, body, final=False) -> dict:
+    """
+    Store the part of a chunk the server does not have yet.
+    Returns {"log_id", "size", "complete"}; raises ChunkError.
+    """
+    ensure()
+    data = gunzip(body) if body else b""
+
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT log_id, log_size, complete FROM logs WHERE upload_key = %s FOR UPDATE",
+            (upload_key,),
+        )
+        row = cur.fetchone()
+        if row is None:
+            if not user_id or not log_timestamp:
+                raise ChunkError("user_id and log_timestamp are required for a new log")
+            cur.execute("""
+                INSERT INTO logs (user_id, log_timestamp, log_content, upload_key, log_size, complete)
+                VALUES (%s, %s, '', %s, 0, FALSE)
+                ON CONFLICT DO NOTHING  -- logs_upload_key, whichever columns it has
+            """, (user_id, log_timestamp, upload_key))
+            cur.execute(
+                "SELECT log_id, log_size, complete FROM logs WHERE upload_key = %s FOR UPDATE",
+                (upload_key,),
+            )
+            row = cur.fetchone()
+
+        log_id, size, complete = row[0], row[1] or 0, bool(row[2])
+        if offset > size:
+            raise ChunkError(f"Chunk starts at {offset}, log has {size} bytes", status=409, size=size)
+
+        skip = size - offset
+        if skip < len(data):
+            tail = data[skip:]
+            # store the body as sent unless part of it is already stored
+            content = body if skip == 0 else gzip.compress(tail)
+            cur.execute(
+                "INSERT INTO log_chunks (log_id, byte_offset, byte_length, content) VALUES (%s, %s, %s, %s)",
+                (log_id, size, len(tail), content),
+            )
+            size += len(tail)
+
+        complete = complete or bool(final)
+        cur.execute(
+            "UPDATE logs SET log_size = %s, complete = %s WHERE log_id = %s",
+            (size, complete, log_id),
+        )
+
+    return {"log_id": log_id, "size": size, "complete": complete}
+
+
+def upload_status(upload_key) -> dict:
+    ensure()
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT log_id, log_size, complete FROM logs WHERE upload_key = %s", (upload_key,))
+        row = cur.fetchone()
+    if row is None:
+        return {"log_id": None, "size": 0, "complete": False}
+    return {"log_id": row[0], "size": row[1] or 0, "complete": bool(row[2])}
+
+
+def read_range(log_id, start=0, end=None):
+    """
+    Bytes [start, end) of a log and its total size, or None if there is no such
+    log. Legacy logs (one log_content row) are sliced from their content.
+    """
+    ensure()
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT upload_key, log_size, log_content FROM logs WHERE log_id = %s", (log_id,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        upload_key, size, content = row
+
+        if upload_key is None:
+            data = (content or "").encode("utf-8")
+            end = len(data) if end is None else min(end, len(data))
+            return data[start:end], len(data)
+
+        size = size or 0
+        end = size if end is None else min(end, size)
+        if start >= end:
+            return b"", size
+        cur.execute("""
+            SELECT byte_offset, content FROM log_chunks
+            WHERE log_id = %s AND byte_offset < %s AND byte_offset + byte_length > %s
+            ORDER BY byte_offset
+        """, (log_id, end, start))
+        chunks = cur.fetchall()
+
+    out = bytearray()
+    for byte_offset, content in chunks:
+        data = gzip.decompress(bytes(content))
+        lo = max(start - byte_offset, 0)
+        hi = min(end - byte_offset, len(data))
+        out += data[lo:hi]
+    return bytes(out), size
+
+
+def read_all(log_id) -> str:
+    """Whole log as text (for /logs/<id>)."""
+    got = read_range(log_id)
+    if got is None:
+        return None
+    return got[0].decode("utf-8", errors="replace")
@@ -4,10 +4,13 @@ import socket
 import requests
 import csv
 import re
+import json
+import codecs
 # -------- Helpers --------
 import getpass
 import os
 import getpass
+import tempfile
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -20,7 +23,7 @@ from PyQt5.QtWidgets import (
 from getmac import get_mac_address
 
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QDate
-from PyQt5.QtGui import QFont
+from PyQt5.QtGui import QFont, QTextCursor
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
     QPushButton, QLabel, QMessageBox, QFileDialog, QInputDialog,
@@ -35,6 +38,8 @@ import matplotlib.pyplot as plt
 # ✅ EXACTLY SAME as your original (no backend/API changes)
 #API_BASE_URL = "https://tooltracker-afxj.onrender.com"
 API_BASE_URL = os.getenv("API_BASE_URL", "https://tool-tracker-esim-api.onrender.com").rstrip("/")
+LOG_VIEW_PAGE_BYTES = 256 * 1024   # log bytes fetched per "Load more"
+API_PAGE_LIMIT = 500   # rows per /sessions, /logs page
 
 
 # -----------------------------
@@ -162,6 +167,81 @@ class ApiWorker(QThread):
             self.finished.emit(None, e)
 
 
+# -----------------------------
+# Live crash feed (/crashes/stream, Server-Sent Events)
+# -----------------------------
+class CrashFeedWorker(QThread):
+    crashes = pyqtSignal(object)    # list of new crashes, newest first
+    unsupported = pyqtSignal()      # server has no stream endpoint -> poll instead
+
+    def __init__(self, user_id: str, since_id: int = 0):
+        super().__init__()
+        self.user_id = user_id
+        self.since_id = since_id or 0
+        self._stop = False
+        self._response = None
+
+    def stop(self):
+        self._stop = True
+        r = self._response
+        if r is not None:
+            try:
+                r.close()  # unblocks the read in run()
+            except Exception:
+                pass
+
+    def run(self):
+        backoff = 2
+        while not self._stop:
+            try:
+                with requests.get(
+                    f"{API_BASE_URL}/crashes/stream",
+                    params={"user": self.user_id, "since_id": self.since_id},
+                    headers={"Accept": "text/event-stream"},
+                    stream=True,
+                    timeout=(10, 60),  # server sends a keepalive every ~15s
+                ) as r:
+                    if r.status_code == 404:
+                        self.unsupported.emit()
+                        return
+                    r.raise_for_status()
+                    self._response = r
+                    backoff = 2
+                    self._read_events(r)
+            except Exception as e:
+                if self._stop:
+                    break
+                print(f"[CRASH-FEED] {e}; reconnecting in {backoff}s")
+            finally:
+                self._response = None
+            for _ in range(backoff * 10):
+                if self._stop:
+                    return
+                self.msleep(100)
+            backoff = min(backoff * 2, 60)
+
+    def _read_events(self, r):
+        event, data = None, []
+        for line in r.iter_lines(decode_unicode=True):
+            if self._stop:
+                return
+            if line is None:
+                continue
+            if line == "":
+                if event == "crashes" and data:
+                    batch = json.loads("\n".join(data))
+                    if batch:
+                        self.since_id = max(self.since_id, max(c.get("crash_id", 0) for c in batch))
+                        self.crashes.emit(list(reversed(batch)))
+                event, data = None, []
+            elif line.startswith(":"):
+                continue
+            elif line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                data.append(line[5:].lstrip())
+
+
 # -----------------------------
 # Main App
 # -----------------------------
@@ -356,16 +436,48 @@ class TrackerApp(QWidget):
         r.raise_for_status()
         return r.json()
 
+    def api_get_all_pages(self, path: str, params: dict):
+        """Follow the X-Next-After-Id cursor of a paginated list endpoint."""
+        params = dict(params, limit=API_PAGE_LIMIT)
+        items = []
+        while True:
+            r = requests.get(f"{API_BASE_URL}{path}", params=params, timeout=10)
+            r.raise_for_status()
+            items.extend(r.json())
+            next_id = r.headers.get("X-Next-After-Id")
+            if not next_id:
+                return items
+            params["after_id"] = next_id
+
     def api_get_sessions(self, user_id: str):
-        r = requests.get(f"{API_BASE_URL}/sessions", params={"user": user_id}, timeout=10)
-        r.raise_for_status()
-        return r.json()
+        return self.api_get_all_pages("/sessions", {"user": user_id})
 
     def api_get_logs(self, user_id: str):
-        r = requests.get(f"{API_BASE_URL}/logs", params={"user": user_id}, timeout=10)
+        # metadata only; content is fetched per log in view_selected_log
+        return self.api_get_all_pages("/logs", {"user": user_id})
+
+    def api_get_log(self, log_id: int):
+        r = requests.get(f"{API_BASE_URL}/logs/{log_id}", timeout=10)
         r.raise_for_status()
         return r.json()
 
+    def api_get_log_range(self, log_id: int, start: int, length: int = LOG_VIEW_PAGE_BYTES):
+        """
+        (bytes, total size) of one byte range of a log, or None if the server
+        has no /logs/<id>/content yet.
+        """
+        r = requests.get(
+            f"{API_BASE_URL}/logs/{log_id}/content",
+            headers={"Range": f"bytes={start}-{start + length - 1}"},
+            timeout=30,
+        )
+        if r.status_code == 404 and "json" not in r.headers.get("Content-Type", ""):
+            return None
+        if r.status_code == 416:
+            return b"", start
+        r.raise_for_status()
+        return r.content, int(r.headers.get("X-Log-Size", len(r.content)))
+
     # -------- Pages --------
     def build_stats_page(self):
         page = QWidget()
@@ -545,29 +657,44 @@ class TrackerApp(QWidget):
     def export_data(self):
         user = self.generate_username()
         url = f"{API_BASE_URL}/export-data"
-        params = {"user_filter": user}
+        params = {"user_filter": user, "format": "ndjson"}
 
+        # Streamed line by line so large exports never sit in memory; written
+        # to a temporary file next to the target, renamed once complete
+        tmp_path = None
         try:
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            records = response.json()
+            with requests.get(url, params=params, timeout=10, stream=True) as response:
+                if response.status_code == 404:
+                    QMessageBox.information(self, "Export", "No data available.")
+                    return
+                response.raise_for_status()
+
+                file_path, _ = QFileDialog.getSaveFileName(self, "Save CSV", "", "CSV Files (*.csv)")
+                if not file_path:
+                    return
+
+                fd, tmp_path = tempfile.mkstemp(
+                    prefix=".export-", suffix=".csv", dir=os.path.dirname(os.path.abspath(file_path))
+                )
+                with open(fd, mode="w", newline="", encoding="utf-8") as f:
+                    writer = csv.writer(f)
+                    writer.writerow(["User", "Start Time", "End Time", "Duration"])
+                    for line in response.iter_lines(decode_unicode=True):
+                        if not line:
+                            continue
+                        rec = json.loads(line)
+                        writer.writerow([rec["user_id"], rec["session_start"], rec["session_end"], rec["total_duration"]])
+            os.replace(tmp_path, file_path)
+            tmp_path = None
         except Exception as e:
             QMessageBox.warning(self, "Export Failed", str(e))
             return
-
-        if not records:
-            QMessageBox.information(self, "Export", "No data available.")
-            return
-
-        file_path, _ = QFileDialog.getSaveFileName(self, "Save CSV", "", "CSV Files (*.csv)")
-        if not file_path:
-            return
-
-        with open(file_path, mode="w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["User", "Start Time", "End Time", "Duration"])
-            for rec in records:
-                writer.writerow([rec["user_id"], rec["session_start"], rec["session_end"], rec["total_duration"]])
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
 
         QMessageBox.information(self, "Export Successful", "CSV exported successfully.")
 
@@ -690,11 +817,15 @@ class TrackerApp(QWidget):
             return
 
         log = self._logs_cache[row]
-        details = (
-            f"User: {log['user_id']}\n"
-            f"Timestamp: {log['log_timestamp']}\n\n"
-            f"{log['log_content']}"
-        )
+        # Read the log in byte ranges; only servers without ranges send it whole
+        state = {"offset": 0, "size": None, "decoder": codecs.getincrementaldecoder("utf-8")("replace")}
+        try:
+            first = self.api_get_log_range(log["log_id"], 0)
+            if first is None and "log_content" not in log:
+                log = self._logs_cache[row] = self.api_get_log(log["log_id"])
+        except Exception as e:
+            QMessageBox.warning(self, "Log Error", str(e))
+            return
 
         dlg = QDialog(self)
         dlg.setWindowTitle("Log Details")
@@ -703,9 +834,38 @@ class TrackerApp(QWidget):
         lay = QVBoxLayout(dlg)
         text = QTextEdit()
         text.setReadOnly(True)
-        text.setText(details)
+        text.setText(f"User: {log['user_id']}\nTimestamp: {log['log_timestamp']}\n\n")
         lay.addWidget(text)
 
+        more = QPushButton("Load more")
+        lay.addWidget(more)
+
+        def show(chunk):
+            data, size = chunk
+            state["offset"] += len(data)
+            state["size"] = size
+            final = state["offset"] >= size
+            text.moveCursor(QTextCursor.End)
+            text.insertPlainText(state["decoder"].decode(data, final=final))
+            more.setVisible(not final)
+            more.setText(f"Load more ({state['offset'] // 1024} of {size // 1024} KB shown)")
+
+        def load_more():
+            try:
+                chunk = self.api_get_log_range(log["log_id"], state["offset"])
+            except Exception as e:
+                QMessageBox.warning(dlg, "Log Error", str(e))
+                return
+            if chunk is not None:
+                show(chunk)
+
+        more.clicked.connect(load_more)
+        if first is not None:
+            show(first)
+        else:
+            text.insertPlainText(log["log_content"])
+            more.setVisible(False)
+
         btn = QPushButton("Close")
         btn.clicked.connect(dlg.close)
         lay.addWidget(btn)
@@ -1315,6 +1475,7 @@ class TrackerApp(QWidget):
         # --- caches + timer ---
         self._crashes_cache = []
         self._crashes_view = []
+        self._crash_groups = []   # server-side groups (/crash-groups) for the unfiltered view
         self._last_crash_id_seen = 0
 
         if not hasattr(self, "crash_timer"):
@@ -1336,6 +1497,19 @@ class TrackerApp(QWidget):
         w.start()
         self._w_crashes = w
 
+        self.refresh_crash_groups()
+
+    def refresh_crash_groups(self):
+        w = ApiWorker(self.api_get_crash_groups, self.generate_username())
+        w.finished.connect(self.on_crash_groups_loaded)
+        w.start()
+        self._w_crash_groups = w
+
+    def on_crash_groups_loaded(self, groups, err):
+        # Older servers have no /crash-groups; fall back to grouping locally
+        self._crash_groups = [] if err else (groups or [])
+        self.render_crash_groups(self._crashes_view)
+
     def on_crashes_loaded(self, crashes, err):
         if err:
             QMessageBox.warning(self, "Crashes Error", str(err))
@@ -1352,12 +1526,26 @@ class TrackerApp(QWidget):
         self.populate_crash_filter_choices()
         self.apply_crash_filters()
 
-        # start polling only if crashes page is visible (index 3 in your stack)
-        try:
-            if self.stack.currentIndex() == 3:
-                self.crash_timer.start()
-        except Exception:
-            pass
+        # new crashes are pushed by the server; polling only as a fallback
+        self.start_crash_feed()
+
+    # ---------- LIVE FEED ----------
+    def start_crash_feed(self):
+        feed = getattr(self, "_crash_feed", None)
+        if feed is not None and feed.isRunning():
+            return
+        feed = CrashFeedWorker(self.generate_username(), self._last_crash_id_seen)
+        feed.crashes.connect(lambda crashes: self.on_new_crashes_polled(crashes, None))
+        feed.unsupported.connect(self.crash_timer.start)
+        feed.start()
+        self._crash_feed = feed
+
+    def closeEvent(self, event):
+        feed = getattr(self, "_crash_feed", None)
+        if feed is not None:
+            feed.stop()
+            feed.wait(2000)
+        super().closeEvent(event)
 
 
     # ---------- FILTERS ----------
@@ -1431,6 +1619,47 @@ class TrackerApp(QWidget):
         eid = str(c.get("event_id") or 0)
         return f"{exc} | {mod} | {eid}"
 
+    def crash_group_key(self, c: dict) -> str:
+        # server fingerprint (includes normalized message); label for old rows
+        return c.get("signature") or self.crash_signature(c)
+
+    def crash_group_label(self, label: str, signature: str) -> str:
+        # several fingerprints can share exception/module/event: keep rows apart
+        return f"{label} [{signature}]" if signature and signature != label else label
+
+    def crash_filters_active(self) -> bool:
+        return bool(
+            (self.crash_search.text() or "").strip()
+            or self.f_crash_exc.currentText() not in ("", "All")
+            or self.f_crash_mod.currentText() not in ("", "All")
+        )
+
+    def crash_group_rows(self, crashes_view):
+        """[(label, count, last_seen, example)] sorted by count."""
+        if self._crash_groups and not self.crash_filters_active():
+            # already grouped and counted by the server (O(groups))
+            return [
+                (self.crash_group_label(g.get("label") or g.get("signature") or "", g.get("signature") or ""),
+                 int(g.get("count") or 0),
+                 g.get("last_seen") or "", (g.get("example") or "").replace("\n", " "))
+                for g in self._crash_groups
+            ]
+
+        groups = defaultdict(list)
+        for c in crashes_view:
+            groups[self.crash_group_key(c)].append(c)
+
+        rows = []
+        for key, arr in groups.items():
+            rows.append((
+                self.crash_group_label(self.crash_signature(arr[0]), key),
+                len(arr),
+                max((x.get("crash_time") or "" for x in arr), default=""),
+                (arr[0].get("message") or "").replace("\n", " "),
+            ))
+        rows.sort(key=lambda r: r[1], reverse=True)
+        return rows
+
 
     def extract_hint(self, msg: str) -> str:
         if not msg:
@@ -1470,17 +1699,11 @@ class TrackerApp(QWidget):
 
 
     def render_crash_groups(self, crashes_view):
-        groups = defaultdict(list)
-        for c in crashes_view:
-            groups[self.crash_signature(c)].append(c)
-
-        items = sorted(groups.items(), key=lambda kv: len(kv[1]), reverse=True)
+        items = self.crash_group_rows(crashes_view)
         self.crash_group_table.setRowCount(len(items))
 
-        for r, (sig, arr) in enumerate(items):
-            count = len(arr)
-            last_seen = max((x.get("crash_time") or "" for x in arr), default="")
-            example = (arr[0].get("message") or "").replace("\n", " ")[:80]
+        for r, (sig, count, last_seen, example) in enumerate(items):
+            example = example[:80]
 
             self.crash_group_table.setItem(r, 0, QTableWidgetItem(sig))
             self.crash_group_table.setItem(r, 1, QTableWidgetItem(str(count)))
@@ -1570,7 +1793,7 @@ class TrackerApp(QWidget):
 
 
 
-    # ---------- AUTO POLL (since_id) ----------
+    # ---------- AUTO POLL (since_id), for servers without /crashes/stream ----------
     def poll_new_crashes(self):
         # Only poll if crashes page is visible (index 3 in your stack)
         try:
@@ -1592,6 +1815,12 @@ class TrackerApp(QWidget):
         if err or not new_crashes:
             return
 
+        # the feed may resend crashes a reload already fetched
+        known = {c.get("crash_id") for c in self._crashes_cache}
+        new_crashes = [c for c in new_crashes if c.get("crash_id") not in known]
+        if not new_crashes:
+            return
+
         # Add new crashes to cache (prepend)
         self._crashes_cache = (new_crashes or []) + self._crashes_cache
 
@@ -1603,6 +1832,7 @@ class TrackerApp(QWidget):
 
         self.populate_crash_filter_choices()
         self.apply_crash_filters()
+        self.refresh_crash_groups()
 
         QMessageBox.information(self, "New Crash Detected", f"{len(new_crashes)} new crash(es) recorded.")
 
@@ -1663,19 +1893,10 @@ class TrackerApp(QWidget):
         if not file_path:
             return
 
-        groups = defaultdict(list)
-        for c in self._crashes_view:
-            groups[self.crash_signature(c)].append(c)
-
-        rows = []
-        for sig, arr in groups.items():
-            rows.append({
-                "signature": sig,
-                "count": len(arr),
-                "last_seen": max((x.get("crash_time") or "" for x in arr), default=""),
-                "example_message": (arr[0].get("message") or "").replace("\n", " ")[:120]
-            })
-        rows.sort(key=lambda r: r["count"], reverse=True)
+        rows = [
+            {"signature": sig, "count": count, "last_seen": last_seen, "example_message": example[:120]}
+            for sig, count, last_seen, example in self.crash_group_rows(self._crashes_view)
+        ]
 
         try:
             with open(file_path, mode="w", newline="", encoding="utf-8") as f:
@@ -1699,6 +1920,11 @@ class TrackerApp(QWidget):
         r.raise_for_status()
         return r.json()
 
+    def api_get_crash_groups(self, user_id: str):
+        r = requests.get(f"{API_BASE_URL}/crash-groups", params={"user": user_id}, timeout=10)
+        r.raise_for_status()
+        return r.json()
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
 
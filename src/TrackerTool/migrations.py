@@ -0,0 +1,1170 @@
+"""
+Versioned schema migrations for the tracker database.
+
+This module owns the whole schema: the base tables, the indexes behind the
+hot queries of both backends, the tables and triggers of the API modules
+(rollup, crash_groups, crash_feed, crash_notify, log_chunks and the admin
+chart cache) and, on request, monthly partitioning of sessions, logs and
+crashes by time. The API never creates tables itself; each module only
+checks once per process that its migration has been applied (require()).
+
+schema_migrations  (version) -> name, applied_at
+
+Run `python migrations.py up` before every deploy, then start the new
+API processes:
+
+    python migrations.py status
+    python migrations.py up                  # apply pending migrations
+    python migrations.py up --partition      # ... and the partitioning ones
+    python migrations.py maintain            # add the coming months'
+                                             # partitions (run daily)
+    python migrations.py plancheck [--seed]  # EXPLAIN the hot queries,
+                                             # fail on a full scan
+
+Indexes are built CONCURRENTLY on live tables. Partitioning rewrites each
+table under an exclusive lock and keeps the old one as <name>_unpartitioned;
+run it in a maintenance window and restart the API afterwards. plancheck
+--seed first fills an empty scratch database with two years of synthetic
+data, so a missing index shows up as a Seq Scan in CI.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+from db import connect_db, get_conn
+
+
+# ----------------------------
+# Config
+# ----------------------------
+# empty partitions kept ready
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+# older rows stay in <table>_default
+PARTITION_HISTORY_MONTHS = int(os.getenv("PARTITION_HISTORY_MONTHS", "24"))
+
+MIGRATIONS_LOCK_KEY = "schema_migrations"
+
+MIGRATIONS_DDL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version     INTEGER PRIMARY KEY,
+    name        TEXT NOT NULL,
+    applied_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+
+class MigrationPending(RuntimeError):
+    """Raised by require() when the schema is older than the code."""
+
+
+# ----------------------------
+# 0001: base tables
+# ----------------------------
+# What the API expects to exist; a no-op on databases created by hand.
+BASE_DDL = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id      SERIAL PRIMARY KEY,
+    user_id         TEXT NOT NULL,
+    session_start   TIMESTAMP NOT NULL,
+    session_end     TIMESTAMP NOT NULL,
+    total_duration  INTERVAL,
+    location        JSONB,
+    CONSTRAINT sessions_user_start_end_uniq
+        UNIQUE (user_id, session_start, session_end)
+);
+
+CREATE TABLE IF NOT EXISTS logs (
+    log_id         SERIAL PRIMARY KEY,
+    user_id        TEXT NOT NULL,
+    log_timestamp  TIMESTAMP,
+    log_content    TEXT
+);
+
+CREATE TABLE IF NOT EXISTS crashes (
+    crash_id         SERIAL PRIMARY KEY,
+    user_id          TEXT NOT NULL,
+    session_start    TIMESTAMP,
+    session_end      TIMESTAMP,
+    crash_time       TIMESTAMP,
+    event_id         INTEGER,
+    provider         TEXT,
+    exception_code   TEXT,
+    faulting_module  TEXT,
+    message          TEXT,
+    location         JSONB
+);
+
+CREATE TABLE IF NOT EXISTS env_snapshots (
+    snapshot_id         TEXT PRIMARY KEY,
+    user_id             TEXT,
+    session_id          TEXT,
+    timestamp           TIMESTAMP,
+    os_name             TEXT,
+    os_release          TEXT,
+    os_version          TEXT,
+    machine             TEXT,
+    processor           TEXT,
+    cpu_count_logical   INTEGER,
+    cpu_count_physical  INTEGER,
+    total_ram_gb        DOUBLE PRECISION,
+    toolchain           JSONB
+);
+"""
+
+
+# ----------------------------
+# 0002: hot-path indexes
+# ----------------------------
+# Same predicate as the admin map and location coverage queries, so the
+# planner can prove the partial index applies.
+LOCATED = """location ? 'latitude' AND location ? 'longitude'
+    AND NULLIF(location->>'latitude', '') IS NOT NULL
+    AND NULLIF(location->>'longitude', '') IS NOT NULL"""
+
+INDEXES = [
+    # tracker /sessions?user_id keyset pages and /export
+    ("sessions_user_id", "sessions", "(user_id, session_id DESC)"),
+    # admin sessions by user and date range
+    ("sessions_user_start", "sessions", "(user_id, session_start DESC)"),
+    # every chart's date range, latest sessions, sessions by country
+    ("sessions_start_country", "sessions",
+     "(session_start, (location->>'country'))"),
+    # admin map and location coverage: only sessions with coordinates
+    ("sessions_located", "sessions",
+     f"(session_start DESC) WHERE {LOCATED}"),
+
+    ("logs_user_id", "logs", "(user_id, log_id DESC)"),
+    ("logs_user_time", "logs", "(user_id, log_timestamp DESC)"),
+    ("logs_time", "logs", "(log_timestamp DESC)"),
+
+    # tracker /crashes?user&since_id and the /crashes/stream backlog
+    ("crashes_user_id", "crashes", "(user_id, crash_id DESC)"),
+    ("crashes_user_time", "crashes", "(user_id, crash_time DESC)"),
+    ("crashes_time", "crashes", "(crash_time DESC)"),
+]
+
+
+def relkind(cur, table):
+    """'r' plain table, 'p' partitioned, None if missing."""
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)",
+                (table,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def create_index(conn, name, table, definition, unique=False):
+    """
+    Build one index unless a valid one exists. Plain tables get
+    CONCURRENTLY, so conn must be in autocommit mode; an invalid index left
+    by an interrupted concurrent build is dropped and rebuilt.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT i.indisvalid FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.oid = to_regclass(%s)
+        """, (name,))
+        row = cur.fetchone()
+        if row and row[0]:
+            return
+        concurrently = "" if relkind(cur, table) == "p" else "CONCURRENTLY "
+        if row:
+            print(f"[MIGRATE] Rebuilding invalid index {name}", flush=True)
+            cur.execute(f"DROP INDEX {concurrently}{name}")
+        t0 = time.time()
+        cur.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX "
+                    f"{concurrently}{name} ON {table} {definition}")
+        print(f"[MIGRATE] Index {name} built in {time.time() - t0:.1f}s",
+              flush=True)
+
+
+def create_indexes(conn, table=None):
+    """Build INDEXES (those of `table` only, if given)."""
+    for name, on, definition in INDEXES:
+        if not table or on == table:
+            create_index(conn, name, on, definition)
+
+
+# ----------------------------
+# 0003-0005: partitioning (opt-in)
+# ----------------------------
+# Unique indexes on a partitioned table must contain the partition key, so
+# each table's primary/unique keys are restated here. crash_time may be
+# NULL, so crashes keeps a plain index on crash_id instead of a primary key
+# (ids still come from the sequence). "unique" pairs the old unique index
+# name with the statement that takes its place.
+PARTITIONS = {
+    "sessions": {
+        "key": "session_start",
+        "id": "session_id",
+        "unique": [
+            ("sessions_pkey",
+             "ALTER TABLE sessions ADD CONSTRAINT sessions_pkey "
+             "PRIMARY KEY (session_id, session_start)"),
+            ("sessions_user_start_end_uniq",
+             "ALTER TABLE sessions ADD CONSTRAINT "
+             "sessions_user_start_end_uniq "
+             "UNIQUE (user_id, session_start, session_end)"),
+        ],
+    },
+    "logs": {
+        "key": "log_timestamp",
+        "id": "log_id",
+        "not_null": True,
+        "unique": [
+            ("logs_pkey",
+             "ALTER TABLE logs ADD CONSTRAINT logs_pkey "
+             "PRIMARY KEY (log_id, log_timestamp)"),
+            ("logs_upload_key",
+             "CREATE UNIQUE INDEX logs_upload_key "
+             "ON logs (upload_key, log_timestamp)"),
+        ],
+    },
+    "crashes": {
+        "key": "crash_time",
+        "id": "crash_id",
+        "unique": [
+            ("crashes_pkey",
+             "CREATE INDEX crashes_crash_id ON crashes (crash_id)"),
+        ],
+    },
+}
+
+
+def add_months(d: date, n: int) -> date:
+    m = d.month - 1 + n
+    return date(d.year + m // 12, m % 12 + 1, 1)
+
+
+def partition_name(table, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def add_partition(cur, table, month: date):
+    """
+    Create the partition for `month`. Rows for that month already sitting in
+    the default partition are moved while it is detached, so no trigger sees
+    them as new rows.
+    """
+    key = PARTITIONS[table]["key"]
+    name, default = partition_name(table, month), f"{table}_default"
+    bounds = (str(month), str(add_months(month, 1)))
+    in_month = f"{key} >= %s AND {key} < %s"
+
+    cur.execute(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_month})",
+                bounds)
+    if not cur.fetchone()[0]:
+        cur.execute(f"CREATE TABLE {name} PARTITION OF {table} "
+                    f"FOR VALUES FROM (%s) TO (%s)", bounds)
+        return
+
+    cur.execute(f"ALTER TABLE {table} DETACH PARTITION {default}")
+    cur.execute(f"CREATE TABLE {name} "
+                f"(LIKE {table} INCLUDING DEFAULTS INCLUDING STORAGE)")
+    cur.execute(f"INSERT INTO {name} SELECT * FROM {default} "
+                f"WHERE {in_month}", bounds)
+    print(f"[MIGRATE] Moved {cur.rowcount} rows from {default} to {name}",
+          flush=True)
+    cur.execute(f"DELETE FROM {default} WHERE {in_month}", bounds)
+    cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} "
+                f"FOR VALUES FROM (%s) TO (%s)", bounds)
+    cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT")
+
+
+def partition(conn, table):
+    """Swap `table` for a copy range-partitioned by month; one transaction."""
+    spec = PARTITIONS[table]
+    key, id_col = spec["key"], spec["id"]
+    old = f"{table}_unpartitioned"
+
+    with conn, conn.cursor() as cur:
+        if relkind(cur, table) == "p":
+            print(f"[MIGRATE] {table} is already partitioned", flush=True)
+            return
+        cur.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+
+        if spec.get("not_null"):
+            cur.execute(
+                f"SELECT EXISTS (SELECT 1 FROM {table} WHERE {key} IS NULL)")
+            if cur.fetchone()[0]:
+                raise RuntimeError(f"{table} has rows without {key}; "
+                                   f"fix or delete them before partitioning")
+        if table == "logs":
+            # the upload columns may not exist yet if 0010 has not run
+            cur.execute(LOG_COLUMNS_DDL)
+            cur.execute(LOG_CHUNKS_DDL)
+            cur.execute(LOG_CHUNKS_CASCADE_DDL)
+
+        # definitions are taken before the rename, so they name `table`
+        cur.execute("""
+            SELECT c.relname, pg_get_indexdef(i.indexrelid), i.indisunique
+            FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = %s::regclass
+        """, (table,))
+        indexes = cur.fetchall()
+        cur.execute("""
+            SELECT tgname, pg_get_triggerdef(oid) FROM pg_trigger
+            WHERE tgrelid = %s::regclass AND NOT tgisinternal
+        """, (table,))
+        triggers = cur.fetchall()
+        cur.execute(
+            f"SELECT date_trunc('month', MIN({key}))::date FROM {table}")
+        oldest = cur.fetchone()[0]
+
+        # the old table keeps its rows but gives up its names and triggers
+        cur.execute(f"ALTER TABLE {table} RENAME TO {old}")
+        for name, _, _ in indexes:
+            if name.startswith(table + "_"):
+                new_name = old + name[len(table):]
+            else:
+                new_name = f"{name}_unpartitioned"
+            cur.execute(f"ALTER INDEX {name} RENAME TO {new_name[:63]}")
+        for name, _ in triggers:
+            cur.execute(f"DROP TRIGGER {name} ON {old}")
+
+        cur.execute(f"""
+            CREATE TABLE {table} (LIKE {old}
+                INCLUDING DEFAULTS INCLUDING IDENTITY
+                INCLUDING GENERATED INCLUDING STORAGE)
+            PARTITION BY RANGE ({key})
+        """)
+        if spec.get("not_null"):
+            cur.execute(f"ALTER TABLE {table} ALTER COLUMN {key} SET NOT NULL")
+        cur.execute(f"CREATE TABLE {table}_default PARTITION OF {table} "
+                    f"DEFAULT")
+        this_month = date.today().replace(day=1)
+        month = add_months(this_month, -PARTITION_HISTORY_MONTHS)
+        if oldest and oldest > month:
+            month = oldest
+        while month <= add_months(this_month, PARTITION_MONTHS_AHEAD):
+            add_partition(cur, table, month)
+            month = add_months(month, 1)
+
+        restated = set()
+        for name, sql in spec["unique"]:
+            cur.execute(sql)
+            restated.add(name)
+        for name, indexdef, unique in indexes:
+            if not unique:
+                cur.execute(indexdef)
+            elif name not in restated:
+                print(f"[MIGRATE] {table}: unique index {name} not carried "
+                      f"over (it does not contain {key})", flush=True)
+        create_indexes(conn, table)
+
+        t0 = time.time()
+        cur.execute(f"INSERT INTO {table} OVERRIDING SYSTEM VALUE "
+                    f"SELECT * FROM {old}")
+        print(f"[MIGRATE] Copied {cur.rowcount} rows into partitioned "
+              f"{table} in {time.time() - t0:.1f}s", flush=True)
+
+        # keep ids increasing: hand the serial sequence over, or advance
+        # the new identity
+        cur.execute("SELECT attidentity FROM pg_attribute "
+                    "WHERE attrelid = %s::regclass AND attname = %s",
+                    (table, id_col))
+        if cur.fetchone()[0]:
+            cur.execute(f"SELECT setval(pg_get_serial_sequence(%s, %s), "
+                        f"COALESCE(MAX({id_col}), 0) + 1, false) "
+                        f"FROM {table}", (table, id_col))
+        else:
+            cur.execute("SELECT pg_get_serial_sequence(%s, %s)",
+                        (old, id_col))
+            seq = cur.fetchone()[0]
+            if seq:
+                cur.execute(f"ALTER SEQUENCE {seq} OWNED BY {table}.{id_col}")
+
+        # triggers last, so the copy did not count every row again
+        for _, triggerdef in triggers:
+            cur.execute(triggerdef)
+        if table == "logs":
+            cur.execute(LOG_CHUNKS_TRIGGER_DDL)
+        cur.execute(f"ANALYZE {table}")
+
+
+def maintain(months_ahead=PARTITION_MONTHS_AHEAD):
+    """Create missing monthly partitions up to `months_ahead` months ahead."""
+    conn = connect_db()
+    try:
+        for table in PARTITIONS:
+            with conn, conn.cursor() as cur:
+                if relkind(cur, table) != "p":
+                    continue
+                this_month = date.today().replace(day=1)
+                for n in range(months_ahead + 1):
+                    month = add_months(this_month, n)
+                    if relkind(cur, partition_name(table, month)):
+                        continue
+                    cur.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+                    add_partition(cur, table, month)
+                    print(f"[MIGRATE] Created {partition_name(table, month)}",
+                          flush=True)
+    finally:
+        conn.close()
+
+
+# ----------------------------
+# 0006: session rollups (rollup.py)
+# ----------------------------
+# session_rollup_daily / session_rollup_user, kept up to date by a trigger
+# on sessions. DROP TRIGGER: databases from before this migration may
+# already have it.
+ROLLUP_DDL = """
+CREATE TABLE IF NOT EXISTS session_rollup_daily (
+    user_id        TEXT NOT NULL,
+    day            DATE NOT NULL,
+    sessions       BIGINT NOT NULL DEFAULT 0,
+    total_seconds  DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+CREATE INDEX IF NOT EXISTS session_rollup_daily_day
+    ON session_rollup_daily (day);
+
+CREATE TABLE IF NOT EXISTS session_rollup_user (
+    user_id        TEXT PRIMARY KEY,
+    sessions       BIGINT NOT NULL DEFAULT 0,
+    total_seconds  DOUBLE PRECISION NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION session_rollup_add(
+    p_user TEXT, p_day DATE, p_n BIGINT, p_secs DOUBLE PRECISION
+) RETURNS void AS $$
+BEGIN
+    INSERT INTO session_rollup_daily AS r (user_id, day, sessions,
+                                           total_seconds)
+    VALUES (p_user, p_day, p_n, p_secs)
+    ON CONFLICT (user_id, day) DO UPDATE
+       SET sessions = r.sessions + EXCLUDED.sessions,
+           total_seconds = r.total_seconds + EXCLUDED.total_seconds;
+
+    INSERT INTO session_rollup_user AS u (user_id, sessions, total_seconds)
+    VALUES (p_user, p_n, p_secs)
+    ON CONFLICT (user_id) DO UPDATE
+       SET sessions = u.sessions + EXCLUDED.sessions,
+           total_seconds = u.total_seconds + EXCLUDED.total_seconds;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION session_rollup_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM session_rollup_add(
+            OLD.user_id, OLD.session_start::date, -1,
+            -COALESCE(EXTRACT(EPOCH FROM OLD.total_duration), 0));
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM session_rollup_add(
+            NEW.user_id, NEW.session_start::date, 1,
+            COALESCE(EXTRACT(EPOCH FROM NEW.total_duration), 0));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sessions_rollup ON sessions;
+CREATE TRIGGER sessions_rollup
+    AFTER INSERT OR DELETE
+       OR UPDATE OF user_id, session_start, total_duration ON sessions
+    FOR EACH ROW EXECUTE FUNCTION session_rollup_apply();
+"""
+
+
+def add_rollups(conn):
+    """Tables and trigger, then a backfill under the same lock."""
+    import rollup
+    with conn, conn.cursor() as cur:
+        cur.execute(ROLLUP_DDL)
+        cur.execute("LOCK TABLE sessions IN SHARE MODE")
+        cur.execute(rollup.REBUILD_SQL)
+
+
+# ----------------------------
+# 0007: crash signatures and groups (crash_groups.py)
+# ----------------------------
+CRASH_GROUPS_DDL = """
+CREATE TABLE IF NOT EXISTS crash_groups (
+    signature        TEXT PRIMARY KEY,
+    label            TEXT NOT NULL,
+    exception_code   TEXT,
+    faulting_module  TEXT,
+    event_id         INTEGER,
+    crash_count      BIGINT NOT NULL DEFAULT 0,
+    first_seen       TIMESTAMP,
+    last_seen        TIMESTAMP,
+    last_crash_id    BIGINT,
+    example          TEXT
+);
+CREATE INDEX IF NOT EXISTS crash_groups_count
+    ON crash_groups (crash_count DESC, last_seen DESC);
+
+CREATE TABLE IF NOT EXISTS crash_group_daily (
+    signature  TEXT NOT NULL,
+    user_id    TEXT NOT NULL,
+    day        DATE NOT NULL,
+    crashes    BIGINT NOT NULL DEFAULT 0,
+    last_seen  TIMESTAMP,
+    PRIMARY KEY (signature, user_id, day)
+);
+CREATE INDEX IF NOT EXISTS crash_group_daily_day
+    ON crash_group_daily (day);
+CREATE INDEX IF NOT EXISTS crash_group_daily_user
+    ON crash_group_daily (user_id, day);
+
+CREATE OR REPLACE FUNCTION crash_groups_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.signature IS NOT NULL THEN
+        UPDATE crash_group_daily
+           SET crashes = crashes - 1
+         WHERE signature = OLD.signature AND user_id = OLD.user_id
+           AND day = COALESCE(OLD.crash_time::date, DATE '1970-01-01');
+        DELETE FROM crash_group_daily
+         WHERE signature = OLD.signature AND crashes <= 0;
+
+        -- first/last seen come from the signature index, not a full scan
+        UPDATE crash_groups g
+           SET crash_count = g.crash_count - 1,
+               first_seen = s.first_seen,
+               last_seen = s.last_seen
+          FROM (SELECT MIN(crash_time) AS first_seen,
+                       MAX(crash_time) AS last_seen
+                  FROM crashes WHERE signature = OLD.signature) s
+         WHERE g.signature = OLD.signature;
+        DELETE FROM crash_groups
+         WHERE signature = OLD.signature AND crash_count <= 0;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.signature IS NOT NULL THEN
+        INSERT INTO crash_groups AS g (
+            signature, label, exception_code, faulting_module, event_id,
+            crash_count, first_seen, last_seen, last_crash_id, example
+        )
+        VALUES (
+            NEW.signature,
+            CONCAT(COALESCE(NULLIF(NEW.exception_code, ''), 'no-code'),
+                   ' | ',
+                   COALESCE(NULLIF(NEW.faulting_module, ''), 'no-module'),
+                   ' | ',
+                   COALESCE(NEW.event_id, 0)::text),
+            NEW.exception_code, NEW.faulting_module, NEW.event_id,
+            1, NEW.crash_time, NEW.crash_time, NEW.crash_id,
+            LEFT(NEW.message, 500)
+        )
+        ON CONFLICT (signature) DO UPDATE
+           SET crash_count = g.crash_count + 1,
+               first_seen = LEAST(g.first_seen, EXCLUDED.first_seen),
+               last_seen = GREATEST(g.last_seen, EXCLUDED.last_seen),
+               last_crash_id = GREATEST(g.last_crash_id,
+                                        EXCLUDED.last_crash_id),
+               example = CASE WHEN EXCLUDED.last_seen >= g.last_seen
+                                   OR g.last_seen IS NULL
+                              THEN EXCLUDED.example ELSE g.example END;
+
+        INSERT INTO crash_group_daily AS d (signature, user_id, day,
+                                            crashes, last_seen)
+        VALUES (NEW.signature, NEW.user_id,
+                COALESCE(NEW.crash_time::date, DATE '1970-01-01'),
+                1, NEW.crash_time)
+        ON CONFLICT (signature, user_id, day) DO UPDATE
+           SET crashes = d.crashes + 1,
+               last_seen = GREATEST(d.last_seen, EXCLUDED.last_seen);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS crashes_groups ON crashes;
+CREATE TRIGGER crashes_groups
+    AFTER INSERT OR DELETE
+       OR UPDATE OF signature, user_id, crash_time ON crashes
+    FOR EACH ROW EXECUTE FUNCTION crash_groups_apply();
+"""
+
+
+def add_crash_groups(conn):
+    """
+    Signature column and index, group tables and trigger, then fingerprint
+    the crashes that have no signature (the trigger groups them).
+    """
+    import crash_groups
+    with conn.cursor() as cur:
+        cur.execute("ALTER TABLE crashes ADD COLUMN IF NOT EXISTS "
+                    "signature TEXT")
+    create_index(conn, "crashes_signature", "crashes", "(signature)")
+    with conn, conn.cursor() as cur:
+        cur.execute(CRASH_GROUPS_DDL)
+    crash_groups.backfill()
+
+
+# ----------------------------
+# 0008: crash feed trigger (crash_feed.py)
+# ----------------------------
+CRASH_FEED_DDL = """
+CREATE OR REPLACE FUNCTION crash_feed_notify() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('crash_feed', NEW.crash_id::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS crashes_feed ON crashes;
+CREATE TRIGGER crashes_feed
+    AFTER INSERT ON crashes
+    FOR EACH ROW EXECUTE FUNCTION crash_feed_notify();
+"""
+
+
+# ----------------------------
+# 0009: crash notification queue (crash_notify.py)
+# ----------------------------
+# The trigger reads its limits from crash_notify_settings, which the
+# notification worker updates from its CRASH_NOTIFY_* settings at startup.
+CRASH_NOTIFY_DDL = """
+CREATE TABLE IF NOT EXISTS crash_notify_settings (
+    id           BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    max_pending  INTEGER NOT NULL,
+    users        INTEGER NOT NULL,
+    gather_secs  INTEGER NOT NULL,
+    window_secs  INTEGER NOT NULL
+);
+INSERT INTO crash_notify_settings (max_pending, users, gather_secs,
+                                   window_secs)
+VALUES (200, 20, 60, 3600)
+ON CONFLICT DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS crash_notify_queue (
+    signature        TEXT PRIMARY KEY,
+    pending          INTEGER NOT NULL DEFAULT 0,
+    users            TEXT[] NOT NULL DEFAULT '{}',
+    last_crash_id    BIGINT,
+    last_sent_at     TIMESTAMP,
+    next_attempt_at  TIMESTAMP NOT NULL,
+    attempts         INTEGER NOT NULL DEFAULT 0,
+    last_error       TEXT
+);
+CREATE INDEX IF NOT EXISTS crash_notify_due
+    ON crash_notify_queue (next_attempt_at) WHERE pending > 0;
+
+CREATE OR REPLACE FUNCTION crash_notify_enqueue() RETURNS trigger AS $$
+DECLARE
+    sig TEXT := COALESCE(NEW.signature, '');
+    cfg crash_notify_settings%ROWTYPE;
+BEGIN
+    SELECT * INTO cfg FROM crash_notify_settings;
+    IF NOT EXISTS (SELECT 1 FROM crash_notify_queue WHERE signature = sig)
+       AND (SELECT COUNT(*) FROM crash_notify_queue WHERE pending > 0)
+           >= cfg.max_pending THEN
+        sig := '*';
+    END IF;
+
+    INSERT INTO crash_notify_queue AS q (signature, pending, users,
+                                         last_crash_id, next_attempt_at)
+    VALUES (sig, 1, ARRAY[NEW.user_id], NEW.crash_id,
+            now() + make_interval(secs => cfg.gather_secs))
+    ON CONFLICT (signature) DO UPDATE
+       SET pending = q.pending + 1,
+           users = CASE WHEN NEW.user_id = ANY(q.users)
+                             OR cardinality(q.users) >= cfg.users
+                        THEN q.users ELSE q.users || NEW.user_id END,
+           last_crash_id = GREATEST(q.last_crash_id, NEW.crash_id),
+           -- first crash since the last email: due after the gather delay,
+           -- but not before the signature's window has passed
+           next_attempt_at = CASE WHEN q.pending = 0
+               THEN GREATEST(now() + make_interval(secs => cfg.gather_secs),
+                             COALESCE(q.last_sent_at
+                                      + make_interval(secs => cfg.window_secs),
+                                      now()))
+               ELSE q.next_attempt_at END,
+           attempts = CASE WHEN q.pending = 0 THEN 0 ELSE q.attempts END;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS crashes_notify ON crashes;
+CREATE TRIGGER crashes_notify
+    AFTER INSERT ON crashes
+    FOR EACH ROW EXECUTE FUNCTION crash_notify_enqueue();
+"""
+
+
+# ----------------------------
+# 0010: chunked log uploads (log_chunks.py)
+# ----------------------------
+LOG_COLUMNS_DDL = """
+ALTER TABLE logs ADD COLUMN IF NOT EXISTS upload_key TEXT;
+ALTER TABLE logs ADD COLUMN IF NOT EXISTS log_size BIGINT;
+ALTER TABLE logs ADD COLUMN IF NOT EXISTS complete BOOLEAN;
+"""
+LOG_CHUNKS_DDL = """
+CREATE TABLE IF NOT EXISTS log_chunks (
+    log_id       BIGINT NOT NULL,
+    byte_offset  BIGINT NOT NULL,
+    byte_length  INTEGER NOT NULL,
+    content      BYTEA NOT NULL,
+    PRIMARY KEY (log_id, byte_offset)
+);
+"""
+LOG_CHUNKS_FK_DDL = """
+ALTER TABLE log_chunks ADD CONSTRAINT log_chunks_log_id_fkey
+    FOREIGN KEY (log_id) REFERENCES logs (log_id) ON DELETE CASCADE;
+"""
+
+# log_chunks cannot reference a partitioned logs (log_id alone is not unique
+# there); a trigger keeps the ON DELETE CASCADE behaviour.
+LOG_CHUNKS_CASCADE_DDL = """
+ALTER TABLE log_chunks DROP CONSTRAINT IF EXISTS log_chunks_log_id_fkey;
+
+CREATE OR REPLACE FUNCTION log_chunks_cascade() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM log_chunks WHERE log_id = OLD.log_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+LOG_CHUNKS_TRIGGER_DDL = """
+CREATE TRIGGER logs_chunks_cascade
+    AFTER DELETE ON logs
+    FOR EACH ROW EXECUTE FUNCTION log_chunks_cascade();
+"""
+
+
+def add_log_chunks(conn):
+    """Upload columns and their unique key, then the chunk table."""
+    with conn.cursor() as cur:
+        cur.execute(LOG_COLUMNS_DDL)
+        partitioned = relkind(cur, "logs") == "p"
+    # a partitioned logs (0004) has it on (upload_key, log_timestamp)
+    create_index(conn, "logs_upload_key", "logs",
+                 "(upload_key, log_timestamp)" if partitioned
+                 else "(upload_key)", unique=True)
+    with conn, conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('log_chunks') IS NULL")
+        fresh = cur.fetchone()[0]
+        cur.execute(LOG_CHUNKS_DDL)
+        if partitioned:
+            cur.execute(LOG_CHUNKS_CASCADE_DDL)
+            cur.execute("DROP TRIGGER IF EXISTS logs_chunks_cascade ON logs")
+            cur.execute(LOG_CHUNKS_TRIGGER_DDL)
+        elif fresh:
+            cur.execute(LOG_CHUNKS_FK_DDL)
+
+
+# ----------------------------
+# 0011: data versions (admin-dashboard/backend/cache.py)
+# ----------------------------
+# A statement-level trigger bumps data_versions.version for a table whenever
+# rows are inserted/updated/deleted, so the admin chart cache invalidates
+# exactly the charts that read them.
+DATA_VERSIONS_DDL = """
+CREATE TABLE IF NOT EXISTS data_versions (
+    table_name  TEXT PRIMARY KEY,
+    version     BIGINT NOT NULL DEFAULT 0,
+    updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO data_versions AS v (table_name, version, updated_at)
+    VALUES (TG_TABLE_NAME, 1, now())
+    ON CONFLICT (table_name) DO UPDATE
+       SET version = v.version + 1, updated_at = now();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sessions_data_version ON sessions;
+CREATE TRIGGER sessions_data_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON sessions
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+
+DROP TRIGGER IF EXISTS crashes_data_version ON crashes;
+CREATE TRIGGER crashes_data_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON crashes
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+"""
+
+
+# ----------------------------
+# Registry and runner
+# ----------------------------
+# (version, name, SQL or callable(conn), opt-in)
+# SQL runs in one transaction with its schema_migrations row; callables get
+# an autocommit connection and manage their own transactions.
+MIGRATIONS = [
+    (1, "base tables", BASE_DDL, False),
+    (2, "hot-path indexes", create_indexes, False),
+    (3, "partition sessions by month",
+     lambda conn: partition(conn, "sessions"), True),
+    (4, "partition logs by month",
+     lambda conn: partition(conn, "logs"), True),
+    (5, "partition crashes by month",
+     lambda conn: partition(conn, "crashes"), True),
+    (6, "session rollups", add_rollups, False),
+    (7, "crash signatures and groups", add_crash_groups, False),
+    (8, "crash feed trigger", CRASH_FEED_DDL, False),
+    (9, "crash notification queue", CRASH_NOTIFY_DDL, False),
+    (10, "chunked log uploads", add_log_chunks, False),
+    (11, "data versions", DATA_VERSIONS_DDL, False),
+]
+
+_required = set()
+
+
+def require(version):
+    """
+    Raise MigrationPending unless `version` has been applied. The API
+    modules call this instead of creating their tables; it queries the
+    database until the first success, then never again in this process.
+    """
+    if version in _required:
+        return
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+        ok = cur.fetchone()[0]
+        if ok:
+            cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s",
+                        (version,))
+            ok = cur.fetchone() is not None
+    if not ok:
+        raise MigrationPending(f"Migration {version:04d} has not been "
+                               f"applied; run `python migrations.py up`")
+    _required.add(version)
+
+
+def applied(cur) -> dict:
+    cur.execute(MIGRATIONS_DDL)
+    cur.execute("SELECT version, applied_at FROM schema_migrations")
+    return dict(cur.fetchall())
+
+
+def status():
+    conn = connect_db()
+    try:
+        with conn, conn.cursor() as cur:
+            done = applied(cur)
+    finally:
+        conn.close()
+    for version, name, _, optional in MIGRATIONS:
+        if version in done:
+            state = f"applied {done[version]:%Y-%m-%d %H:%M}"
+        else:
+            state = "pending (--partition)" if optional else "pending"
+        print(f"{version:04d}  {name:32s} {state}")
+
+
+def up(include_optional=False) -> int:
+    """Apply pending migrations in order; returns how many ran."""
+    conn = connect_db()
+    conn.autocommit = True
+    ran = 0
+    try:
+        with conn.cursor() as cur:
+            # session-level lock: some migrations commit more than once
+            cur.execute("SELECT pg_advisory_lock(hashtext(%s))",
+                        (MIGRATIONS_LOCK_KEY,))
+            done = applied(cur)
+
+        for version, name, apply, optional in MIGRATIONS:
+            if version in done or (optional and not include_optional):
+                continue
+            print(f"[MIGRATE] {version:04d} {name}", flush=True)
+            t0 = time.time()
+            record = ("INSERT INTO schema_migrations (version, name) "
+                      "VALUES (%s, %s)")
+            if callable(apply):
+                apply(conn)
+                with conn, conn.cursor() as cur:
+                    cur.execute(record, (version, name))
+            else:
+                with conn, conn.cursor() as cur:
+                    cur.execute(apply)
+                    cur.execute(record, (version, name))
+            print(f"[MIGRATE] {version:04d} done in {time.time() - t0:.1f}s",
+                  flush=True)
+            ran += 1
+    finally:
+        conn.close()   # also releases the advisory lock
+    return ran
+
+
+# ----------------------------
+# Query-plan regression check
+# ----------------------------
+# The hot queries of the tracker API (app.py, crash_feed.py) and the admin
+# backend (admin-dashboard/backend/app.py), with the parameters they are
+# called with. Keep them in step with the endpoints.
+PLAN_QUERIES = [
+    ("tracker /sessions?user_id", """
+        SELECT session_id, user_id, session_start, session_end,
+               total_duration
+        FROM sessions WHERE user_id = %(user)s
+        ORDER BY session_id DESC LIMIT 501"""),
+    ("tracker /logs?user_id", """
+        SELECT log_id, user_id, log_timestamp FROM logs
+        WHERE user_id = %(user)s ORDER BY log_id DESC LIMIT 501"""),
+    ("tracker /crashes?user&since_id", """
+        SELECT * FROM crashes
+        WHERE user_id = %(user)s AND crash_id > %(since_id)s
+        ORDER BY crash_id DESC LIMIT 200"""),
+    ("tracker /crashes/stream backlog", """
+        SELECT * FROM crashes
+        WHERE crash_id > %(since_id)s AND user_id = %(user)s
+        ORDER BY crash_id LIMIT 1000"""),
+    ("tracker /export?user_filter", """
+        SELECT user_id, session_start, session_end, total_duration, location
+        FROM sessions WHERE user_id = %(user)s ORDER BY session_id"""),
+    ("admin /admin/overview counts", """
+        SELECT (SELECT COUNT(*) FROM sessions
+                WHERE session_start >= %(since)s),
+               (SELECT COUNT(*) FROM crashes
+                WHERE crash_time >= %(since)s)"""),
+    ("admin /admin/overview latest", """
+        SELECT (SELECT array_agg(user_id) FROM (SELECT user_id FROM sessions
+                ORDER BY session_start DESC LIMIT 8) s),
+               (SELECT array_agg(crash_id) FROM (SELECT crash_id FROM crashes
+                ORDER BY crash_time DESC LIMIT 8) c)"""),
+    ("admin /admin/sessions", """
+        SELECT session_id, user_id, session_start, session_end,
+               total_duration, location
+        FROM sessions ORDER BY session_start DESC LIMIT 200"""),
+    ("admin /admin/sessions?user&from&to", """
+        SELECT session_id, user_id, session_start, session_end,
+               total_duration, location
+        FROM sessions
+        WHERE user_id = %(user)s
+          AND session_start >= %(from)s AND session_start <= %(to)s
+        ORDER BY session_start DESC LIMIT 200"""),
+    ("admin /admin/logs", """
+        SELECT log_id, user_id, log_timestamp, log_content FROM logs
+        ORDER BY log_timestamp DESC LIMIT 200"""),
+    ("admin /admin/logs?user", """
+        SELECT log_id, user_id, log_timestamp, log_content FROM logs
+        WHERE user_id = %(user)s ORDER BY log_timestamp DESC LIMIT 200"""),
+    ("admin /admin/crashes", """
+        SELECT * FROM crashes ORDER BY crash_time DESC LIMIT 500"""),
+    ("admin /admin/crashes?user", """
+        SELECT * FROM crashes WHERE user_id = %(user)s
+        ORDER BY crash_time DESC LIMIT 500"""),
+    ("chart sessions_per_user", """
+        SELECT user_id, COUNT(*)::int AS sessions FROM sessions
+        WHERE session_start >= %(from)s AND session_start <= %(to)s
+        GROUP BY user_id ORDER BY sessions DESC"""),
+    ("chart new_vs_returning", """
+        SELECT COUNT(*) FILTER (WHERE NOT seen_before)::int AS new_users,
+               COUNT(*) FILTER (WHERE seen_before)::int AS returning_users
+        FROM (
+          SELECT EXISTS (SELECT 1 FROM sessions s
+                         WHERE s.user_id = a.user_id
+                           AND s.session_start < %(from)s) AS seen_before
+          FROM (SELECT DISTINCT user_id FROM sessions
+                WHERE session_start >= %(from)s
+                  AND session_start <= %(to)s) a
+        ) t"""),
+    ("chart crashes_daily", """
+        SELECT to_char(date_trunc('day', crash_time), 'YYYY-MM-DD') AS day,
+               COUNT(*)::int
+        FROM crashes WHERE crash_time >= %(from)s AND crash_time <= %(to)s
+        GROUP BY 1 ORDER BY 1"""),
+    ("chart sessions_by_country", """
+        SELECT COALESCE(NULLIF(location->>'country',''), 'Unknown')
+                   AS country,
+               COUNT(*)::int AS sessions
+        FROM sessions
+        WHERE session_start >= %(from)s AND session_start <= %(to)s
+        GROUP BY 1 ORDER BY sessions DESC LIMIT 12"""),
+    ("chart location_coverage", f"""
+        SELECT COUNT(*)::int,
+               COUNT(*) FILTER (WHERE location IS NOT NULL
+                                  AND {LOCATED})::int
+        FROM sessions
+        WHERE session_start >= %(from)s AND session_start <= %(to)s"""),
+    ("admin /admin/locations", f"""
+        SELECT user_id, session_start,
+               COALESCE(location->>'country','') AS country,
+               (location->>'latitude')::double precision AS latitude,
+               (location->>'longitude')::double precision AS longitude
+        FROM sessions
+        WHERE session_start >= %(from)s AND session_start <= %(to)s
+          AND location IS NOT NULL AND {LOCATED}
+        ORDER BY session_start DESC LIMIT 2000"""),
+]
+
+HOT_TABLES = ("sessions", "logs", "crashes")
+
+SEED_SESSIONS, SEED_LOGS, SEED_CRASHES = 300_000, 100_000, 200_000
+SEED_USERS, SEED_DAYS = 2000, 700
+
+SEED_SQL = """
+INSERT INTO sessions (user_id, session_start, session_end, total_duration,
+                      location)
+SELECT 'seed-' || (g %% %(users)s), t, t + d, d,
+       CASE WHEN g %% 10 < 7 THEN jsonb_build_object(
+           'country', (ARRAY['India', 'United States', 'Germany',
+                             'Brazil', 'Japan', 'Kenya', 'France',
+                             'Canada'])[1 + g %% 8],
+           'city', 'City ' || (g %% 50),
+           'latitude', (g * 37) %% 120 - 60,
+           'longitude', (g * 53) %% 340 - 170)
+       END
+FROM generate_series(1, %(sessions)s) g,
+     LATERAL (SELECT now() - (g * %(days)s::float / %(sessions)s)
+                             * interval '1 day' AS t,
+                     ((g %% 240) + 5) * interval '1 minute' AS d) x;
+
+INSERT INTO logs (user_id, log_timestamp, log_content)
+SELECT 'seed-' || (g %% %(users)s),
+       now() - (g * %(days)s::float / %(logs)s) * interval '1 day',
+       'seed log ' || g
+FROM generate_series(1, %(logs)s) g;
+
+INSERT INTO crashes (user_id, session_start, session_end, crash_time,
+                     event_id, provider, exception_code, faulting_module,
+                     message)
+SELECT 'seed-' || (g %% %(users)s), t - interval '1 hour', t, t, 1000,
+       'Application Error',
+       (ARRAY['0xc0000005', '0xc0000409', '0xe06d7363'])[1 + g %% 3],
+       (ARRAY['ngspice.dll', 'python3.dll', 'KiCad.exe',
+              'Qt5Core.dll'])[1 + g %% 4],
+       'seed crash ' || g
+FROM generate_series(1, %(crashes)s) g,
+     LATERAL (SELECT now() - (g * %(days)s::float / %(crashes)s)
+                             * interval '1 day' AS t) x;
+"""
+
+
+def seed(conn):
+    """
+    Fill empty sessions/logs/crashes with synthetic rows (scratch only).
+    The tables' triggers are off while seeding, so the rollups, groups and
+    queues derived from them stay empty.
+    """
+    with conn.cursor() as cur:
+        for table in HOT_TABLES:
+            cur.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+            if cur.fetchone()[0]:
+                raise RuntimeError(f"{table} is not empty; --seed only runs "
+                                   f"on a scratch database")
+        t0 = time.time()
+        with conn:
+            for table in HOT_TABLES:
+                cur.execute(f"ALTER TABLE {table} DISABLE TRIGGER USER")
+            cur.execute(SEED_SQL, {
+                "users": SEED_USERS, "days": SEED_DAYS,
+                "sessions": SEED_SESSIONS, "logs": SEED_LOGS,
+                "crashes": SEED_CRASHES,
+            })
+            for table in HOT_TABLES:
+                cur.execute(f"ALTER TABLE {table} ENABLE TRIGGER USER")
+        for table in HOT_TABLES:
+            cur.execute(f"VACUUM ANALYZE {table}")
+    print(f"[PLAN] Seeded {SEED_SESSIONS} sessions, {SEED_LOGS} logs, "
+          f"{SEED_CRASHES} crashes in {time.time() - t0:.1f}s", flush=True)
+
+
+def plan_params(cur) -> dict:
+    """A typical user, a recent crash id and the last 7 days of data."""
+    cur.execute("SELECT user_id, session_start FROM sessions "
+                "ORDER BY session_start DESC LIMIT 1")
+    user, latest = cur.fetchone() or ("", date.today())
+    cur.execute("SELECT COALESCE(MAX(crash_id), 0) FROM crashes")
+    since_id = max(cur.fetchone()[0] - 1000, 0)
+    cur.execute("SELECT %s::timestamp - interval '7 days'", (latest,))
+    since = cur.fetchone()[0]
+    return {"user": user, "since_id": since_id, "since": since,
+            "from": since, "to": latest}
+
+
+def seq_scans(plan, parents) -> list:
+    """
+    Relations read by a Seq Scan that should have used an index: a hot table
+    itself, or a partition when every partition of its parent is scanned
+    (no pruning). Scanning a few pruned partitions in full is fine.
+    """
+    scanned = []
+
+    def walk(node):
+        if node.get("Node Type") == "Seq Scan":
+            scanned.append(node["Relation Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan)
+    bad = [rel for rel in scanned if rel in HOT_TABLES]
+    for parent, partitions in parents.items():
+        hit = [rel for rel in scanned if rel in partitions]
+        if len(hit) == len(partitions):
+            bad.append(f"{parent} (all {len(partitions)} partitions)")
+    return bad
+
+
+def plancheck(do_seed=False) -> int:
+    """EXPLAIN every PLAN_QUERIES entry; returns the number of failures."""
+    conn = connect_db()
+    conn.autocommit = True
+    try:
+        if do_seed:
+            seed(conn)
+        failures = 0
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT p.relname, array_agg(c.relname) FROM pg_inherits i
+                JOIN pg_class p ON p.oid = i.inhparent
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE p.relname = ANY(%s) AND p.relkind = 'p'
+                GROUP BY p.relname
+            """, (list(HOT_TABLES),))
+            parents = {name: set(parts) for name, parts in cur.fetchall()}
+            params = plan_params(cur)
+
+            for label, sql in PLAN_QUERIES:
+                cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                plan = cur.fetchone()[0][0]["Plan"]
+                bad = seq_scans(plan, parents)
+                cost = plan.get("Total Cost", 0)
+                if bad:
+                    failures += 1
+                    print(f"[PLAN] FAIL {label}: Seq Scan on "
+                          f"{', '.join(bad)} (cost {cost:.0f})", flush=True)
+                else:
+                    print(f"[PLAN] ok   {label} (cost {cost:.0f})",
+                          flush=True)
+        print(f"[PLAN] {len(PLAN_QUERIES) - failures}/{len(PLAN_QUERIES)} "
+              f"queries use indexes", flush=True)
+        return failures
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status",
+                   help="list migrations and whether they are applied")
+    p_up = sub.add_parser("up", help="apply pending migrations")
+    p_up.add_argument("--partition", action="store_true",
+                      help="also partition sessions, logs and crashes")
+    p_maintain = sub.add_parser("maintain",
+                                help="create the coming months' partitions")
+    p_maintain.add_argument("--months", type=int,
+                            default=PARTITION_MONTHS_AHEAD)
+    p_check = sub.add_parser(
+        "plancheck", help="fail if a hot query plans a sequential scan")
+    p_check.add_argument("--seed", action="store_true",
+                         help="seed an empty database first")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        status()
+    elif args.command == "up":
+        n = up(include_optional=args.partition)
+        print(f"[MIGRATE] {n} migration(s) applied" if n
+              else "[MIGRATE] Up to date")
+    elif args.command == "maintain":
+        maintain(args.months)
+    elif args.command == "plancheck":
+        sys.exit(1 if plancheck(do_seed=args.seed) else 0)
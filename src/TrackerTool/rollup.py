@@ -0,0 +1,119 @@
+"""
+Pre-aggregated session statistics.
+
+session_rollup_daily  (user_id, day)  -> sessions, total_seconds
+session_rollup_user   (user_id)       -> sessions, total_seconds
+
+Both tables are kept up to date by a trigger on `sessions` (insert, upsert,
+delete), so /statstics, /metrics and /get_summary read a handful of rows
+instead of aggregating the whole sessions table. The tables and trigger are
+created by migrations.py (0006). rebuild() recomputes them from scratch and
+can be run periodically as a safety net:
+
+    python rollup.py rebuild
+"""
+import sys
+import threading
+import time
+from datetime import timedelta
+
+import migrations
+from db import get_conn
+
+
+ROLLUP_MIGRATION = 6
+
+REBUILD_SQL = """
+TRUNCATE session_rollup_daily, session_rollup_user;
+
+INSERT INTO session_rollup_daily (user_id, day, sessions, total_seconds)
+SELECT user_id, session_start::date, COUNT(*), COALESCE(SUM(EXTRACT(EPOCH FROM total_duration)), 0)
+FROM sessions
+GROUP BY 1, 2;
+
+INSERT INTO session_rollup_user (user_id, sessions, total_seconds)
+SELECT user_id, SUM(sessions), SUM(total_seconds)
+FROM session_rollup_daily
+GROUP BY 1;
+"""
+
+
+def ensure():
+    """Fail early, once per process, if the rollup migration has not run."""
+    migrations.require(ROLLUP_MIGRATION)
+
+
+def rebuild():
+    """Recompute both rollups from `sessions` (periodic refresher / repair)."""
+    ensure()
+    with get_conn() as conn, conn.cursor() as cur:
+        # SHARE lock: concurrent session writes wait instead of racing the trigger
+        cur.execute("LOCK TABLE sessions IN SHARE MODE")
+        cur.execute(REBUILD_SQL)
+
+
+def start_refresher(interval_seconds: float):
+    """Background thread that periodically rebuild()s the rollups (0 disables)."""
+    if interval_seconds <= 0:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                rebuild()
+                print("[ROLLUP] Periodic rebuild done", flush=True)
+            except Exception as e:
+                print("[ROLLUP] Periodic rebuild failed:", repr(e), flush=True)
+
+    t = threading.Thread(target=loop, name="rollup-refresher", daemon=True)
+    t.start()
+    return t
+
+
+def user_totals(user_id: str) -> dict:
+    """One primary-key lookup."""
+    ensure()
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT sessions, total_seconds FROM session_rollup_user WHERE user_id = %s",
+            (user_id,)
+        )
+        row = cur.fetchone()
+    sessions, secs = (int(row[0]), float(row[1])) if row else (0, 0.0)
+    return _totals(1 if sessions else 0, sessions, secs)
+
+
+def overall_totals() -> dict:
+    """One pass over the per-user rollup (one row per user, not per session)."""
+    ensure()
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT COUNT(*) FILTER (WHERE sessions > 0),
+                   COALESCE(SUM(sessions), 0),
+                   COALESCE(SUM(total_seconds), 0)
+            FROM session_rollup_user
+        """)
+        users, sessions, secs = cur.fetchone()
+    return _totals(int(users), int(sessions), float(secs))
+
+
+def _totals(users: int, sessions: int, secs: float) -> dict:
+    return {
+        "active_users": users,
+        "total_sessions": sessions,
+        "total_seconds": secs,
+        "total_duration": timedelta(seconds=secs),
+        "avg_seconds": secs / sessions if sessions else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        rebuild()
+        print("[ROLLUP] Rebuilt session rollups")
+    else:
+        print("Usage: python rollup.py rebuild")
@@ -0,0 +1,83 @@
+"""
+Bounded background task queue for side effects (crash digests, ...).
+
+A fixed set of worker threads drains one bounded queue, so a burst of work
+costs at most TASK_QUEUE_MAX queued calls and TASK_WORKERS threads instead
+of one thread per call. submit() never blocks the caller: when the queue is
+full the task is dropped and counted, so callers keep what they submit
+somewhere durable (crash_notify re-claims its rows after a lease).
+
+Safe to call from request handlers, background threads and async code
+(asgi.py) alike; it only does a put_nowait.
+"""
+import os
+import queue
+import threading
+import traceback
+
+
+# ----------------------------
+# Config
+# ----------------------------
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", "2"))
+TASK_QUEUE_MAX = int(os.getenv("TASK_QUEUE_MAX", "1000"))
+
+
+_queue = queue.Queue(maxsize=TASK_QUEUE_MAX)
+_workers = []
+_workers_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {"submitted": 0, "done": 0, "failed": 0, "dropped": 0}
+
+
+def _bump(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _work():
+    while True:
+        fn, args, kwargs = _queue.get()
+        try:
+            fn(*args, **kwargs)
+            _bump("done")
+        except Exception:
+            _bump("failed")
+            traceback.print_exc()
+        finally:
+            _queue.task_done()
+
+
+def _start_workers():
+    with _workers_lock:
+        _workers[:] = [t for t in _workers if t.is_alive()]
+        for i in range(len(_workers), TASK_WORKERS):
+            t = threading.Thread(target=_work, name=f"task-worker-{i}", daemon=True)
+            t.start()
+            _workers.append(t)
+
+
+def submit(fn, *args, **kwargs) -> bool:
+    """Queue fn(*args, **kwargs); False (and the task is dropped) if the queue is full."""
+    if len(_workers) < TASK_WORKERS:
+        _start_workers()
+    try:
+        _queue.put_nowait((fn, args, kwargs))
+    except queue.Full:
+        _bump("dropped")
+        print(f"[TASKS] Queue full ({TASK_QUEUE_MAX}), dropped {getattr(fn, '__name__', fn)}", flush=True)
+        return False
+    _bump("submitted")
+    return True
+
+
+def stats() -> dict:
+    with _stats_lock:
+        out = dict(_stats)
+    out.update({
+        "queued": _queue.qsize(),
+        "max_queued": TASK_QUEUE_MAX,
+        "workers": sum(1 for t in _workers if t.is_alive()),
+    })
+    return out
@@ -410,17 +410,6 @@ def append_tracker_log(user_id: str, msg: str):
         f.write(line + "\n")
     print(line)
 
-def debug_esim_processes():
-    hits = []
-    for p in psutil.process_iter(["pid","name"]):
-        try:
-            name = (p.info.get("name") or "")
-            if "esim" in name.lower():
-                hits.append((p.info["pid"], name))
-        except Exception:
-            pass
-    return hits
-
 # =========================
 # HTTP helper
 # =========================
@@ -460,38 +449,115 @@ def post_with_retry(url, payload, timeout=30, retries=3, backoff=2):
 # =========================
 # Process Monitoring
 # =========================
-def snapshot_processes():
+
+PROCESS_WATCH_INTERVAL = 0.5        # seconds between polls
+PROCESS_WATCH_CPU_BUDGET = 0.02     # max share of one core spent polling (2%)
+PROCESS_WATCH_STATS_SECONDS = 300   # how often to print watcher cost
+
+class ProcessWatcher:
     """
-    Returns dict {pid: (name_lower, create_time, cmdline_str)}.
-    cmdline may be empty if AccessDenied.
+    Watches for new processes and whether eSim is running.
+
+    Each poll only lists PIDs (psutil.pids(): a /proc listing on Linux,
+    EnumProcesses on Windows) and diffs them against the previous poll.
+    Name / cmdline are read once, for new PIDs only, and the eSim state is
+    kept as the set of live eSim PIDs instead of rescanning every process.
     """
-    procs = {}
-    for p in psutil.process_iter(["pid", "name", "create_time", "cmdline"]):
+
+    def __init__(self, cpu_budget=PROCESS_WATCH_CPU_BUDGET):
+        self.procs = {}          # pid -> (name_lower, create_time, cmdline)
+        self.esim_pids = set()
+        self.cpu_budget = cpu_budget
+
+        self.polls = 0
+        self.cpu_total = 0.0
+        self.cpu_max = 0.0
+        self.last_cost = 0.0
+        self.last_stats_at = time.time()
+
+    @property
+    def esim_running(self) -> bool:
+        return bool(self.esim_pids)
+
+    def _inspect(self, pid):
         try:
-            pid = p.info["pid"]
-            name = (p.info.get("name") or "").lower()
-            ctime = float(p.info.get("create_time") or 0.0)
-
-            cmdline = ""
-            cl = p.info.get("cmdline")
-            if isinstance(cl, list):
-                cmdline = " ".join(cl)
-            elif isinstance(cl, str):
-                cmdline = cl
-
-            procs[pid] = (name, ctime, cmdline)
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            continue
-        except Exception:
-            continue
-    return procs
+            p = psutil.Process(pid)
+            with p.oneshot():
+                name = (p.name() or "").lower()
+                ctime = float(p.create_time() or 0.0)
+                try:
+                    cl = p.cmdline()
+                except psutil.AccessDenied:
+                    cl = []
+            return (name, ctime, " ".join(cl) if isinstance(cl, list) else (cl or ""))
+        except psutil.NoSuchProcess:
+            return None
+        except psutil.Error:
+            # remember it anyway so we don't retry a protected process every poll
+            return ("", 0.0, "")
 
-def detect_new_processes(prev_snapshot: dict, cur_snapshot: dict):
-    events = []
-    for pid, (name, ctime, cmdline) in cur_snapshot.items():
-        if pid not in prev_snapshot:
-            events.append((pid, name, cmdline))
-    return events
+    def _same_process(self, pid) -> bool:
+        """Is `pid` still the process we inspected (not a reused PID)?"""
+        try:
+            return float(psutil.Process(pid).create_time() or 0.0) == self.procs[pid][1]
+        except psutil.Error:
+            return False
+
+    def poll(self) -> list:
+        """Returns [(pid, name_lower, cmdline)] for processes started since the last poll."""
+        t0 = time.process_time()
+
+        pids = set(psutil.pids())
+        for pid in self.procs.keys() - pids:
+            del self.procs[pid]
+            self.esim_pids.discard(pid)
+
+        # a listed PID may have been reused by a new process (Windows does this
+        # quickly); the eSim PIDs decide the session, so check their identity
+        for pid in [p for p in self.esim_pids if not self._same_process(p)]:
+            del self.procs[pid]
+            self.esim_pids.discard(pid)
+
+        new = []
+        for pid in pids - self.procs.keys():
+            info = self._inspect(pid)
+            if info is None:
+                continue
+            self.procs[pid] = info
+            name, _, cmdline = info
+            if is_esim_process(name, cmdline):
+                self.esim_pids.add(pid)
+            new.append((pid, name, cmdline))
+
+        cost = time.process_time() - t0
+        self.polls += 1
+        self.cpu_total += cost
+        self.cpu_max = max(self.cpu_max, cost)
+        self.last_cost = cost
+        return new
+
+    def next_interval(self, base=PROCESS_WATCH_INTERVAL) -> float:
+        """Stretch the poll interval if the last poll would exceed the CPU budget."""
+        if self.cpu_budget <= 0:
+            return base
+        return max(base, self.last_cost / self.cpu_budget)
+
+    def stats(self) -> dict:
+        avg = self.cpu_total / self.polls if self.polls else 0.0
+        return {
+            "polls": self.polls,
+            "tracked_pids": len(self.procs),
+            "esim_pids": sorted(self.esim_pids),
+            "cpu_ms_avg": round(avg * 1000, 3),
+            "cpu_ms_max": round(self.cpu_max * 1000, 3),
+            "cpu_share": round(avg / self.next_interval(), 4),
+            "cpu_budget": self.cpu_budget,
+        }
+
+    def maybe_print_stats(self):
+        if time.time() - self.last_stats_at >= PROCESS_WATCH_STATS_SECONDS:
+            self.last_stats_at = time.time()
+            print("[PROCWATCH]", self.stats())
 
 def classify_process(proc_name: str, cmdline: str) -> str | None:
     s = (proc_name + " " + (cmdline or "")).lower()
@@ -598,6 +664,7 @@ def build_env_snapshot(user_id: str, session_id: str) -> dict:
 def send_env_snapshot_to_api(snapshot: dict):
     """
     Sends snapshot to server. Requires API endpoint /add-env-snapshot.
+    (Blocking; the tracker loop uses enqueue_env_snapshot instead.)
     """
     url = f"{API_BASE_URL}/add-env-snapshot"
     try:
@@ -612,23 +679,32 @@ def send_env_snapshot_to_api(snapshot: dict):
         return None
 
 
-def is_esim_running():
-    for p in psutil.process_iter(["name", "cmdline"]):
+def enqueue_env_snapshot(user_id: str, session_id: str):
+    """
+    Build the snapshot (runs several version commands) off the polling loop
+    and hand it to the outbox.
+    """
+    def work():
         try:
-            name = (p.info.get("name") or "").lower()
-            cmdline = " ".join(p.info.get("cmdline") or []).lower()
+            enqueue_event("env_snapshot", build_env_snapshot(user_id=user_id, session_id=session_id))
+        except Exception as e:
+            print("Env snapshot Error:", repr(e))
+    threading.Thread(target=work, name="env-snapshot", daemon=True).start()
 
-            if "esim" in name:
-                return True
 
-            if "python" in name and (
-                "application.py" in cmdline or
-                "frontend.application" in cmdline
-            ):
-                return True
+def is_esim_process(name: str, cmdline: str) -> bool:
+    name = (name or "").lower()
+    cmdline = (cmdline or "").lower()
+
+    if "esim" in name:
+        return True
+
+    if "python" in name and (
+        "application.py" in cmdline or
+        "frontend.application" in cmdline
+    ):
+        return True
 
-        except Exception:
-            pass
     return False
 
 
@@ -761,73 +837,26 @@ def get_session_location():
 # =========================
 # API calls
 # =========================
-def send_log_to_api(user_id, log_timestamp, log_content):
-    url = f"{API_BASE_URL}/add-log"
-    payload = {
+def build_log_payload(user_id, log_timestamp, log_content, session_id=None):
+    return {
         "user_id": user_id,
         "session_id": session_id,
         "log_timestamp": log_timestamp.strftime("%Y-%m-%d %H:%M:%S"),
         "log_content": log_content
     }
-    try:
-        res = post_with_retry(url, payload, timeout=30, retries=3, backoff=2)
-        try:
-            print("Log API Response:", res.status_code, res.json())
-        except Exception:
-            print("Log API Response:", res.status_code, res.text[:300])
-    except Exception as e:
-        print("Log API Error: all retries failed:", e)
-
-def store_log(user_id, session_id):
-    path = tracker_log_path(user_id)
-    if not os.path.isfile(path):
-        print(f"No tracker log file found for user {user_id}.")
-        return
-
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        log_content = f.read()
-
-    if not log_content.strip():
-        print(f"Tracker log is empty for user {user_id}.")
-        return
-
-    send_log_to_api(user_id, datetime.now(), log_content)
 
-def send_session_to_api(user_id, session_start, session_end, total_duration_hours, location=None, session_id=None):
-    url = f"{API_BASE_URL}/add-session"
-    payload = {
+def build_session_payload(user_id, session_start, session_end, location=None, session_id=None):
+    return {
         "user_id": user_id,
         "session_id": session_id,  # NEW
         "session_start": session_start.strftime("%Y-%m-%d %H:%M:%S"),
         "session_end": session_end.strftime("%Y-%m-%d %H:%M:%S"),
-        "total_duration": total_duration_hours,
+        "total_duration": (session_end - session_start).total_seconds() / 3600,
         "location": location
     }
-    try:
-        res = post_with_retry(url, payload, timeout=30, retries=3, backoff=2)
-        try:
-            print("Session API Response:", res.status_code, res.json())
-        except Exception:
-            print("Session API Response:", res.status_code, res.text[:300])
-    except Exception as e:
-        print("Session API Error:", repr(e))
-
-def log_session(user_id, session_start, session_end, location=None, session_id=None):
-    total_duration_hours = (session_end - session_start).total_seconds() / 3600
-
-    # IMPORTANT: pass session_id forward
-    send_session_to_api(
-        user_id=user_id,
-        session_start=session_start,
-        session_end=session_end,
-        total_duration_hours=total_duration_hours,
-        location=location,
-        session_id=session_id
-    )
 
-def send_crash_to_api(user_id, session_start, session_end, crash_info, location=None,session_id=None):
-    url = f"{API_BASE_URL}/add-crash"
-    payload = {
+def build_crash_payload(user_id, session_start, session_end, crash_info, location=None, session_id=None):
+    return {
         "user_id": user_id,
         "session_id": session_id,
         "session_start": session_start.strftime("%Y-%m-%d %H:%M:%S"),
@@ -840,11 +869,457 @@ def send_crash_to_api(user_id, session_start, session_end, crash_info, location=
         "message": crash_info.get("message", ""),
         "location": location
     }
-    try:
-        res = post_with_retry(url, payload, timeout=30, retries=3, backoff=2)
-        print("Crash API Response:", res.status_code, getattr(res, "text", "")[:200])
-    except Exception as e:
-        print("Crash API Error:", e)
+
+# event type -> legacy single-item endpoint (used if the server has no /ingest/batch yet)
+LEGACY_ENDPOINTS = {
+    "session": "/add-session",
+    "log": "/add-log",
+    "crash": "/add-crash",
+    "env_snapshot": "/add-env-snapshot",
+}
+
+def make_event(event_type: str, data: dict) -> dict:
+    return {"id": str(uuid.uuid4()), "type": event_type, "data": data}
+
+def post_batch(events: list, timeout=30) -> dict:
+    """
+    One POST of events to /ingest/batch (no sleeping/retrying here; the outbox
+    sender owns backoff). Returns {event_id: error or None}.
+    Raises requests.RequestException / RuntimeError if the whole request failed.
+    """
+    url = f"{API_BASE_URL}/ingest/batch"
+    res = requests.post(url, json=events, timeout=timeout)
+
+    if res.status_code == 404:
+        # Older server: fall back to one POST per event
+        print("[BATCH] /ingest/batch not available, using single-item endpoints")
+        return post_events_individually(events, timeout=timeout)
+
+    if res.status_code not in (200, 207):
+        raise RuntimeError(f"HTTP {res.status_code}: {getattr(res, 'text', '')[:200]}")
+
+    # only an explicit "ok" acks an event; one missing from a partial or
+    # foreign response stays in the outbox
+    status = {ev["id"]: "no result from server" for ev in events}
+    for r in res.json().get("results", []):
+        if r.get("id") in status:
+            status[r["id"]] = None if r.get("status") == "ok" else (r.get("error") or "failed")
+
+    failed = sum(1 for e in status.values() if e)
+    print(f"Batch API Response: {res.status_code} ok={len(events) - failed} failed={failed}")
+    return status
+
+def post_events_individually(events: list, timeout=30) -> dict:
+    status = {}
+    for ev in events:
+        url = f"{API_BASE_URL}{LEGACY_ENDPOINTS[ev['type']]}"
+        try:
+            res = requests.post(url, json=ev["data"], timeout=timeout)
+            print(f"{ev['type']} API Response:", res.status_code, getattr(res, "text", "")[:200])
+            status[ev["id"]] = f"HTTP {res.status_code}" if res.status_code >= 400 else None
+        except requests.exceptions.RequestException as e:
+            print(f"{ev['type']} API Error:", repr(e))
+            status[ev["id"]] = repr(e)
+    return status
+
+
+# =========================
+# Outbox (durable, drained in the background)
+# =========================
+import sqlite3
+import threading
+
+OUTBOX_PATH = get_writable_data_dir() / "outbox.sqlite3"
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_POLL_SECONDS = 5          # also re-checks for items whose backoff expired
+OUTBOX_MAX_BACKOFF_SECONDS = 300
+OUTBOX_MAX_ATTEMPTS = 20         # after this an item is parked (kept, not deleted)
+
+class Outbox:
+    """
+    SQLite-backed queue of API events. put() is a local insert, so callers in
+    the polling loop never wait on the network; events survive restarts until
+    the server acknowledges them.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.db = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_id TEXT UNIQUE NOT NULL,
+                type TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                parked INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (parked, next_attempt_at, seq)")
+        self.db.commit()
+
+    def put(self, event: dict):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR IGNORE INTO outbox (event_id, type, payload, created_at) VALUES (?, ?, ?, ?)",
+                (event["id"], event["type"], json.dumps(event["data"], default=str), time.time())
+            )
+            self.db.commit()
+        self.wake.set()
+
+    def due(self, limit: int) -> list:
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT event_id, type, payload, attempts FROM outbox "
+                "WHERE parked = 0 AND next_attempt_at <= ? ORDER BY seq LIMIT ?",
+                (time.time(), limit)
+            ).fetchall()
+        return [{"id": r[0], "type": r[1], "data": json.loads(r[2]), "attempts": r[3]} for r in rows]
+
+    def ack(self, event_ids: list):
+        if not event_ids:
+            return
+        with self.lock:
+            self.db.executemany("DELETE FROM outbox WHERE event_id = ?", [(i,) for i in event_ids])
+            self.db.commit()
+
+    def retry_later(self, failures: dict):
+        """failures: {event_id: error}. Per-item exponential backoff, parked after OUTBOX_MAX_ATTEMPTS."""
+        if not failures:
+            return
+        now = time.time()
+        with self.lock:
+            for event_id, err in failures.items():
+                row = self.db.execute("SELECT attempts FROM outbox WHERE event_id = ?", (event_id,)).fetchone()
+                if not row:
+                    continue
+                attempts = row[0] + 1
+                delay = min(OUTBOX_MAX_BACKOFF_SECONDS, 2 ** attempts)
+                self.db.execute(
+                    "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ?, parked = ? WHERE event_id = ?",
+                    (attempts, now + delay, str(err)[:500], int(attempts >= OUTBOX_MAX_ATTEMPTS), event_id)
+                )
+            self.db.commit()
+
+    def pending_count(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM outbox WHERE parked = 0").fetchone()[0]
+
+
+class OutboxSender(threading.Thread):
+    """Background thread that drains the outbox in batches with backoff."""
+
+    def __init__(self, outbox: Outbox, batch_size=OUTBOX_BATCH_SIZE):
+        super().__init__(name="outbox-sender", daemon=True)
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.stopping = threading.Event()
+        self.offline_failures = 0   # consecutive whole-request failures (server down / no network)
+
+    def run(self):
+        while not self.stopping.is_set():
+            sent = self.flush_once()
+            if sent:
+                continue  # more may be waiting; keep draining
+
+            if self.offline_failures:
+                wait = min(OUTBOX_MAX_BACKOFF_SECONDS, 2 ** self.offline_failures)
+            else:
+                wait = OUTBOX_POLL_SECONDS
+            self.outbox.wake.wait(wait)
+            self.outbox.wake.clear()
+
+    def flush_once(self, timeout=30) -> int:
+        events = self.outbox.due(self.batch_size)
+        if not events:
+            return 0
+
+        try:
+            status = post_batch([{k: ev[k] for k in ("id", "type", "data")} for ev in events], timeout=timeout)
+        except Exception as e:
+            self.offline_failures += 1
+            print(f"[OUTBOX] Send failed ({len(events)} queued events kept): {e}")
+            return 0
+
+        self.offline_failures = 0
+        self.outbox.ack([i for i, err in status.items() if not err])
+        self.outbox.retry_later({i: err for i, err in status.items() if err})
+        return len(events)
+
+    def stop(self, flush_timeout=10):
+        """Stop the thread; try one last short flush so a clean exit sends what it can."""
+        self.stopping.set()
+        self.outbox.wake.set()
+        self.join(timeout=flush_timeout)
+        if self.is_alive():
+            return  # still sending; a second flush would send the same rows twice
+        try:
+            self.flush_once(timeout=flush_timeout)
+        except Exception:
+            pass
+
+
+OUTBOX = None
+OUTBOX_SENDER = None
+
+def start_outbox():
+    global OUTBOX, OUTBOX_SENDER
+    if OUTBOX_SENDER is None:
+        OUTBOX = Outbox(OUTBOX_PATH)
+        OUTBOX_SENDER = OutboxSender(OUTBOX)
+        OUTBOX_SENDER.start()
+        print(f"[OUTBOX] {OUTBOX.pending_count()} pending event(s) in {OUTBOX_PATH}")
+    return OUTBOX
+
+def enqueue_event(event_type: str, data: dict):
+    start_outbox().put(make_event(event_type, data))
+
+# =========================
+# Log upload (incremental, gzip chunks)
+# =========================
+import gzip
+import shutil
+
+LOG_UPLOAD_INTERVAL_SECONDS = 60        # ship new log bytes this often during a session
+LOG_UPLOAD_CHUNK_BYTES = 256 * 1024     # raw bytes per chunk (server caps at 4 MB)
+
+class LogUploads:
+    """
+    Per-session log uploads, kept in the outbox database. `acked` is how many
+    bytes of the log file the server has confirmed, so an upload interrupted
+    by a restart or an outage continues from there instead of starting over.
+    A session's log is moved to its own file when the session ends.
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.db = sqlite3.connect(str(path), check_same_thread=False, timeout=10)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS log_uploads (
+                upload_key TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                log_timestamp TEXT NOT NULL,
+                path TEXT NOT NULL,
+                acked INTEGER NOT NULL DEFAULT 0,
+                final INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0
+            )
+        """)
+        self.db.commit()
+
+    def begin(self, user_id, session_id, session_start):
+        """Start the live log for a new session (finishing any upload a crash left on it)."""
+        live = tracker_log_path(user_id)
+        with self.lock:
+            stale = self.db.execute(
+                "SELECT upload_key FROM log_uploads WHERE path = ? AND final = 0", (live,)
+            ).fetchall()
+        for (key,) in stale:
+            self.finish(user_id, key)
+
+        open(live, "w", encoding="utf-8").close()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO log_uploads (upload_key, user_id, log_timestamp, path) VALUES (?, ?, ?, ?)",
+                (session_id, user_id, session_start.strftime("%Y-%m-%d %H:%M:%S"), live)
+            )
+            self.db.commit()
+
+    def finish(self, user_id, session_id):
+        """Move the session's log to its own file and mark its upload final."""
+        live = tracker_log_path(user_id)
+        done = os.path.splitext(live)[0] + f"_{session_id}.log"
+        with self.lock:
+            try:
+                os.replace(live, done)
+            except FileNotFoundError:
+                open(done, "w", encoding="utf-8").close()
+            except OSError:
+                shutil.copyfile(live, done)   # live file still open elsewhere (Windows)
+            self.db.execute(
+                "UPDATE log_uploads SET path = ?, final = 1, next_attempt_at = 0 WHERE upload_key = ?",
+                (done, session_id)
+            )
+            self.db.commit()
+        self.wake.set()
+
+    def due(self, final_only=False) -> list:
+        sql = "SELECT upload_key, user_id, log_timestamp, path, acked, final, attempts FROM log_uploads WHERE next_attempt_at <= ?"
+        if final_only:
+            sql += " AND final = 1"
+        with self.lock:
+            rows = self.db.execute(sql, (time.time(),)).fetchall()
+        keys = ("upload_key", "user_id", "log_timestamp", "path", "acked", "final", "attempts")
+        return [dict(zip(keys, r)) for r in rows]
+
+    def read(self, upload_key, offset, limit) -> Optional[tuple]:
+        """
+        (data, path, final) of the upload as it is now: up to `limit` bytes
+        of its current file from `offset`, data None if that file is gone.
+        None if the upload itself is gone.
+        """
+        with self.lock:   # finish() moves the file and updates its row together
+            row = self.db.execute(
+                "SELECT path, final FROM log_uploads WHERE upload_key = ?", (upload_key,)
+            ).fetchone()
+            if row is None:
+                return None
+            path, final = row
+            try:
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    data = f.read(limit)
+            except FileNotFoundError:
+                data = None
+        return data, path, bool(final)
+
+    def set_acked(self, upload_key, acked):
+        with self.lock:
+            self.db.execute(
+                "UPDATE log_uploads SET acked = ?, attempts = 0 WHERE upload_key = ?", (acked, upload_key)
+            )
+            self.db.commit()
+
+    def retry_later(self, upload_key, attempts, err):
+        delay = min(OUTBOX_MAX_BACKOFF_SECONDS, 2 ** (attempts + 1))
+        print(f"[LOG-UPLOAD] {upload_key}: {err}; retrying in {delay}s")
+        with self.lock:
+            self.db.execute(
+                "UPDATE log_uploads SET attempts = ?, next_attempt_at = ? WHERE upload_key = ?",
+                (attempts + 1, time.time() + delay, upload_key)
+            )
+            self.db.commit()
+
+    def done(self, upload):
+        with self.lock:
+            self.db.execute("DELETE FROM log_uploads WHERE upload_key = ?", (upload["upload_key"],))
+            self.db.commit()
+            if upload["final"]:
+                try:
+                    os.remove(upload["path"])
+                except OSError:
+                    pass
+
+
+class LogUploader(threading.Thread):
+    """
+    Background thread that PUTs new log bytes to /logs/upload/<session_id>
+    as gzip chunks tagged with their byte offset. A failed or repeated chunk
+    only costs a resend from the last acknowledged offset; a 409 tells us the
+    server's size and we continue from there.
+    """
+
+    def __init__(self, uploads: LogUploads, interval=LOG_UPLOAD_INTERVAL_SECONDS):
+        super().__init__(name="log-uploader", daemon=True)
+        self.uploads = uploads
+        self.interval = interval
+        self.stopping = threading.Event()
+
+    def run(self):
+        while not self.stopping.is_set():
+            self.flush_once()
+            self.uploads.wake.wait(self.interval)
+            self.uploads.wake.clear()
+
+    def flush_once(self, final_only=False, timeout=30):
+        for upload in self.uploads.due(final_only=final_only):
+            try:
+                self.ship(upload, timeout=timeout)
+            except Exception as e:
+                self.uploads.retry_later(upload["upload_key"], upload["attempts"], e)
+
+    def ship(self, upload, timeout=30):
+        url = f"{API_BASE_URL}/logs/upload/{upload['upload_key']}"
+        acked = upload["acked"]
+        while True:
+            # re-read the row each time: the session may end (and its log
+            # move) while we upload
+            got = self.uploads.read(upload["upload_key"], acked, LOG_UPLOAD_CHUNK_BYTES)
+            if got is None:
+                return
+            data, upload["path"], upload["final"] = got
+            if data is None:
+                print(f"[LOG-UPLOAD] {upload['path']} is gone, dropping upload")
+                self.uploads.done(upload)
+                return
+            last = bool(upload["final"]) and len(data) < LOG_UPLOAD_CHUNK_BYTES
+            if not data and not last:
+                return  # nothing new yet
+
+            params = {
+                "offset": acked,
+                "user_id": upload["user_id"],
+                "log_timestamp": upload["log_timestamp"],
+            }
+            if last:
+                params["final"] = 1
+            res = requests.put(
+                url, params=params, data=gzip.compress(data),
+                headers={"Content-Type": "application/gzip"}, timeout=timeout,
+            )
+
+            if res.status_code == 404:
+                # Older server without chunked upload: send the whole log once it is final
+                if upload["final"]:
+                    self.send_whole(upload)
+                return
+            if res.status_code == 409:
+                acked = int(res.json()["size"])
+                print(f"[LOG-UPLOAD] {upload['upload_key']}: server has {acked} bytes, resuming there")
+                self.uploads.set_acked(upload["upload_key"], acked)
+                continue
+            if res.status_code >= 400:
+                raise RuntimeError(f"HTTP {res.status_code}: {getattr(res, 'text', '')[:200]}")
+
+            acked = int(res.json()["size"])
+            self.uploads.set_acked(upload["upload_key"], acked)
+            if last:
+                print(f"[LOG-UPLOAD] {upload['upload_key']}: uploaded {acked} bytes")
+                self.uploads.done(upload)
+                return
+
+    def send_whole(self, upload):
+        with open(upload["path"], "r", encoding="utf-8", errors="ignore") as f:
+            log_content = f.read()
+        if log_content.strip():
+            enqueue_event("log", build_log_payload(
+                upload["user_id"], datetime.strptime(upload["log_timestamp"], "%Y-%m-%d %H:%M:%S"),
+                log_content, session_id=upload["upload_key"]
+            ))
+        self.uploads.done(upload)
+
+    def stop(self, flush_timeout=10):
+        """Stop the thread; try to finish final uploads so a clean exit sends what it can."""
+        self.stopping.set()
+        self.uploads.wake.set()
+        self.join(timeout=flush_timeout)
+        if self.is_alive():
+            return  # still uploading; a second flush would race it on the same chunks
+        try:
+            self.flush_once(final_only=True, timeout=flush_timeout)
+        except Exception:
+            pass
+
+
+LOG_UPLOADS = None
+LOG_UPLOADER = None
+
+def start_log_uploader():
+    global LOG_UPLOADS, LOG_UPLOADER
+    if LOG_UPLOADER is None:
+        LOG_UPLOADS = LogUploads(OUTBOX_PATH)
+        LOG_UPLOADER = LogUploader(LOG_UPLOADS)
+        LOG_UPLOADER.start()
+    return LOG_UPLOADS
 
 
 # =========================
@@ -984,6 +1459,20 @@ if platform.system().lower() == "windows":
     test_loc = get_windows_location()
     print("Windows location test:", test_loc)
 
+def enqueue_crash_if_any(user_id, session_start, session_end, location=None, session_id=None):
+    time.sleep(2)  # allow OS to write crash logs
+    crash_info = detect_crash_cross_platform(process_hint="esim", lookback_seconds=600)
+    print("crash_info:", crash_info)
+    if crash_info:
+        enqueue_event("crash", build_crash_payload(
+            user_id=user_id,
+            session_start=session_start,
+            session_end=session_end,
+            crash_info=crash_info,
+            location=location,
+            session_id=session_id
+        ))
+
 # =========================
 # Main loop
 # =========================
@@ -994,16 +1483,23 @@ def track_activity(user_id):
     session_start = None
     session_location = None
 
-    prev_snapshot = snapshot_processes()
+    watcher = ProcessWatcher()
+    watcher.poll()  # baseline: processes already running are not "new"
     prev_proj_map = load_project_explorer(PROJECT_EXPLORER_PATH)
 
     print(f"Tracking started for user: {user_id}")
     print(f"API_BASE_URL: {API_BASE_URL}")
     print(f"OS: {platform.system()}")
 
+    # Drains events left over from previous runs, then everything we queue below
+    start_outbox()
+    # Same for log uploads; the live log is shipped every LOG_UPLOAD_INTERVAL_SECONDS
+    start_log_uploader()
+
     try:
         while True:
-            running = is_esim_running()
+            new_procs = watcher.poll()
+            running = watcher.esim_running
 
             # Session start
             if running and session_start is None:
@@ -1012,7 +1508,7 @@ def track_activity(user_id):
                 # NEW: stable session id
                 session_id = str(uuid.uuid4())
 
-                open(tracker_log_path(user_id), "w", encoding="utf-8").close()
+                LOG_UPLOADS.begin(user_id, session_id, session_start)
                 session_location = get_session_location()
                 SEEN_TOOL_CMDLINES.clear()
                 SEEN_TOOL_EVENTS.clear()
@@ -1021,19 +1517,17 @@ def track_activity(user_id):
                 append_tracker_log(user_id, f"[INFO]: Session_ID : {session_id}")
                 append_tracker_log(user_id, f"[INFO]: Workspace : {os.path.join(os.path.expanduser('~'), 'eSim-Workspace')}")
 
-                # NEW: environment snapshot
-                snap = build_env_snapshot(user_id=user_id, session_id=session_id)
-                send_env_snapshot_to_api(snap)
+                # NEW: environment snapshot (built + sent in the background)
+                enqueue_env_snapshot(user_id=user_id, session_id=session_id)
 
-                prev_snapshot = snapshot_processes()
+                new_procs = []  # eSim itself and its start-up processes aren't tool events
 
             # Detect new processes (minimize-safe)
-            cur_snapshot = snapshot_processes()
             if running:
                 if should_log_event("esim_proc_list"):
-                    print("eSim processes:", debug_esim_processes())
+                    print("eSim processes:", [(pid, watcher.procs[pid][0]) for pid in sorted(watcher.esim_pids)])
 
-                for pid, name, cmdline in detect_new_processes(prev_snapshot, cur_snapshot):
+                for pid, name, cmdline in new_procs:
                     print("[NEWPROC]", pid, name, cmdline[:200])
                     action = classify_process(name, cmdline)
                     if action:
@@ -1059,39 +1553,40 @@ def track_activity(user_id):
                     append_tracker_log(user_id, f"[INFO]: Current project is : {proj_path}")
                 prev_proj_map = cur_proj_map
 
-            prev_snapshot = cur_snapshot
-
             # Session end
             if (not running) and session_start is not None:
                 session_end = datetime.now()
                 append_tracker_log(user_id, "eSim Stopped.")
-                log_session(user_id, session_start, session_end, location=session_location, session_id=session_id)
-                store_log(user_id, session_id)
-
-                time.sleep(2)  # allow OS to write crash logs
-                crash_info = detect_crash_cross_platform(process_hint="esim", lookback_seconds=600)
-                print("crash_info:", crash_info)
-                if crash_info:
-                    send_crash_to_api(
-                        user_id=user_id,
-                        session_start=session_start,
-                        session_end=session_end,
-                        crash_info=crash_info,
-                        location=session_location,
-                        session_id=session_id
-                    )
+
+                # Queued locally; the outbox sender ships them in one /ingest/batch round trip
+                enqueue_event("session", build_session_payload(
+                    user_id, session_start, session_end, location=session_location, session_id=session_id
+                ))
+                # The log has been uploading during the session; send the rest
+                LOG_UPLOADS.finish(user_id, session_id)
+
+                # Crash lookup waits for the OS to write its logs; keep it off the polling loop
+                threading.Thread(
+                    target=enqueue_crash_if_any,
+                    args=(user_id, session_start, session_end, session_location, session_id),
+                    name="crash-detect",
+                ).start()
 
                 SEEN_TOOL_CMDLINES.clear()
                 SEEN_TOOL_EVENTS.clear()
                 # reset
                 session_start = None
                 session_location = None
-                prev_snapshot = snapshot_processes()
 
-            time.sleep(0.5)
+            watcher.maybe_print_stats()
+            time.sleep(watcher.next_interval())
 
     except KeyboardInterrupt:
         print("Tracking stopped.")
+        if LOG_UPLOADER is not None:
+            LOG_UPLOADER.stop()
+        if OUTBOX_SENDER is not None:
+            OUTBOX_SENDER.stop()
 
 
 if __name__ == "__main__":
@@ -80,6 +80,36 @@ class Appconfig(QtWidgets.QWidget):
         print("Cannot access Modelica map file --- .esim folder")
         print(str(e))
 
+    # The plotter reads the binary .raw file; the "print allv/alli" text
+    # dumps are only written when PRINT_PLOT_DATA = true in config.ini
+    try:
+        print_plot_data = parser_esim.getboolean(
+            'eSim', 'PRINT_PLOT_DATA', fallback=False)
+    except ValueError:
+        print_plot_data = False
+
+    # Live waveform view next to the ngspice console (LIVE_PLOT) and how
+    # many of the most recent points it keeps (LIVE_PLOT_POINTS)
+    try:
+        live_plot = parser_esim.getboolean(
+            'eSim', 'LIVE_PLOT', fallback=True)
+        live_plot_points = parser_esim.getint(
+            'eSim', 'LIVE_PLOT_POINTS', fallback=200000)
+    except ValueError:
+        live_plot = True
+        live_plot_points = 200000
+
+    # Results of unchanged netlists are reused from <project>/.simcache
+    # (SIM_CACHE), which is kept under SIM_CACHE_MB megabytes
+    try:
+        sim_cache = parser_esim.getboolean(
+            'eSim', 'SIM_CACHE', fallback=True)
+        sim_cache_mb = parser_esim.getint(
+            'eSim', 'SIM_CACHE_MB', fallback=512)
+    except ValueError:
+        sim_cache = True
+        sim_cache_mb = 512
+
     try:
         project_explorer = json.load(open(dictPath["path"]))
     except BaseException:
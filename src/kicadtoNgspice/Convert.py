@@ -1,3 +1,4 @@
+import filecmp
 import os
 import shutil
 from xml.etree import ElementTree as ET
@@ -5,6 +6,38 @@ from xml.etree import ElementTree as ET
 from PyQt5 import QtWidgets
 
 from . import TrackWidget
+from .NetlistEdit import NetlistEdit
+
+
+# library .xml path -> (mtime, ref_model), see Convert.getReferenceName
+_referenceNames = {}
+
+
+def copyIfChanged(src, dstDir):
+    """
+    - Copies `src` into `dstDir` unless an identical copy is already there
+    - copy2 keeps the mtime, so an unchanged library is recognised by size
+      and mtime alone; a copy with another mtime is compared by content
+      once and then given the library's mtime
+    - Returns True if the file was copied
+    """
+    dst = os.path.join(dstDir, os.path.basename(src))
+    try:
+        srcStat = os.stat(src)
+        dstStat = os.stat(dst)
+    except FileNotFoundError:
+        shutil.copy2(src, dst)
+        return True
+    if os.path.samestat(srcStat, dstStat):
+        return False
+    if srcStat.st_size == dstStat.st_size:
+        if srcStat.st_mtime_ns == dstStat.st_mtime_ns:
+            return False
+        if filecmp.cmp(src, dst, shallow=False):
+            shutil.copystat(src, dst)
+            return False
+    shutil.copy2(src, dst)
+    return True
 
 
 class Convert:
@@ -19,6 +52,7 @@ class Convert:
         - analysisInsertor
         - converttosciform
         - defaultvalue
+        - writeNetlistFile
     """
 
     def __init__(self, sourcelisttrack, source_entry_var,
@@ -195,8 +229,7 @@ class Convert:
 
         # Updating Schematic with source value
         for item in self.sourcelistvalue:
-            del self.schematicInfo[item[0]]
-            self.schematicInfo.insert(item[0], item[1])
+            self.schematicInfo[item[0]] = item[1]
 
         return self.schematicInfo
 
@@ -493,16 +526,7 @@ class Convert:
                     print("Caught an exception in model ", line[1])
                     print("Exception Message : ", str(e))
 
-        # Adding it to schematic
-        for item in modelParamValue:
-            if ".ic" in item[1]:
-                schematicInfo.insert(0, item[1])
-                schematicInfo.insert(0, item[2])
-            else:
-                schematicInfo.append(item[2])  # Adding Comment
-                schematicInfo.append(item[1])  # Adding model line
-
-        return schematicInfo
+        return self.addModelLines(schematicInfo, modelParamValue)
 
     def addMicrocontrollerParameter(self, schematicInfo):
         """
@@ -609,16 +633,24 @@ class Convert:
                 print("Caught an exception in microcontroller ", line[1])
                 print("Exception Message : ", str(e))
 
-        # Adding it to schematic
-        for item in modelParamValue:
-            if ".ic" in item[1]:
-                schematicInfo.insert(0, item[1])
-                schematicInfo.insert(0, item[2])
-            else:
-                schematicInfo.append(item[2])  # Adding Comment
-                schematicInfo.append(item[1])  # Adding model line
+        return self.addModelLines(schematicInfo, modelParamValue)
 
-        return schematicInfo
+    def addModelLines(self, schematicInfo, modelParamValue):
+        """
+        - Adds [index, line, comment] entries to schematicInfo
+        - .ic lines go to the top, the last one first (as the earlier
+          insert(0, ...) per line did); .model lines go to the end
+        """
+        edits = NetlistEdit(schematicInfo)
+        for item in reversed(modelParamValue):
+            if ".ic" in item[1]:
+                edits.prepend(item[2])
+                edits.prepend(item[1])
+        for item in modelParamValue:
+            if ".ic" not in item[1]:
+                edits.append(item[2])  # Adding Comment
+                edits.append(item[1])  # Adding model line
+        return edits.apply()
 
     def addDeviceLibrary(self, schematicInfo, kicadFile):
         """
@@ -631,15 +663,15 @@ class Convert:
         deviceLine = {}
         # Key:Index, Value:with its updated line in the form of list
         includeLine = []  # All .include line list
+        copied = set()  # libraries already copied
 
         if not deviceLibList:
             print("No library added in the schematic")
         else:
-            for eachline in schematicInfo:
+            for index, eachline in enumerate(schematicInfo):
                 words = eachline.split()
                 if words[0] in deviceLibList:
                     # print("Found Library line")
-                    index = schematicInfo.index(eachline)
                     completeLibPath = deviceLibList[words[0]]
                     (libpath, libname) = os.path.split(completeLibPath)
                     # print("Library Path :", libpath)
@@ -661,7 +693,9 @@ class Convert:
                         deviceLine[index] = words
                         includeLine.append(".include " + libname)
 
-                        shutil.copy2(libAbsPath, projpath)
+                        if libAbsPath not in copied:
+                            copied.add(libAbsPath)
+                            copyIfChanged(libAbsPath, projpath)
 
                     elif eachline[0:6] == 'scmode':
                         (filepath, filemname) = os.path.split(self.clarg1)
@@ -709,18 +743,22 @@ sky130_fd_pr__model__r+c.model.spice
                         deviceLine[index] = words
                         includeLine.append(".include " + libname)
 
-                        shutil.copy2(completeLibPath, projpath)
+                        if completeLibPath not in copied:
+                            copied.add(completeLibPath)
+                            copyIfChanged(completeLibPath, projpath)
 
             # Adding device line to schematicInfo
+            edits = NetlistEdit(schematicInfo)
             for index, value in deviceLine.items():
                 # Update the device line
                 strLine = " ".join(str(item) for item in value)
-                schematicInfo[index] = strLine
+                edits.replace(index, strLine)
 
-            # This has to be second i.e after deviceLine details
-            # Adding .include line to Schematic Info at the start of line
-            for item in list(set(includeLine)):
-                schematicInfo.insert(0, item)
+            # Adding .include line to Schematic Info at the start of line,
+            # once each and in a stable order (same netlist, same file)
+            for item in dict.fromkeys(includeLine):
+                edits.prepend(item)
+            schematicInfo = edits.apply()
 
         return schematicInfo
 
@@ -734,6 +772,7 @@ sky130_fd_pr__model__r+c.model.spice
         subLine = {}
         # Key:Index, Value:with its updated line in the form of list
         includeLine = []  # All .include line list
+        copied = set()  # subcircuit directories already copied
 
         if len(self.obj_track.subcircuitList) != len(
                 self.obj_track.subcircuitTrack):
@@ -747,11 +786,10 @@ sky130_fd_pr__model__r+c.model.spice
         elif not subList:
             print("No Subcircuit Added in the schematic")
         else:
-            for eachline in schematicInfo:
+            for index, eachline in enumerate(schematicInfo):
                 words = eachline.split()
                 if words[0] in subList:
                     print("Found Subcircuit line")
-                    index = schematicInfo.index(eachline)
                     completeSubPath = subList[words[0]]
                     (subpath, subname) = os.path.split(completeSubPath)
                     print("Library Path :", subpath)
@@ -764,33 +802,123 @@ sky130_fd_pr__model__r+c.model.spice
 
                     src = completeSubPath
                     dst = projpath
+                    if src in copied:
+                        continue
+                    copied.add(src)
                     print(os.listdir(src))
                     for files in os.listdir(src):
                         if os.path.isfile(os.path.join(src, files)):
                             if files != "analysis":
-                                shutil.copy2(os.path.join(src, files), dst)
+                                copyIfChanged(os.path.join(src, files), dst)
 
             # Adding subcircuit line to schematicInfo
+            edits = NetlistEdit(schematicInfo)
             for index, value in subLine.items():
                 # Update the subcircuit line
                 strLine = " ".join(str(item) for item in value)
-                schematicInfo[index] = strLine
+                edits.replace(index, strLine)
 
-            # This has to be second i.e after subcircuitLine details
-            # Adding .include line to Schematic Info at the start of line
-            for item in list(set(includeLine)):
-                schematicInfo.insert(0, item)
+            # Adding .include line to Schematic Info at the start of line,
+            # once each and in a stable order (same netlist, same file)
+            for item in dict.fromkeys(includeLine):
+                edits.prepend(item)
+            schematicInfo = edits.apply()
 
         return schematicInfo
 
     def getReferenceName(self, libname, libpath):
+        """
+        - The ``ref_model`` of a device library, read from its .xml
+        - Parsed once per library and kept until the .xml changes
+        """
         libname = libname.replace('.lib', '.xml')
         library = os.path.join(libpath, libname)
 
+        mtime = os.stat(library).st_mtime_ns
+        cached = _referenceNames.get(library)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
         # Extracting Value from XML
         libtree = ET.parse(library)
         for child in libtree.iter():
             if child.tag == 'ref_model':
                 retVal = child.text
 
+        _referenceNames[library] = (mtime, retVal)
         return retVal
+
+    def writeNetlistFile(self, infoline, optionInfo, schematicInfo,
+                         plotText, printPlotData=False):
+        """
+        - Creates the final ``<kicadFile>.out`` netlist
+        - The project's ``analysis`` file (written by analysisInsertor)
+          supplies the analysis statement, the netlist's own option lines
+          are sorted into simulator, initial condition and analysis options
+        - Control statements follow; the ``print allv/alli`` text dumps are
+          only added when `printPlotData` is set
+        - Raises OSError if the analysis file is missing or unreadable
+        """
+        # To avoid writing optionInfo twice in final netlist
+        store_optionInfo = list(optionInfo)
+
+        (projpath, filename) = os.path.split(self.clarg1)
+        analysisFileLoc = os.path.join(projpath, "analysis")
+        with open(analysisFileLoc) as f:
+            data = f.read()
+
+        # Adding analysis file info to optionInfo
+        for eachline in data.splitlines():
+            eachline = eachline.strip()
+            if len(eachline) > 1:
+                if eachline[0] == '.':
+                    store_optionInfo.append(eachline)
+
+        analysisOption = []
+        initialCondOption = []
+        simulatorOption = []
+
+        for eachline in store_optionInfo:
+            words = eachline.split()
+            option = words[0]
+            if (option == '.ac' or option == '.dc' or option ==
+                    '.disto' or option == '.noise' or
+                    option == '.op' or option == '.pz' or option ==
+                    '.sens' or option == '.tf' or
+                    option == '.tran'):
+                analysisOption.append(eachline + '\n')
+            elif (option == '.nodeset' or option == '.ic'):
+                initialCondOption.append(eachline + '\n')
+            elif option == '.option':
+                simulatorOption.append(eachline + '\n')
+
+        # Start creating final netlist cir.out file
+        outfile = self.clarg1 + ".out"
+        with open(outfile, "w") as out:
+            out.writelines(infoline)
+            out.writelines('\n')
+            sections = [
+                simulatorOption,
+                initialCondOption,
+                schematicInfo,
+                analysisOption]
+
+            for section in sections:
+                for line in section:
+                    out.writelines('\n')
+                    out.writelines(line)
+
+            out.writelines('\n* Control Statements \n')
+            out.writelines('.control\n')
+            out.writelines('run\n')
+            # Results are plotted from the .raw file ngspice writes (-r);
+            # printing every vector as text is only kept on request
+            if printPlotData:
+                out.writelines('print allv > plot_data_v.txt\n')
+                out.writelines('print alli > plot_data_i.txt\n')
+            for item in plotText:
+                out.writelines(item + '\n')
+            out.writelines('.endc\n')
+            out.writelines('.end\n')
+
+        return outfile
@@ -0,0 +1,428 @@
+"""
+KiCad to Ngspice conversion without the KicadtoNgspice window.
+
+The values a user enters in the window are saved in the project's
+``<project>_Previous_Values.xml``; this module reads them back and runs the
+same Processing / Convert passes, so a project converted once in the GUI
+can be converted again from a script or a CI job::
+
+    python -m kicadtoNgspice.HeadlessConvert -j 8 proj1/proj1.cir ...
+
+(run from ``src``, like eSim itself). Each project is converted in a worker
+process; the exit status is non-zero if any of them failed.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from xml.etree import ElementTree as ET
+
+from configuration.Appconfig import Appconfig
+from projManagement import Validation
+from . import Convert
+from . import TrackWidget
+from .Processing import PrcocessNetlist
+
+
+# TrackWidget class attributes the conversion passes read
+_TRACKED = [
+    "sourcelisttrack", "source_entry_var", "AC_entry_var", "AC_Parameter",
+    "DC_entry_var", "DC_Parameter", "TRAN_entry_var", "TRAN_Parameter",
+    "set_CheckBox", "AC_type", "op_check", "modelTrack",
+    "microcontrollerTrack", "model_entry_var", "microcontroller_var",
+    "deviceModelTrack", "subcircuitTrack", "subcircuitList",
+]
+
+# number of entry fields of each source type, as laid out in Source.py
+_SOURCE_FIELDS = {
+    "ac": 2, "dc": 1, "sine": 5, "pulse": 7, "pwl": 1, "exp": 6,
+}
+
+
+class ConversionError(Exception):
+    pass
+
+
+class Value:
+    """Stands in for a QLineEdit of the window: the saved text."""
+
+    def __init__(self, text):
+        self.value = text or ""
+
+    def text(self):
+        return self.value
+
+
+def previousValuesFile(kicadFile):
+    (projpath, filename) = os.path.split(kicadFile)
+    project_name = os.path.basename(projpath)
+    return os.path.join(projpath, project_name + "_Previous_Values.xml")
+
+
+def readPreviousValues(path):
+    """Sections of a ``_Previous_Values.xml`` file by tag."""
+    try:
+        root = ET.parse(path).getroot()
+    except (OSError, ET.ParseError) as e:
+        raise ConversionError(
+            "cannot read previous values %s: %s" % (path, e))
+    return {child.tag: child for child in root}
+
+
+def _fields(element):
+    return [Value(child.text) for child in element]
+
+
+def analysisTrack(kicadFile, analysis):
+    """
+    - Arguments of Convert.analysisInsertor from the saved analysis values
+    - The analysis type comes from the project's ``analysis`` file, as in
+      the Analysis tab (transient if there is none)
+    """
+    (projpath, filename) = os.path.split(kicadFile)
+    try:
+        with open(os.path.join(projpath, "analysis")) as f:
+            contentlist = f.readline().split()
+    except OSError:
+        contentlist = []
+    first = contentlist[0] if contentlist else ".tran"
+    checkbox = {".ac": "AC", ".dc": "DC", ".op": "DC"}.get(first, "TRAN")
+
+    if analysis is None or len(analysis) < 3:
+        raise ConversionError("no saved analysis values")
+    ac, dc, tran = [_fields(analysis[i]) for i in range(3)]
+
+    ac_type = "lin"
+    for text, kind in zip(ac[0:3], ("lin", "dec", "oct")):
+        if text.text() == "true":
+            ac_type = kind
+    if first == ".ac" and len(contentlist) > 1:
+        ac_type = contentlist[1]
+
+    op = first == ".op" or (len(dc) > 4 and dc[4].text() == "1")
+    return dict(
+        ac_entry_var=dict(enumerate(ac[3:6])),
+        dc_entry_var=dict(enumerate(dc[0:4] + dc[8:12])),
+        tran_entry_var=dict(enumerate(tran[0:3])),
+        set_checkbox=checkbox,
+        ac_parameter=dict(enumerate(v.text() for v in ac[6:8])),
+        dc_parameter=dict(
+            enumerate(v.text() for v in dc[5:8] + dc[12:15])),
+        tran_parameter=dict(enumerate(v.text() for v in tran[3:6])),
+        ac_type=ac_type,
+        op_check=[1 if op else 0],
+    )
+
+
+def sourceTrack(sourcelist, source):
+    """sourcelisttrack and entries of Source.py from the saved values."""
+    track = []
+    entry_var = {}
+    count = 1
+    for line in sourcelist:
+        compName = line[1].split(' ')[0]
+        saved = []
+        for child in source if source is not None else []:
+            if child.tag == compName and child.text == line[2]:
+                saved = _fields(child)
+        start = count
+        for k in range(_SOURCE_FIELDS.get(line[2], 0)):
+            entry_var[count] = saved[k] if k < len(saved) else Value("")
+            count = count + 1
+        track.append([line[0], line[2], start, count - 1])
+    return track, entry_var
+
+
+def modelTrack(modelList, model):
+    """
+    - modelTrack (or microcontrollerTrack) and its entries, laid out as
+      Model.py does: one entry per parameter, vector parameters expanded
+    """
+    track = []
+    entry_var = {}
+    nextcount = 0
+    for line in modelList:
+        saved = []
+        for child in model if model is not None else []:
+            if child.text == line[2] and child.tag == line[3]:
+                saved = _fields(child)
+        start = nextcount
+        tag_dict = {}
+        i = 0
+        for key, value in line[7].items():
+            if not isinstance(value, str) and hasattr(value, "__iter__"):
+                items = value
+            else:
+                items = [value]
+            tags = []
+            for _ in items:
+                entry_var[nextcount] = saved[i] if i < len(saved) \
+                    else Value("")
+                tags.append(nextcount)
+                nextcount = nextcount + 1
+                i = i + 1
+            tag_dict[key] = tags if items is value else tags[0]
+        track.append(line[:7] + [start, nextcount - 1, tag_dict])
+    return track, entry_var
+
+
+def deviceModelTrack(schematicInfo, devicemodel):
+    """
+    deviceModelTrack of DeviceModel.py from the saved library paths; raises
+    ConversionError for a device whose library is not saved or is missing,
+    since its model would be undefined in the netlist
+    """
+    track = {}
+    saved = {}
+    for child in devicemodel if devicemodel is not None else []:
+        saved[child.tag] = [v.text() for v in _fields(child)]
+
+    for eachline in schematicInfo:
+        name = eachline.split()[0]
+        fields = saved.get(name)
+        if name[0:2] == "sc" and name[0:6] != "scmode":
+            # SKY130 component: its parameters, not a file
+            if not fields or not fields[0]:
+                raise ConversionError("no parameters saved for " + name)
+            track[name] = fields[0]
+            continue
+        if name[0] not in "qdjsm":
+            continue
+        if not fields or not fields[0]:
+            raise ConversionError("no library saved for " + name)
+        if not os.path.exists(fields[0]):
+            raise ConversionError(
+                "library %s of %s does not exist" % (fields[0], name))
+
+        if name[0:6] == "scmode":
+            corner = fields[1] if len(fields) > 1 else ""
+            track[name] = fields[0] + ":" + corner
+        elif name[0] == "m":
+            width, length, multifactor = (
+                fields[1:4] + [""] * 3)[:3]
+            track[name] = fields[0] + ":" + \
+                "W=" + (width or "100u") + \
+                " L=" + (length or "100u") + \
+                " M=" + (multifactor or "1")
+        else:
+            track[name] = fields[0]
+    return track
+
+
+def subcircuitTrack(kicadFile, schematicInfo, subcircuit):
+    """subcircuitList and subcircuitTrack of SubcircuitTab.py."""
+    (projpath, filename) = os.path.split(kicadFile)
+    project_name = os.path.basename(projpath)
+    saved = {}
+    for child in subcircuit if subcircuit is not None else []:
+        if len(child) and child[0].text:
+            saved[child.tag] = child[0].text
+
+    validation = Validation.Validation()
+    subList = {}
+    track = {}
+    for eachline in schematicInfo:
+        words = eachline.split()
+        if eachline[0] != 'x':
+            continue
+        subList[project_name + words[0]] = words
+        path = saved.get(words[0])
+        if path is None:
+            raise ConversionError(
+                "no subcircuit directory saved for " + words[0])
+        reply = validation.validateSub(path, len(words) - 2)
+        if reply != "True":
+            raise ConversionError(
+                "subcircuit %s of %s: %s" % (path, words[0],
+                                             "port count differs"
+                                             if reply == "PORT"
+                                             else "no .sub file"))
+        track[words[0]] = path
+    return subList, track
+
+
+@contextlib.contextmanager
+def trackState():
+    """Swap in fresh TrackWidget state, restoring the window's after."""
+    tw = TrackWidget.TrackWidget
+    saved = {name: getattr(tw, name) for name in _TRACKED}
+    try:
+        yield tw
+    finally:
+        for name, value in saved.items():
+            setattr(tw, name, value)
+
+
+def convertProject(kicadFile, previousValues=None, libraryDir=None,
+                   printPlotData=None):
+    """
+    - Converts `kicadFile` (the ``.cir``) into ``<kicadFile>.out`` with the
+      values saved in `previousValues` (default: the project's
+      ``_Previous_Values.xml``), and rewrites the project's analysis file
+    - `libraryDir` is the modelParamXML directory (default: the one
+      relative to the working directory, as in the window)
+    - Returns the path of the written netlist; raises ConversionError,
+      also when a Processing pass gives up with sys.exit()
+    """
+    kicadFile = os.path.abspath(kicadFile)
+    values = readPreviousValues(
+        previousValues or previousValuesFile(kicadFile))
+    if printPlotData is None:
+        printPlotData = Appconfig.print_plot_data
+
+    obj_proc = PrcocessNetlist()
+    if libraryDir is not None:
+        obj_proc.modelxmlDIR = libraryDir
+
+    # a parameter without value is asked for on stdin; fail instead
+    stdin, sys.stdin = sys.stdin, io.StringIO()
+    try:
+        kicadNetlist = obj_proc.readNetlist(kicadFile)
+        param = obj_proc.readParamInfo(kicadNetlist)
+        netlist, infoline = obj_proc.preprocessNetlist(kicadNetlist, param)
+        optionInfo, schematicInfo = obj_proc.separateNetlistInfo(netlist)
+        schematicInfo, sourcelist = obj_proc.insertSpecialSourceParam(
+            schematicInfo, [])
+        (
+            schematicInfo,
+            outputOption,
+            modelList,
+            unknownModelList,
+            multipleModelList,
+            plotText
+        ) = obj_proc.convertICintoBasicBlocks(schematicInfo, [], [], [])
+    except OSError as e:
+        raise ConversionError(str(e))
+    except EOFError:
+        raise ConversionError("netlist uses an undefined parameter")
+    except SystemExit:
+        # Processing prints the reason, then exits
+        raise ConversionError("netlist processing failed")
+    except Exception as e:
+        raise ConversionError("%s: %s" % (type(e).__name__, e))
+    finally:
+        sys.stdin = stdin
+    if unknownModelList:
+        raise ConversionError(
+            "unknown model " + ', '.join(unknownModelList))
+    if multipleModelList:
+        raise ConversionError(
+            "duplicate model in modelParamXML " +
+            ', '.join(multipleModelList[0]))
+    microcontrollerList = [
+        line for line in modelList if line[6] == "Nghdl"]
+    modelList = [line for line in modelList if line[6] != "Nghdl"]
+
+    with trackState() as tw:
+        tw.sourcelisttrack = {}
+        tw.source_entry_var = {}
+        (tw.sourcelisttrack["ITEMS"], tw.source_entry_var["ITEMS"]) = \
+            sourceTrack(sourcelist, values.get("source"))
+        tw.modelTrack, tw.model_entry_var = modelTrack(
+            modelList, values.get("model"))
+        tw.microcontrollerTrack, tw.microcontroller_var = modelTrack(
+            microcontrollerList, values.get("microcontroller"))
+        tw.deviceModelTrack = deviceModelTrack(
+            schematicInfo, values.get("devicemodel"))
+        tw.subcircuitList, tw.subcircuitTrack = subcircuitTrack(
+            kicadFile, schematicInfo, values.get("subcircuit"))
+
+        obj_convert = Convert.Convert(
+            tw.sourcelisttrack["ITEMS"], tw.source_entry_var["ITEMS"],
+            schematicInfo, kicadFile)
+        try:
+            schematicInfo = obj_convert.addSourceParameter()
+            schematicInfo = obj_convert.addModelParameter(schematicInfo)
+            schematicInfo = obj_convert.addMicrocontrollerParameter(
+                schematicInfo)
+            schematicInfo = obj_convert.addDeviceLibrary(
+                schematicInfo, kicadFile)
+            schematicInfo = obj_convert.addSubcircuit(
+                schematicInfo, kicadFile)
+            obj_convert.analysisInsertor(
+                **analysisTrack(kicadFile, values.get("analysis")))
+            return obj_convert.writeNetlistFile(
+                infoline, optionInfo, schematicInfo, plotText,
+                printPlotData)
+        except ConversionError:
+            raise
+        except Exception as e:
+            raise ConversionError("%s: %s" % (type(e).__name__, e))
+
+
+def _convertJob(kicadFile, libraryDir, printPlotData, verbose):
+    """Worker side of convertProjects: (file, output, error, seconds)."""
+    begin = time.time()
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(sys.stdout if verbose else log):
+            out = convertProject(kicadFile, libraryDir=libraryDir,
+                                 printPlotData=printPlotData)
+        return kicadFile, out, None, time.time() - begin
+    except ConversionError as e:
+        error = str(e)
+    except (Exception, SystemExit) as e:
+        # one broken project must not take the worker (and the batch) down
+        error = "%s: %s" % (type(e).__name__, e)
+    lastLine = log.getvalue().strip().splitlines()[-1:]
+    if lastLine:
+        # the converter's last message usually says what was wrong
+        error += " (%s)" % " ".join(lastLine[0].split())
+    return kicadFile, None, error, time.time() - begin
+
+
+def convertProjects(kicadFiles, workers=None, libraryDir=None,
+                    printPlotData=None, verbose=False):
+    """
+    - Converts every project in `kicadFiles`, `workers` at a time (default:
+      one per CPU), each in its own process so the per-conversion state
+      of TrackWidget never mixes
+    - Yields ``(kicadFile, output, error, seconds)`` as projects finish
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_convertJob, path, libraryDir, printPlotData,
+                        verbose)
+            for path in kicadFiles]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m kicadtoNgspice.HeadlessConvert",
+        description="Convert KiCad .cir netlists to ngspice .cir.out "
+                    "with each project's saved _Previous_Values.xml")
+    parser.add_argument("cir", nargs="+", help="KiCad .cir files")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--library",
+                        default=PrcocessNetlist.modelxmlDIR,
+                        help="modelParamXML directory (default: %(default)s)")
+    parser.add_argument("--print-plot-data", action="store_true",
+                        default=None,
+                        help="add the print allv/alli text dumps")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="show the converter's output")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    begin = time.time()
+    for kicadFile, out, error, seconds in convertProjects(
+            args.cir, args.jobs, os.path.abspath(args.library),
+            args.print_plot_data, args.verbose):
+        if error is None:
+            print("[OK] %s -> %s (%.2fs)" % (kicadFile, out, seconds))
+        else:
+            failed += 1
+            print("[FAILED] %s: %s" % (kicadFile, error))
+    print("%d converted, %d failed in %.1fs" % (
+        len(args.cir) - failed, failed, time.time() - begin))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -22,6 +22,7 @@ from xml.etree import ElementTree as ET
 
 from PyQt5 import QtWidgets
 
+from configuration.Appconfig import Appconfig
 from . import Analysis
 from . import Convert
 from . import DeviceModel
@@ -113,10 +114,10 @@ class MainWindow(QtWidgets.QWidget):
         ) = obj_proc.convertICintoBasicBlocks(
             schematicInfo, outputOption, modelList, plotText
         )
-        for line in modelList:
-            if line[6] == "Nghdl":
-                microcontrollerList.append(line)
-                modelList.remove(line)
+        # split in one pass (removing while iterating skipped entries)
+        microcontrollerList = [
+            line for line in modelList if line[6] == "Nghdl"]
+        modelList = [line for line in modelList if line[6] != "Nghdl"]
 
         """
         - Checking if any unknown model is used in schematic which is not
@@ -788,115 +789,22 @@ class MainWindow(QtWidgets.QWidget):
 
     def createNetlistFile(self, store_schematicInfo, plotText):
         """
-        - Creating .cir.out file
-        - If analysis file present uses that and extract
-            - Simulator
-            - Initial
-            - Analysis
-        - Finally add the following components to .cir.out file
-            - SimulatorOption
-            - InitialCondOption
-            - Store_SchematicInfo
-            - AnalysisOption
-        - In the end add control statements and allv, alli, end statements
+        - Creating .cir.out file, see Convert.writeNetlistFile
+        - Exits if the project's analysis file is missing or unreadable
         """
         print("=============================================================")
         print("Creating Final netlist")
 
-        # To avoid writing optionInfo twice in final netlist
-        store_optionInfo = list(optionInfo)
-
-        # checking if analysis files is present
-        (projpath, filename) = os.path.split(self.kicadFile)
-        analysisFileLoc = os.path.join(projpath, "analysis")
-
-        if os.path.exists(analysisFileLoc):
-            try:
-                f = open(analysisFileLoc)
-                # Read data
-                data = f.read()
-                # Close the file
-                f.close()
-
-            except BaseException:
-                print("Error While opening Project Analysis file.\
-                 Please check it")
-                sys.exit()
-        else:
-            # print("========================================================")
-            print(analysisFileLoc + " does not exist")
+        try:
+            self.obj_convert.writeNetlistFile(
+                infoline, optionInfo, store_schematicInfo, plotText,
+                Appconfig.print_plot_data)
+        except OSError as e:
+            print("Error While opening Project Analysis file.\
+             Please check it")
+            print(str(e))
             sys.exit()
 
-        # Adding analysis file info to optionInfo
-        analysisData = data.splitlines()
-        for eachline in analysisData:
-            eachline = eachline.strip()
-            if len(eachline) > 1:
-                if eachline[0] == '.':
-                    store_optionInfo.append(eachline)
-
-        analysisOption = []
-        initialCondOption = []
-        simulatorOption = []
-        # includeOption=[]  # Don't know why to use it
-        # model = []      # Don't know why to use it
-
-        for eachline in store_optionInfo:
-            words = eachline.split()
-            option = words[0]
-            if (option == '.ac' or option == '.dc' or option ==
-                    '.disto' or option == '.noise' or
-                    option == '.op' or option == '.pz' or option ==
-                    '.sens' or option == '.tf' or
-                    option == '.tran'):
-                analysisOption.append(eachline + '\n')
-
-            elif (option == '.save' or option == '.print' or option ==
-                  '.plot' or option == '.four'):
-                eachline = eachline.strip('.')
-                outputOption.append(eachline + '\n')
-            elif (option == '.nodeset' or option == '.ic'):
-                initialCondOption.append(eachline + '\n')
-            elif option == '.option':
-                simulatorOption.append(eachline + '\n')
-            # elif (option=='.include' or option=='.lib'):
-            #    includeOption.append(eachline+'\n')
-            # elif (option=='.model'):
-            #    model.append(eachline+'\n')
-            elif option == '.end':
-                continue
-
-        # Start creating final netlist cir.out file
-        outfile = self.kicadFile + ".out"
-        out = open(outfile, "w")
-        out.writelines(infoline)
-        out.writelines('\n')
-        sections = [
-            simulatorOption,
-            initialCondOption,
-            store_schematicInfo,
-            analysisOption]
-
-        for section in sections:
-            if len(section) == 0:
-                continue
-            else:
-                for line in section:
-                    out.writelines('\n')
-                    out.writelines(line)
-
-        out.writelines('\n* Control Statements \n')
-        out.writelines('.control\n')
-        out.writelines('run\n')
-        # out.writelines(outputOption)
-        out.writelines('print allv > plot_data_v.txt\n')
-        out.writelines('print alli > plot_data_i.txt\n')
-        for item in plotText:
-            out.writelines(item + '\n')
-        out.writelines('.endc\n')
-        out.writelines('.end\n')
-        out.close()
-
     def createSubFile(self, subPath):
         """
         - To create subcircuit file
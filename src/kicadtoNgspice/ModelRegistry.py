@@ -0,0 +1,127 @@
+import os
+from xml.etree import ElementTree as ET
+
+
+class ModelInfo:
+    """
+    - Parsed contents of one ``library/modelParamXML`` model file
+    - ``params`` maps tag (``tag:default`` when a default is given) to the
+      text, or to a list of ``"<text> <n>"`` entries for vector params
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.node_number = None
+        self.title = None
+        self.name = None
+        self.type = None
+        self.split = None
+        self.params = {}
+
+        tree = ET.parse(path)
+        # same walk as before the registry: last occurrence of a tag wins
+        for child in tree.iter():
+            if child.tag == 'node_number':
+                self.node_number = int(child.text)
+            elif child.tag == 'title':
+                self.title = child.text
+            elif child.tag == 'name':
+                self.name = child.text
+            elif child.tag == 'type':
+                self.type = child.text
+            elif child.tag == 'split':
+                self.split = child.text
+
+        for param in tree.findall('param'):
+            for item in param:
+                if 'vector' in item.attrib:
+                    temp_list = [
+                        item.text + " " + str(i + 1)
+                        for i in range(int(item.attrib['vector']))]
+                    if 'default' in item.attrib:
+                        self.params[item.tag + ":" + item.attrib['default']] \
+                            = temp_list
+                    else:
+                        self.params[item.tag] = item.text
+                else:
+                    if 'default' in item.attrib:
+                        self.params[item.tag + ":" + item.attrib['default']] \
+                            = item.text
+                    else:
+                        self.params[item.tag] = item.text
+
+    def paramDict(self):
+        """A copy of the parameters that the caller may modify."""
+        return {key: list(value) if isinstance(value, list) else value
+                for key, value in self.params.items()}
+
+
+class ModelRegistry:
+    """
+    - Index of the model XML files under one directory tree
+    - ``<compType>.xml`` -> every path with that name, so a lookup and the
+      "multiple models" check are a dictionary access instead of a walk
+    - Model files are parsed on first use and kept until they change
+    - :meth:`refresh` re-walks the tree only when a directory's mtime
+      changed (a model was added, removed or renamed)
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.index = None
+        self.dirStamps = {}
+        self.models = {}    # path -> (mtime, ModelInfo)
+
+    def build(self):
+        index = {}
+        stamps = {}
+        for dirpath, _, files in os.walk(self.root):
+            stamps[dirpath] = os.stat(dirpath).st_mtime_ns
+            for name in files:
+                if name.endswith('.xml'):
+                    index.setdefault(name, []).append(
+                        os.path.join(dirpath, name))
+        self.index = index
+        self.dirStamps = stamps
+
+    def refresh(self):
+        """Rebuild the index if the tree changed since it was built."""
+        if self.index is None:
+            self.build()
+            return
+        for dirpath, stamp in self.dirStamps.items():
+            try:
+                if os.stat(dirpath).st_mtime_ns != stamp:
+                    break
+            except OSError:
+                break
+        else:
+            return
+        self.build()
+
+    def paths(self, compType):
+        if self.index is None:
+            self.build()
+        return self.index.get(compType + ".xml", [])
+
+    def model(self, path):
+        """Parsed model at `path` (re-parsed if the file changed)."""
+        mtime = os.stat(path).st_mtime_ns
+        cached = self.models.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, ModelInfo(path))
+            self.models[path] = cached
+        return cached[1]
+
+
+_registries = {}
+
+
+def getRegistry(root):
+    """The process-wide registry of `root`, brought up to date."""
+    key = os.path.abspath(root)
+    registry = _registries.get(key)
+    if registry is None:
+        registry = _registries[key] = ModelRegistry(root)
+    registry.refresh()
+    return registry
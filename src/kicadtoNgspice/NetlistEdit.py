@@ -0,0 +1,36 @@
+class NetlistEdit:
+    """
+    - Collects the edits a conversion pass makes to a list of netlist lines
+      and applies them in one pass with :meth:`apply`
+    - A line's position in the input list is its id: ``sourcelist`` and
+      ``modelList`` refer to lines by that index, so passes only replace
+      lines in place and add new lines before or after the whole list
+    - Replaces the earlier ``list.index()`` / ``remove()`` / ``insert()``
+      calls per component, which were O(n) each
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.replaced = {}  # index -> new line
+        self.head = []      # lines emitted before the netlist, in order
+        self.tail = []      # lines emitted after it, in order
+
+    def replace(self, index, line):
+        self.replaced[index] = line
+
+    def comment(self, index):
+        """Keep the line at `index` only as a comment."""
+        self.replaced[index] = "* " + self.lines[index]
+
+    def prepend(self, line):
+        self.head.append(line)
+
+    def append(self, line):
+        self.tail.append(line)
+
+    def apply(self):
+        """The edited netlist as a new list."""
+        out = list(self.lines)
+        for index, line in self.replaced.items():
+            out[index] = line
+        return self.head + out + self.tail
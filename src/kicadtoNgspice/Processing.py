@@ -1,6 +1,7 @@
 import sys
 import os
-from xml.etree import ElementTree as ET
+from .ModelRegistry import getRegistry
+from .NetlistEdit import NetlistEdit
 
 
 class PrcocessNetlist:
@@ -39,7 +40,6 @@ class PrcocessNetlist:
         param = {}
         # print("=========================KICADNETLIST========================")
         for eachline in kicadNetlist:
-            print(eachline)
             eachline = eachline.strip()
             if len(eachline) > 1:
                 words = eachline.split()
@@ -130,17 +130,15 @@ class PrcocessNetlist:
         - Then check for type whether ac, dc, sine, etc...
         - Handle starting with h and f as well
         """
-        schematicInfo1 = []
+        edits = NetlistEdit(schematicInfo)
         # print("=============================================================")
         # print("Reading schematic info for source details")
         # print("=============================================================")
-        for compline in schematicInfo:
+        for index, compline in enumerate(schematicInfo):
             words = compline.split()
             compName = words[0]
             # Ask for parameters of source
             if compName[0] == 'v' or compName[0] == 'i':
-                # Find the index component from circuit
-                index = schematicInfo.index(compline)
                 if words[3] == "pulse":
                     Title = "Add parameters for pulse source " + compName
                     v1 = '  Enter initial value (Volts/Amps): '
@@ -198,13 +196,10 @@ class PrcocessNetlist:
                         [index, compline, words[3], Title, v1, v2])
 
             elif compName[0] == 'h' or compName[0] == 'f':
-                # Find the index component from the circuit
-                index = schematicInfo.index(compline)
-                schematicInfo.remove(compline)
-                schematicInfo.insert(index, "* " + compName)
-                schematicInfo1.append(
+                edits.replace(index, "* " + compName)
+                edits.append(
                     "V" + compName + " " + words[3] + " " + words[4] + " 0")
-                schematicInfo1.append(
+                edits.append(
                     compName +
                     " " +
                     words[1] +
@@ -216,7 +211,7 @@ class PrcocessNetlist:
                     " " +
                     words[5])
 
-        schematicInfo = schematicInfo + schematicInfo1
+        schematicInfo = edits.apply()
         # print("Source List : ", sourcelist)
 
         """print("=============================================================")
@@ -253,17 +248,18 @@ class PrcocessNetlist:
             'plot_phase']
         interMediateNodeCount = 1
         k = 1
-        for compline in schematicInfo:
+        registry = getRegistry(self.modelxmlDIR)
+        # model lines are appended after the netlist, every IC line is
+        # kept as a comment at its own index
+        edits = NetlistEdit(schematicInfo)
+        for index, compline in enumerate(schematicInfo):
             words = compline.split()
             compName = words[0]
             # print "Compline----------------->",compline
             # print "compName-------------->",compName
             # Find the IC from schematic
             if compName[0] == 'u' or compName[0] == 'U':
-                # Find the component from the circuit
-                index = schematicInfo.index(compline)
                 compType = words[len(words) - 1]
-                schematicInfo.remove(compline)
                 paramDict = {}
                 # e.g compLine : u1 1 2 gain
                 # compType : gain
@@ -276,73 +272,27 @@ class PrcocessNetlist:
                 if compType != "port" and compType != "ic" and \
                         compType not in plotList and \
                         compType != 'transfo':
-                    xmlfile = compType + ".xml"  # XML Model File
-                    count = 0  # Check if model of same name is present
-                    modelPath = []
-                    all_dir = [x[0]
-                               for x in os.walk(PrcocessNetlist.modelxmlDIR)]
-                    for each_dir in all_dir:
-                        all_file = os.listdir(each_dir)
-                        if xmlfile in all_file:
-                            count += 1
-                            modelPath.append(os.path.join(each_dir, xmlfile))
+                    # Check if model of same name is present
+                    modelPath = registry.paths(compType)
+                    count = len(modelPath)
 
                     if count > 1:
-                        multipleModelList.append(modelPath)
+                        edits.comment(index)
+                        multipleModelList.append(list(modelPath))
                     elif count == 0:
+                        edits.comment(index)
                         unknownModelList.append(compType)
                     elif count == 1:
                         try:
-                            # print("==========================================\
-                            #     ===========================")
-                            print(
-                                "Start Parsing Previous Values XML\
-                                 for ngspice model :", modelPath)
-                            tree = ET.parse(modelPath[0])
-
-                            # Getting number of nodes for model and title
-                            for child in tree.iter():
-                                if child.tag == 'node_number':
-                                    num_of_nodes = int(child.text)
-                                elif child.tag == 'title':
-                                    title = child.text + " " + compName
-                                elif child.tag == 'name':
-                                    modelname = child.text
-                                elif child.tag == 'type':
-                                    # Checking for Analog and Digital
-                                    type = child.text
-                                elif child.tag == 'split':
-                                    splitDetail = child.text
-
-                            for param in tree.findall('param'):
-                                for item in param:
-                                    # print "Tags ",item.tag
-                                    # print "Value",item.text
-                                    if 'vector' in item.attrib:
-                                        # print "Tag having vector attribute",\
-                                        # item.tag,item.attrib['vector']
-                                        temp_count = 1
-                                        temp_list = []
-                                        for i in range(0, int(
-                                                item.attrib['vector'])):
-                                            temp_list.append(
-                                                item.text + " " + str(
-                                                    temp_count))
-                                            temp_count += 1
-                                        if 'default' in item.attrib:
-                                            paramDict[item.tag + ":" +
-                                                      item.attrib['default']] \
-                                                = temp_list
-                                        else:
-                                            paramDict[item.tag] = item.text
-
-                                    else:
-                                        if 'default' in item.attrib:
-                                            paramDict[item.tag + ":" +
-                                                      item.attrib['default']]\
-                                                = item.text
-                                        else:
-                                            paramDict[item.tag] = item.text
+                            # parsed once per process, see ModelRegistry
+                            model = registry.model(modelPath[0])
+                            num_of_nodes = model.node_number
+                            title = model.title + " " + compName
+                            modelname = model.name
+                            # Checking for Analog and Digital
+                            type = model.type
+                            splitDetail = model.split
+                            paramDict = model.paramDict()
 
                             # print "Number of Nodes : ",num_of_nodes
                             # print "Title : ",title
@@ -398,7 +348,7 @@ class PrcocessNetlist:
 
                             # print "Final Model Line :",modelLine
                             try:
-                                schematicInfo.append(modelLine)
+                                edits.append(modelLine)
                                 k = k + 1
                             except Exception as e:
                                 print(
@@ -406,7 +356,7 @@ class PrcocessNetlist:
                                     ModelLine ", modelLine)
                                 print("Exception Message : ", str(e))
                             # Insert comment at remove line
-                            schematicInfo.insert(index, "* " + compline)
+                            edits.comment(index)
                             comment = "* Schematic Name:\
                              " + compType + ", Ngspice Name: " + modelname
                             # Here instead of adding compType(use for XML),
@@ -421,7 +371,7 @@ class PrcocessNetlist:
                             print("Exception Message : ", str(e))
                             sys.exit(2)
                 elif compType == "ic":
-                    schematicInfo.insert(index, "* " + compline)
+                    edits.comment(index)
                     modelname = "ic"
                     comment = "* " + compline
                     title = "Initial Condition for " + compName
@@ -433,7 +383,7 @@ class PrcocessNetlist:
                          comment, title, type, paramDict])
 
                 elif compType in plotList:
-                    schematicInfo.insert(index, "* " + compline)
+                    edits.comment(index)
                     if compType == 'plot_v1':
                         words = compline.split()
                         plotText.append("plot v(" + words[1] + ")")
@@ -444,7 +394,7 @@ class PrcocessNetlist:
                     elif compType == 'plot_i2':
                         words = compline.split()
                         # Adding zero voltage source to netlist
-                        schematicInfo.append(
+                        edits.append(
                             "v_" + words[0] + " " +
                             words[1] + " " + words[2] + " " + "0")
                         plotText.append("plot i(v_" + words[0] + ")")
@@ -459,7 +409,7 @@ class PrcocessNetlist:
                         plotText.append("plot phase(" + words[1] + ")")
 
                 elif compType == 'transfo':
-                    schematicInfo.insert(index, "* " + compline)
+                    edits.comment(index)
 
                     # For Primary Couple
                     modelLine = (
@@ -468,21 +418,21 @@ class PrcocessNetlist:
                         str(interMediateNodeCount) + " " + words[3] + ") "
                     )
                     modelLine += compName + "_primary"
-                    schematicInfo.append(modelLine)
+                    edits.append(modelLine)
                     k = k + 1
                     # For iron core
                     modelLine = "a" + str(k) + " (" + words[4] + " " + \
                         words[2] + ") (interNode_" + \
                         str(interMediateNodeCount + 1) + " " + words[3] + ") "
                     modelLine += compName + "_secondary"
-                    schematicInfo.append(modelLine)
+                    edits.append(modelLine)
                     k = k + 1
                     # For Secondary Couple
                     modelLine = "a" + str(k) + " (interNode_" + str(
                         interMediateNodeCount) + " interNode_" + \
                         str(interMediateNodeCount + 1) + ") "
                     modelLine += compName + "_iron_core"
-                    schematicInfo.append(modelLine)
+                    edits.append(modelLine)
                     k = k + 1
                     interMediateNodeCount += 2
 
@@ -506,7 +456,7 @@ class PrcocessNetlist:
                          comment, title, type, paramDict])
 
                 else:
-                    schematicInfo.insert(index, "* " + compline)
+                    edits.comment(index)
                 # print("=====================================================")
                 print(
                     "UnknownModelList Used in the Schematic",
@@ -517,6 +467,7 @@ class PrcocessNetlist:
                     multipleModelList)
                 print("=====================================================")
                 # print("Model List Details : ", modelList)
+        schematicInfo = edits.apply()
         print("=============================================================")
         print("convertICIntoBasicBlocks called, from Processing")
         print("=============================================================")
@@ -531,3 +482,64 @@ class PrcocessNetlist:
             schematicInfo, outputOption, modelList, unknownModelList,
             multipleModelList, plotText
         )
+
+
+def _synthetic_netlist(n):
+    """KiCad-style netlist lines with n components of the common kinds."""
+    lines = ["* synthetic netlist"]
+    for i in range(n):
+        kind = i % 8
+        if kind == 0:
+            lines.append("r%d n%d n%d 1k" % (i, i, i + 1))
+        elif kind == 1:
+            lines.append("v%d n%d 0 pulse" % (i, i))
+        elif kind == 2:
+            lines.append("u%d n%d n%d gain" % (i, i, i + 1))
+        elif kind == 3:
+            lines.append("u%d n%d plot_v1" % (i, i))
+        elif kind == 4:
+            lines.append("u%d n%d n%d plot_i2" % (i, i, i + 1))
+        elif kind == 5:
+            lines.append("u%d n%d ic" % (i, i))
+        elif kind == 6:
+            lines.append("h%d n%d 0 n%d n%d 10" % (i, i, i + 1, i + 2))
+        else:
+            lines.append("u%d n%d n%d n%d n%d transfo" % (
+                i, i, i + 1, i + 2, i + 3))
+    lines += [".tran 1u 1m", ".end"]
+    return lines
+
+
+def benchmark(sizes=(1000, 10000, 20000)):
+    """Time the netlist passes on synthetic schematics of growing size."""
+    import contextlib
+    import io
+    import time
+
+    PrcocessNetlist.modelxmlDIR = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        '..', '..', 'library', 'modelParamXML')
+    for n in sizes:
+        lines = _synthetic_netlist(n)
+        obj_proc = PrcocessNetlist()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            param = obj_proc.readParamInfo(lines)
+            netlist, infoline = obj_proc.preprocessNetlist(lines, param)
+            optionInfo, schematicInfo = \
+                obj_proc.separateNetlistInfo(netlist)
+            schematicInfo, sourcelist = \
+                obj_proc.insertSpecialSourceParam(schematicInfo, [])
+            result = obj_proc.convertICintoBasicBlocks(
+                schematicInfo, [], [], [])
+        took = time.perf_counter() - start
+        print("%6d components: %.3f s (%.1f us/component), %d lines" % (
+            n, took, took / n * 1e6, len(result[0])))
+
+
+if __name__ == "__main__":
+    # python -m kicadtoNgspice.Processing bench [components ...]
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        benchmark([int(a) for a in sys.argv[2:]] or (1000, 10000, 20000))
+    else:
+        print("Usage: python -m kicadtoNgspice.Processing bench [n ...]")
@@ -2,6 +2,8 @@ import os
 from PyQt5 import QtWidgets, QtCore
 from configuration.Appconfig import Appconfig
 from frontEnd import TerminalUi
+from ngspiceSimulation import resultCache
+from ngspiceSimulation.livePlot import LivePlotWidget
 
 
 # This Class creates NgSpice Window
@@ -13,6 +15,10 @@ class NgspiceWidget(QtWidgets.QWidget):
         - Creates NgspiceWindow and runs the process
         - Calls the logs the ngspice process, returns
           it's simulation status and calls the plotter
+        - Shows the waveforms live while ngspice writes the rawfile
+          (unless LIVE_PLOT = false in config.ini)
+        - Skips ngspice when the netlist and its includes are unchanged
+          since a cached run (see :mod:`resultCache`)
         - Checks whether it is Linux and runs gaw
         :param netlist: The file .cir.out file that
             contains the instructions.
@@ -31,7 +37,22 @@ class NgspiceWidget(QtWidgets.QWidget):
         self.process = QtCore.QProcess(self)
         self.terminalUi = TerminalUi.TerminalUi(self.process, self.args)
         self.layout = QtWidgets.QVBoxLayout(self)
-        self.layout.addWidget(self.terminalUi)
+
+        self.livePlot = None
+        if self.obj_appconfig.live_plot:
+            self.livePlot = LivePlotWidget(
+                netlist.replace(".cir.out", ".raw"),
+                self.obj_appconfig.live_plot_points)
+            self.splitter = QtWidgets.QSplitter(QtCore.Qt.Vertical)
+            self.splitter.addWidget(self.terminalUi)
+            self.splitter.addWidget(self.livePlot)
+            self.layout.addWidget(self.splitter)
+            # also covers Redo Simulation, which restarts the same process
+            self.process.started.connect(self.livePlot.start)
+            self.process.finished.connect(self.livePlot.stop)
+            self.process.errorOccurred.connect(self.livePlot.stop)
+        else:
+            self.layout.addWidget(self.terminalUi)
 
         self.process.setWorkingDirectory(self.projDir)
         self.process.setProcessChannelMode(QtCore.QProcess.MergedChannels)
@@ -42,6 +63,16 @@ class NgspiceWidget(QtWidgets.QWidget):
         )
         self.process.errorOccurred.connect(
             lambda: self.finishSimulation(None, None, simEndSignal, True))
+        self.netlist = netlist
+        self.cacheKey = None
+        if self.obj_appconfig.sim_cache:
+            self.process.started.connect(self.updateCacheKey)
+            self.updateCacheKey()
+            if self.cacheKey and \
+                    resultCache.has(self.projDir, self.cacheKey):
+                self.showCachedResult(simEndSignal)
+                return
+
         self.process.start('ngspice', self.args)
 
         self.obj_appconfig.process_obj.append(self.process)
@@ -58,6 +89,36 @@ class NgspiceWidget(QtWidgets.QWidget):
             self.gawProcess.start('sh', ['-c', self.gawCommand])
             print(self.gawCommand)
 
+    def updateCacheKey(self):
+        """Hash the netlist as it is when ngspice starts."""
+        try:
+            self.cacheKey = resultCache.netlist_key(self.netlist)
+        except OSError as e:
+            print("Simulation cache disabled:", str(e))
+            self.cacheKey = None
+
+    def showCachedResult(self, simEndSignal):
+        """Netlist unchanged: reuse the cached results instead of ngspice.
+        Redo Simulation still runs ngspice."""
+        self.terminalUi.progressBar.setMaximum(100)
+        self.terminalUi.progressBar.setProperty("value", 100)
+        self.terminalUi.cancelSimulationButton.setEnabled(False)
+        self.terminalUi.redoSimulationButton.setEnabled(True)
+
+        cachedFormat = '<span style="color:#00ff00; font-size:26px;">\
+                    {} \
+                    </span>'
+        self.terminalUi.simulationConsole.append(cachedFormat.format(
+            "Netlist unchanged - showing cached results."))
+        self.terminalUi.simulationConsole.append(
+            "Use Redo Simulation to run ngspice again.")
+        self.obj_appconfig.print_info(
+            'Simulation results loaded from cache : ' + self.netlist)
+
+        # after the dock is shown, like a finished run
+        QtCore.QTimer.singleShot(0, lambda: simEndSignal.emit(
+            QtCore.QProcess.NormalExit, 0))
+
     @QtCore.pyqtSlot()
     def readyReadAll(self):
         """Outputs the ngspice process standard output and standard error
@@ -136,6 +197,7 @@ class NgspiceWidget(QtWidgets.QWidget):
                         </span>'
             self.terminalUi.simulationConsole.append(
                 successFormat.format("Simulation Completed Successfully!"))
+            self.cacheResult()
 
         else:
             failedFormat = '<span style="color:#ff3333; font-size:26px;"> \
@@ -167,3 +229,14 @@ class NgspiceWidget(QtWidgets.QWidget):
         )
 
         simEndSignal.emit(exitStatus, exitCode)
+
+    def cacheResult(self):
+        """Store the rawfile of a successful run under its netlist key."""
+        if not self.cacheKey:
+            return
+        try:
+            resultCache.store(
+                self.projDir, self.cacheKey, self.args[2],
+                max_bytes=self.obj_appconfig.sim_cache_mb * 1024 * 1024)
+        except Exception as e:
+            print("Could not cache simulation results:", str(e))
@@ -0,0 +1,188 @@
+"""
+Level-of-detail drawing for large waveforms.
+
+Each trace keeps its full-resolution columns but hands matplotlib only a
+min/max envelope of the visible x-range: the samples are split into about
+one bucket per horizontal pixel and the minimum and maximum of every bucket
+are kept (in sample order), so peaks and glitches survive while a
+multi-million-point trace is drawn with a few thousand vertices.
+
+The envelope is recomputed whenever the x-limits change (zoom, pan, Home)
+and the existing ``Line2D`` artists are updated in place. For very wide
+views a coarse envelope precomputed once per trace is reduced instead of
+the raw samples, so the cost of a redraw does not grow with the dataset.
+"""
+import numpy as np
+
+
+# Traces shorter than this are drawn as-is
+LOD_MIN_POINTS = 20000
+# Size of the precomputed coarse envelope (buckets per trace)
+LOD_COARSE_BUCKETS = 16384
+
+
+def _bucket_extrema(v, size):
+    """Indices (into v) of the min and max of consecutive buckets of `size`."""
+    m = len(v) // size * size
+    if m:
+        main = v[:m].reshape(-1, size)
+        base = np.arange(0, m, size)
+        lo = base + main.argmin(axis=1)
+        hi = base + main.argmax(axis=1)
+    else:
+        lo = hi = np.empty(0, dtype=np.intp)
+    if m < len(v):
+        tail = v[m:]
+        lo = np.append(lo, m + tail.argmin())
+        hi = np.append(hi, m + tail.argmax())
+    return lo, hi
+
+
+class DecimatedTrace:
+    """One waveform: full data plus the artist showing its envelope."""
+
+    def __init__(self, x, y, line):
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        self.line = line
+        n = len(self.y)
+        self.monotonic = n < 2 or bool(np.all(self.x[1:] >= self.x[:-1]))
+
+        # coarse envelope, computed once
+        self.coarse = None
+        if n > LOD_MIN_POINTS:
+            size = max(1, -(-n // LOD_COARSE_BUCKETS))
+            self.coarse_size = size
+            self.coarse = _bucket_extrema(self.y, size)
+
+    def bounds(self):
+        """(xmin, xmax, ymin, ymax) of the finite samples."""
+        lo, hi = self.coarse if self.coarse is not None else (None, None)
+        ylo = self.y if lo is None else self.y[lo]
+        yhi = self.y if hi is None else self.y[hi]
+        ylo = ylo[np.isfinite(ylo)]
+        yhi = yhi[np.isfinite(yhi)]
+        if self.monotonic:
+            xmin, xmax = self.x[0], self.x[-1]
+        else:
+            xmin, xmax = np.nanmin(self.x), np.nanmax(self.x)
+        if not len(ylo) or not len(yhi):
+            return xmin, xmax, None, None
+        return xmin, xmax, ylo.min(), yhi.max()
+
+    def visible_range(self, xmin, xmax):
+        n = len(self.x)
+        if not self.monotonic:
+            return 0, n
+        i0 = max(int(np.searchsorted(self.x, xmin, "left")) - 1, 0)
+        i1 = min(int(np.searchsorted(self.x, xmax, "right")) + 1, n)
+        return i0, i1
+
+    def envelope(self, xmin, xmax, buckets):
+        """(x, y) of the min/max envelope of the visible part."""
+        i0, i1 = self.visible_range(xmin, xmax)
+        count = i1 - i0
+        if count <= max(2 * buckets, LOD_MIN_POINTS // 10):
+            return self.x[i0:i1], self.y[i0:i1]
+
+        size = -(-count // buckets)
+        if self.coarse is not None and size >= 2 * self.coarse_size:
+            # reduce the precomputed envelope instead of the raw samples
+            c0 = i0 // self.coarse_size
+            c1 = -(-i1 // self.coarse_size)
+            group = -(-(c1 - c0) // buckets)
+            lo_c = self.coarse[0][c0:c1]
+            hi_c = self.coarse[1][c0:c1]
+            lo = lo_c[_bucket_extrema(self.y[lo_c], group)[0]]
+            hi = hi_c[_bucket_extrema(self.y[hi_c], group)[1]]
+        else:
+            lo, hi = _bucket_extrema(self.y[i0:i1], size)
+            lo = lo + i0
+            hi = hi + i0
+
+        idx = np.unique(np.concatenate((lo, hi, [i0, i1 - 1])))
+        return self.x[idx], self.y[idx]
+
+
+class LODAxes:
+    """
+    Keeps decimated traces on one matplotlib Axes.
+
+    Traces are keyed (e.g. by checkbox index); adding an existing key
+    reuses its artist, and zoom/pan only calls ``set_data`` on the artists.
+    """
+
+    def __init__(self, axes, canvas):
+        self.axes = axes
+        self.canvas = canvas
+        self.traces = {}
+        self._cid = None
+        self._connect()
+        # more pixels -> more buckets
+        canvas.mpl_connect("resize_event", lambda event: self.refresh())
+
+    def _connect(self):
+        self._cid = self.axes.callbacks.connect(
+            "xlim_changed", self._on_xlim_changed)
+
+    def clear(self):
+        """axes.cla() (which also drops our callback) and forget traces."""
+        self.axes.cla()
+        self.traces = {}
+        self._connect()
+
+    def buckets(self):
+        width = self.axes.bbox.width
+        return max(int(width), 200)
+
+    def set_trace(self, key, x, y, **style):
+        trace = self.traces.get(key)
+        if trace is not None and trace.y is np.asarray(y) \
+                and trace.x is np.asarray(x):
+            trace.line.set(**style)
+            return trace
+        if trace is not None:
+            trace.line.remove()
+
+        line, = self.axes.plot([], [], **style)
+        trace = DecimatedTrace(x, y, line)
+        self.traces[key] = trace
+        return trace
+
+    def remove_trace(self, key):
+        trace = self.traces.pop(key, None)
+        if trace is not None:
+            trace.line.remove()
+
+    def keep_only(self, keys):
+        for key in list(self.traces):
+            if key not in keys:
+                self.remove_trace(key)
+
+    def fit(self):
+        """Reset the view to all traces (redrawn through xlim_changed)."""
+        bounds = [t.bounds() for t in self.traces.values() if len(t.x)]
+        if not bounds:
+            self.canvas.draw_idle()
+            return
+        xmin = min(b[0] for b in bounds)
+        xmax = max(b[1] for b in bounds)
+        ys = [b for b in bounds if b[2] is not None]
+        if ys:
+            ymin = min(b[2] for b in ys)
+            ymax = max(b[3] for b in ys)
+            pad = (ymax - ymin) * 0.05 or abs(ymax) * 0.05 or 1.0
+            self.axes.set_ylim(ymin - pad, ymax + pad)
+        if xmin == xmax:
+            xmin, xmax = xmin - 0.5, xmax + 0.5
+        self.axes.set_xlim(xmin, xmax)
+
+    def refresh(self):
+        xmin, xmax = sorted(self.axes.get_xlim())
+        buckets = self.buckets()
+        for trace in self.traces.values():
+            trace.line.set_data(*trace.envelope(xmin, xmax, buckets))
+        self.canvas.draw_idle()
+
+    def _on_xlim_changed(self, axes):
+        self.refresh()
@@ -0,0 +1,135 @@
+from PyQt5 import QtCore, QtWidgets
+from matplotlib.backends.backend_qt5agg\
+    import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+
+from .decimation import DecimatedTrace
+from .plotData import PlotDataError
+from .rawTail import RawTail
+
+
+# Traces shown when a new plot starts
+LIVE_DEFAULT_TRACES = 4
+
+
+class LivePlotWidget(QtWidgets.QWidget):
+    """
+    Waveforms of a running ngspice simulation.
+
+    - Polls the rawfile ngspice is writing (see :class:`rawTail.RawTail`)
+      every `interval` ms and redraws the checked nodes/branches
+    - Only the most recent `capacity` points are kept and each trace is
+      drawn as a min/max envelope, so a long transient neither grows
+      memory nor slows down the GUI
+    """
+
+    def __init__(self, rawPath, capacity=200000, interval=250, parent=None):
+        QtWidgets.QWidget.__init__(self, parent)
+        self.tail = RawTail(rawPath, capacity)
+        self.generation = None
+        self.lines = {}
+
+        self.fig = Figure((5.0, 3.0), dpi=100)
+        self.canvas = FigureCanvas(self.fig)
+        self.axes = self.fig.add_subplot(111)
+        self.axes.grid(True)
+
+        self.nodeList = QtWidgets.QListWidget()
+        self.nodeList.setMaximumWidth(220)
+        self.nodeList.itemChanged.connect(self.redraw)
+        self.status = QtWidgets.QLabel("Waiting for simulation data...")
+
+        right = QtWidgets.QVBoxLayout()
+        right.addWidget(QtWidgets.QLabel("<b>Live view</b>"))
+        right.addWidget(self.nodeList)
+        right.addWidget(self.status)
+
+        layout = QtWidgets.QHBoxLayout(self)
+        layout.addWidget(self.canvas, 1)
+        layout.addLayout(right)
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.poll)
+
+    def start(self):
+        """Called when ngspice (re)starts."""
+        self.tail.start()
+        self.generation = None
+        self.status.setText("Waiting for simulation data...")
+        self.timer.start()
+
+    def stop(self):
+        """Called when ngspice exits; picks up the last rows."""
+        self.timer.stop()
+        self.poll()
+
+    def poll(self):
+        try:
+            added = self.tail.poll()
+        except (OSError, PlotDataError) as e:
+            self.timer.stop()
+            self.status.setText(str(e))
+            return
+
+        if self.tail.buffer is None:
+            return
+        if self.generation != self.tail.generation:
+            self.newPlot()
+        if added:
+            self.redraw()
+
+    def newPlot(self):
+        """A new analysis started: list its vectors and reset the axes."""
+        self.generation = self.tail.generation
+        self.nodeList.blockSignals(True)
+        self.nodeList.clear()
+        for k, name in enumerate(self.tail.names[1:]):
+            item = QtWidgets.QListWidgetItem(name)
+            item.setFlags(item.flags() | QtCore.Qt.ItemIsUserCheckable)
+            item.setCheckState(
+                QtCore.Qt.Checked if k < LIVE_DEFAULT_TRACES
+                else QtCore.Qt.Unchecked)
+            self.nodeList.addItem(item)
+        self.nodeList.blockSignals(False)
+
+        self.axes.cla()
+        self.axes.grid(True)
+        self.lines = {}
+        plotname = self.tail.plotname.lower()
+        self.axes.set_xscale('log' if plotname.startswith('ac') else 'linear')
+        self.axes.set_xlabel(self.tail.names[0] + '-->')
+        self.axes.set_title(self.tail.plotname, fontsize=9)
+
+    def redraw(self):
+        if self.tail.buffer is None:
+            return
+        x, ys = self.tail.columns()
+        buckets = max(int(self.axes.bbox.width), 200)
+
+        for k in range(self.nodeList.count()):
+            checked = self.nodeList.item(k).checkState() == QtCore.Qt.Checked
+            line = self.lines.get(k)
+            if not checked:
+                if line is not None:
+                    line.remove()
+                    del self.lines[k]
+                continue
+            if line is None:
+                line, = self.axes.plot([], [], label=self.tail.names[k + 1])
+                self.lines[k] = line
+            if len(x):
+                trace = DecimatedTrace(x, ys[k], line)
+                line.set_data(*trace.envelope(x[0], x[-1], buckets))
+
+        if len(x):
+            self.axes.relim()
+            self.axes.autoscale_view()
+        if self.lines:
+            self.axes.legend(loc='upper left', fontsize=8)
+        elif self.axes.get_legend() is not None:
+            self.axes.get_legend().remove()
+
+        self.status.setText(
+            "%d points (showing last %d)" % (self.tail.read_rows, len(x)))
+        self.canvas.draw_idle()
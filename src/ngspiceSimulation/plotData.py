@@ -0,0 +1,443 @@
+"""
+Columnar readers for ngspice simulation output.
+
+The plotter's primary source is the rawfile ngspice writes with
+``-r <project>.raw`` (:func:`read_raw_file`): binary data sections are
+memory-mapped straight into NumPy arrays, so nothing is parsed. The map is
+used as is when the rawfile lists the voltages before the branch currents;
+otherwise the columns are reordered into one in-memory copy. ASCII rawfiles
+are read with one NumPy conversion.
+
+The parser for the text dumps written by ``print allv > plot_data_v.txt`` /
+``print alli > plot_data_i.txt`` works on the whole file at once:
+
+- header lines (``Index  time  v(a)  v(b) ...``) are located with one regex
+  pass; ngspice splits wide outputs into column partitions and each
+  partition into pages, both of which repeat the header
+- the data rows of every page are converted by NumPy in C
+  (``np.fromstring``) and copied straight into a preallocated float64
+  (complex128 for AC) matrix, so no per-sample Python objects are created
+
+Benchmark (synthetic transient dump)::
+
+    python plotData.py bench [rows] [vectors]
+"""
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+
+# A page's data rows are the first run of lines that start with a digit
+_ROWS = re.compile(r"^\d[^\n]*(?:\n\d[^\n]*)*", re.M)
+
+
+class PlotDataError(ValueError):
+    """Raised when a simulation output file cannot be parsed."""
+
+
+class PlotData:
+    """
+    Simulation vectors as one matrix.
+
+    - ``data[:, 0]`` is the scale (time / frequency / sweep), ``data[:, k]``
+      is ``names[k - 1]``
+    - voltages come first, ``volts_length`` of them, then branch currents
+    - text dumps give a column-major matrix (contiguous columns); binary
+      rawfiles give a read-only row-major ``np.memmap`` of the file itself,
+      or a copy of it when its columns had to be reordered
+    """
+
+    def __init__(self, scale_name, names, data, volts_length=None,
+                 plotname=""):
+        self.plotname = plotname
+        self.scale_name = scale_name
+        self.names = list(names)
+        self.data = data
+        self.volts_length = len(self.names) if volts_length is None \
+            else volts_length
+        self._index = {n: i + 1 for i, n in enumerate(self.names)}
+
+    @property
+    def is_complex(self):
+        return np.iscomplexobj(self.data)
+
+    @property
+    def x(self):
+        return self.data[:, 0].real if self.is_complex else self.data[:, 0]
+
+    def column(self, name):
+        """Raw (possibly complex) column of the vector ``name``."""
+        try:
+            return self.data[:, self._index[name]]
+        except KeyError:
+            raise KeyError("No vector named %r" % name)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    @classmethod
+    def merge(cls, volts, amps):
+        """Voltage dump + current dump -> one dataset sharing the scale."""
+        if volts is None:
+            return amps
+        if amps is None or not amps.names:
+            return volts
+        if len(volts) != len(amps):
+            raise PlotDataError(
+                "Voltage and current dumps have different lengths "
+                "(%d != %d)" % (len(volts), len(amps)))
+
+        dtype = np.result_type(volts.data.dtype, amps.data.dtype)
+        data = np.empty((len(volts), 1 + len(volts.names) + len(amps.names)),
+                        dtype=dtype, order="F")
+        data[:, :volts.data.shape[1]] = volts.data
+        data[:, volts.data.shape[1]:] = amps.data[:, 1:]
+        return cls(volts.scale_name, volts.names + amps.names, data,
+                   volts_length=len(volts.names))
+
+
+def _find_headers(text):
+    """(start, end) of every "Index ..." header line."""
+    # str.find is far quicker than a multiline regex over the whole dump
+    spans = []
+    pos = 0 if text.startswith("Index") else text.find("\nIndex")
+    while pos != -1:
+        start = pos if text.startswith("Index", pos) else pos + 1
+        end = text.find("\n", start)
+        if end == -1:
+            end = len(text)
+        spans.append((start, end))
+        pos = text.find("\nIndex", end)
+    return spans
+
+
+def _page_values(rows, ncols_hint):
+    # complex values are printed as "re,<tab>im"
+    flat = np.fromstring(rows.replace(",", " "), sep=" ")
+    nrows = rows.count("\n") + 1
+    if flat.size % nrows:
+        raise PlotDataError("Ragged data rows in ngspice output")
+    width = flat.size // nrows
+    if width not in (ncols_hint, 2 * ncols_hint - 1):
+        raise PlotDataError(
+            "Expected %d values per row, found %d" % (ncols_hint, width))
+    return flat.reshape(nrows, width)
+
+
+def parse_print_output(text):
+    """
+    Parse the text written by ngspice ``print <vectors> > file``.
+
+    :return: (scale_name, names, matrix) where ``matrix[:, 0]`` is the
+        scale and the other columns follow ``names``
+    """
+    headers = _find_headers(text)
+    if not headers:
+        raise PlotDataError("No 'Index' header found in ngspice output")
+
+    # Group pages into column partitions: a partition starts whenever the
+    # header changes or the row index restarts at 0.
+    partitions = []     # [names, [rows_text, ...], nrows]
+    for i, (start, stop) in enumerate(headers):
+        end = headers[i + 1][0] if i + 1 < len(headers) else len(text)
+        m = _ROWS.search(text, stop, end)
+        if not m:
+            continue
+        rows = m.group(0)
+        names = text[start:stop].split()[1:]
+        first_index = rows.split(None, 1)[0]
+
+        if partitions and partitions[-1][0] == names and first_index != "0":
+            partitions[-1][1].append(rows)
+            partitions[-1][2] += rows.count("\n") + 1
+        else:
+            partitions.append([names, [rows], rows.count("\n") + 1])
+
+    if not partitions:
+        raise PlotDataError("No data rows found in ngspice output")
+
+    nrows = partitions[0][2]
+    for p in partitions:
+        if p[2] != nrows:
+            raise PlotDataError(
+                "Partitions have different lengths (%d != %d)"
+                % (p[2], nrows))
+
+    scale_name = partitions[0][0][0]
+    is_complex = "," in partitions[0][1][0].split("\n", 1)[0]
+
+    # Every partition repeats the scale; drop it (and "v-sweep", which DC
+    # dumps print as a copy of the scale). ngspice truncates long names in
+    # the header, so other repeats are different vectors: keep them as
+    # "name#2", "name#3", ...
+    layout = []
+    names = []
+    taken = set()
+    for p_names, pages, _ in partitions:
+        keep = [k for k, n in enumerate(p_names[1:], 1)
+                if n != scale_name and n != "v-sweep"]
+        layout.append((p_names, pages, keep))
+        for k in keep:
+            name = p_names[k]
+            copy = 1
+            while name in taken:
+                copy += 1
+                name = "%s#%d" % (p_names[k], copy)
+            taken.add(name)
+            names.append(name)
+
+    data = np.empty((nrows, 1 + len(names)),
+                    dtype=np.complex128 if is_complex else np.float64,
+                    order="F")
+
+    col = 1
+    for p_names, pages, keep in layout:
+        row = 0
+        for rows in pages:
+            vals = _page_values(rows, 1 + len(p_names))
+            n = vals.shape[0]
+            if vals.shape[1] == 1 + len(p_names):
+                # real: index, scale, v1, v2, ...
+                if col == 1:
+                    data[row:row + n, 0] = vals[:, 1]
+                data[row:row + n, col:col + len(keep)] = \
+                    vals[:, [k + 1 for k in keep]]
+            else:
+                # complex: index, scale_re, scale_im, v1_re, v1_im, ...
+                re_ = vals[:, 1::2]
+                im_ = vals[:, 2::2]
+                if col == 1:
+                    data[row:row + n, 0] = re_[:, 0] + 1j * im_[:, 0]
+                data[row:row + n, col:col + len(keep)] = \
+                    re_[:, keep] + 1j * im_[:, keep]
+            row += n
+        col += len(keep)
+
+    return scale_name, names, data
+
+
+def read_print_file(path):
+    """Read one ``print`` dump into a :class:`PlotData`."""
+    with open(path) as f:
+        text = f.read()
+    scale_name, names, data = parse_print_output(text)
+    return PlotData(scale_name, names, data)
+
+
+# ----------------------------------------------------------------------
+# Rawfiles
+# ----------------------------------------------------------------------
+def _read_raw_header(f):
+    """
+    Read one plot header; returns (header, variables, data_kind) with the
+    file positioned at the start of the data section, or None at EOF.
+    """
+    header = {}
+    variables = []
+    nvars = None
+    while True:
+        line = f.readline()
+        if not line:
+            return None
+        text = line.decode("latin-1").rstrip("\r\n")
+        if not text.strip():
+            continue
+        key, _, value = text.partition(":")
+        key = key.strip().lower()
+        value = value.strip()
+
+        if key == "variables":
+            if nvars is None:
+                raise PlotDataError(
+                    "Rawfile lists variables before their count")
+            lines = [value] if value else []
+            while len(lines) < nvars:
+                more = f.readline()
+                if not more:
+                    raise PlotDataError(
+                        "Rawfile ends inside the variable list")
+                lines.append(more.decode("latin-1").strip())
+            for entry in lines:
+                parts = entry.split()
+                # "<index> <name> <type> [dims=...]"
+                kind = parts[2] if len(parts) > 2 else ""
+                variables.append((parts[1], kind))
+        elif key in ("binary", "values"):
+            return header, variables, key
+        else:
+            header[key] = value
+            if key == "no. variables":
+                nvars = int(value)
+
+
+def _raw_plot(path, f, size):
+    """Read one plot starting at f's position -> (PlotData, next_offset)."""
+    parsed = _read_raw_header(f)
+    if parsed is None:
+        return None, size
+    header, variables, kind = parsed
+
+    nvars = len(variables)
+    npoints = int(header.get("no. points", "0"))
+    is_complex = "complex" in header.get("flags", "").lower()
+    start = f.tell()
+
+    if kind == "binary":
+        dtype = np.dtype("<c16" if is_complex else "<f8")
+        stride = nvars * dtype.itemsize
+        available = (size - start) // stride if stride else 0
+        # an interrupted run leaves fewer points than the header promises
+        npoints = min(npoints, available)
+        if npoints > 0:
+            data = np.memmap(path, dtype=dtype, mode="r", offset=start,
+                             shape=(npoints, nvars))
+        else:
+            data = np.empty((0, nvars), dtype=dtype)
+        next_offset = start + npoints * stride
+    else:
+        # ASCII: "<point> <value>" then one "<value>" line per variable,
+        # complex values as "re,im"; the section ends at the next plot
+        rest = f.read().decode("latin-1")
+        end = rest.find("\nTitle:")
+        chunk = rest if end == -1 else rest[:end]
+        next_offset = size if end == -1 else start + len(
+            rest[:end + 1].encode("latin-1"))
+
+        flat = np.fromstring(chunk.replace(",", " "), sep=" ")
+        width = 1 + nvars * (2 if is_complex else 1)
+        npoints = min(npoints, flat.size // width) if npoints else \
+            flat.size // width
+        vals = flat[:npoints * width].reshape(npoints, width)[:, 1:]
+        if is_complex:
+            data = vals[:, 0::2] + 1j * vals[:, 1::2]
+        else:
+            data = vals
+
+    names = [n for n, _ in variables]
+    kinds = [k.lower() for _, k in variables]
+
+    # voltages first, then currents (what the plot window expects); only
+    # reorder (and so copy) if the rawfile interleaves them
+    order = [0] + [k for k in range(1, nvars) if kinds[k] != "current"] + \
+        [k for k in range(1, nvars) if kinds[k] == "current"]
+    if order != list(range(nvars)):
+        data = data[:, order]
+    volts_length = sum(1 for k in kinds[1:] if k != "current")
+
+    plot = PlotData(names[0], [names[k] for k in order[1:]], data,
+                    volts_length=volts_length,
+                    plotname=header.get("plotname", ""))
+    return plot, next_offset
+
+
+def read_raw_file(path):
+    """Read every plot of an ngspice rawfile (binary or ASCII)."""
+    plots = []
+    size = os.path.getsize(path)
+    offset = 0
+    with open(path, "rb") as f:
+        while offset < size:
+            f.seek(offset)
+            plot, offset = _raw_plot(path, f, size)
+            if plot is not None:
+                plots.append(plot)
+    if not plots:
+        raise PlotDataError("No plots found in rawfile %s" % path)
+    return plots
+
+
+# analysisType (0 AC / 1 transient / 2 DC) -> word in the rawfile Plotname
+_PLOTNAMES = {0: "ac", 1: "transient", 2: "dc"}
+
+
+def pick_plot(plots, analysis_type=None):
+    """The last plot of the requested analysis (else the last plot)."""
+    word = _PLOTNAMES.get(analysis_type)
+    if word:
+        for plot in reversed(plots):
+            if word in plot.plotname.lower().split():
+                return plot
+    return plots[-1]
+
+
+def load_simulation(fpath, project_name=None, analysis_type=None):
+    """
+    Results of the last simulation of a project: the ``<project>.raw``
+    rawfile when it is up to date, else the ``print`` text dumps.
+    """
+    if project_name:
+        raw = os.path.join(fpath, project_name + ".raw")
+        netlist = os.path.join(fpath, project_name + ".cir.out")
+        if os.path.exists(raw) and (
+                not os.path.exists(netlist) or
+                os.path.getmtime(raw) >= os.path.getmtime(netlist)):
+            try:
+                return pick_plot(read_raw_file(raw), analysis_type)
+            except (PlotDataError, ValueError, IndexError) as e:
+                print("Unable to read rawfile, using text dumps:", str(e))
+    return read_print_dumps(fpath)
+
+
+def read_print_dumps(fpath, volts="plot_data_v.txt", amps="plot_data_i.txt"):
+    """
+    Load both text dumps of a project directory; the current dump is
+    optional (circuits without voltage sources have no branches).
+    """
+    v = read_print_file(os.path.join(fpath, volts))
+    i_path = os.path.join(fpath, amps)
+    i = read_print_file(i_path) if os.path.exists(i_path) else None
+    return PlotData.merge(v, i)
+
+
+# ----------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------
+def _synthetic_dump(path, nrows, nvec, per_page=55, per_partition=3):
+    """Write a paginated, partitioned dump shaped like ngspice's output."""
+    names = ["v(n%d)" % k for k in range(nvec)]
+    t = np.linspace(0.0, 1e-3, nrows)
+    with open(path, "w") as f:
+        for start in range(0, nvec, per_partition):
+            cols = names[start:start + per_partition]
+            header = "Index   time            " + "".join(
+                "%-16s" % c for c in cols)
+            for p0 in range(0, nrows, per_page):
+                f.write("\n* synthetic\nTransient Analysis  bench\n")
+                f.write("-" * 80 + "\n" + header + "\n" + "-" * 80 + "\n")
+                for r in range(p0, min(p0 + per_page, nrows)):
+                    vals = "\t".join(
+                        "%e" % np.sin(t[r] * 1e4 * (start + c + 1))
+                        for c in range(len(cols)))
+                    f.write("%d\t%e\t%s\t\n" % (r, t[r], vals))
+                f.write("\f\n")
+    return names
+
+
+def benchmark(nrows=200000, nvec=8):
+    import tempfile
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "plot_data_v.txt")
+        names = _synthetic_dump(path, nrows, nvec)
+        size_mb = os.path.getsize(path) / 1e6
+
+        t0 = time.perf_counter()
+        pd = read_print_file(path)
+        dt = time.perf_counter() - t0
+
+    assert pd.names == names and len(pd) == nrows
+    print("%d rows x %d vectors, %.1f MB text: %.3f s (%.1f MB/s), "
+          "matrix %.1f MB" % (nrows, nvec, size_mb, dt, size_mb / dt,
+                              pd.data.nbytes / 1e6))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        benchmark(*[int(a) for a in sys.argv[2:4]])
+    else:
+        print("Usage: python plotData.py bench [rows] [vectors]")
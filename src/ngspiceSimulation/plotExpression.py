@@ -0,0 +1,322 @@
+"""
+Expressions for the plotter's "Plot Function" box.
+
+An expression is compiled once into a small tree and evaluated over whole
+NumPy columns of the loaded :class:`plotData.PlotData`, so a 1M-point
+transient costs a handful of array operations instead of one ``eval()`` per
+sample. Only the grammar below is accepted; there is no access to Python::
+
+    plot    := expr [ "vs" expr ]
+    expr    := term { ("+" | "-") term }
+    term    := unary { ("*" | "/") unary }
+    unary   := ("-" | "+") unary | power
+    power   := atom [ ("^" | "**") unary ]
+    atom    := number | vector | func "(" expr ")" | "(" expr ")"
+
+Vectors are the node / branch names shown in the plot window (names such as
+``net-_r1-pad1_`` or ``v1#branch`` are matched as a whole). Numbers accept
+SPICE suffixes (``1k``, ``2.2u``, ``10meg``). ``a vs b`` plots b against a,
+like the old syntax.
+"""
+import re
+
+import numpy as np
+
+
+class ExpressionError(ValueError):
+    """Raised for expressions that cannot be compiled or evaluated."""
+
+
+def _integral(y, x):
+    """Cumulative trapezoidal integral of y over x (starts at 0)."""
+    out = np.empty_like(y)
+    if len(y):
+        out[0] = 0
+        np.cumsum((y[1:] + y[:-1]) * 0.5 * np.diff(x), out=out[1:])
+    return out
+
+
+def _derivative(y, x):
+    if len(y) < 2:
+        raise ExpressionError("deriv() needs at least two points")
+    return np.gradient(y, x)
+
+
+# name -> (function(values, x), description); x is the scale column
+FUNCTIONS = {
+    "abs": (lambda v, x: np.abs(v), "magnitude"),
+    "mag": (lambda v, x: np.abs(v), "magnitude"),
+    "db": (lambda v, x: 20.0 * np.log10(np.abs(v)), "20*log10(|v|)"),
+    "phase": (lambda v, x: np.angle(v, deg=True), "phase in degrees"),
+    "real": (lambda v, x: np.real(v), "real part"),
+    "imag": (lambda v, x: np.imag(v), "imaginary part"),
+    "sqrt": (lambda v, x: np.sqrt(v), "square root"),
+    "exp": (lambda v, x: np.exp(v), "e^v"),
+    "ln": (lambda v, x: np.log(v), "natural log"),
+    "log10": (lambda v, x: np.log10(v), "base-10 log"),
+    "deriv": (lambda v, x: _derivative(v, x), "d/dx"),
+    "integ": (lambda v, x: _integral(v, x), "running integral over x"),
+}
+
+_SUFFIXES = {
+    "t": 1e12, "g": 1e9, "meg": 1e6, "k": 1e3, "mil": 25.4e-6,
+    "m": 1e-3, "u": 1e-6, "n": 1e-9, "p": 1e-12, "f": 1e-15,
+}
+_NUMBER = re.compile(
+    r"(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?(meg|mil|[tgkmunpf])?",
+    re.IGNORECASE)
+_WORD = re.compile(r"[A-Za-z_]\w*")
+
+
+def parse_spice_number(text):
+    """'2.2u' -> 2.2e-06; trailing units are ignored like ngspice does."""
+    text = str(text).strip()
+    sign = -1.0 if text.startswith("-") else 1.0
+    m = _NUMBER.match(text.lstrip("+-"))
+    if not m:
+        raise ExpressionError("'%s' is not a number" % text)
+    value = float(m.group(1) + (m.group(2) or ""))
+    if m.group(3):
+        value *= _SUFFIXES[m.group(3).lower()]
+    return sign * value
+
+
+_OPERATORS = ("**", "+", "-", "*", "/", "^", "(", ")")
+
+
+def _tokenize(text, names):
+    """
+    Split into (kind, value) tokens. Vector names are matched longest
+    first so names containing '-', '#', '(' ... stay one token.
+    """
+    by_length = sorted(names, key=len, reverse=True)
+    tokens = []
+    pos = 0
+    n = len(text)
+    while pos < n:
+        ch = text[pos]
+        if ch.isspace():
+            pos += 1
+            continue
+
+        # a function call wins over a vector of the same name
+        m = _WORD.match(text, pos)
+        if m:
+            word = m.group(0)
+            rest = text[m.end():].lstrip()
+            if word.lower() in FUNCTIONS and rest.startswith("("):
+                tokens.append(("func", word.lower()))
+                pos = m.end()
+                continue
+            if word.lower() == "vs" and word not in names:
+                tokens.append(("vs", word))
+                pos = m.end()
+                continue
+
+        for name in by_length:
+            end = pos + len(name)
+            if text.startswith(name, pos) and (
+                    end == n or not (text[end].isalnum() or text[end] == "_")
+                    or not (name[-1].isalnum() or name[-1] == "_")):
+                tokens.append(("name", name))
+                pos = end
+                break
+        else:
+            m = _NUMBER.match(text, pos)
+            if m and not (m.group(3) is None and m.end() < n and
+                          (text[m.end()].isalpha() or text[m.end()] == "_")):
+                value = float(m.group(1) + (m.group(2) or ""))
+                if m.group(3):
+                    value *= _SUFFIXES[m.group(3).lower()]
+                tokens.append(("num", value))
+                pos = m.end()
+                continue
+
+            for op in _OPERATORS:
+                if text.startswith(op, pos):
+                    tokens.append(("op", "^" if op == "**" else op))
+                    pos += len(op)
+                    break
+            else:
+                word = _WORD.match(text, pos)
+                bad = word.group(0) if word else ch
+                raise ExpressionError(
+                    "'%s' is not a node, branch, number or operator" % bad)
+    return tokens
+
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.i = 0
+
+    def peek(self):
+        if self.i < len(self.tokens):
+            return self.tokens[self.i]
+        return (None, None)
+
+    def take(self):
+        tok = self.peek()
+        self.i += 1
+        return tok
+
+    def expect(self, value):
+        kind, v = self.take()
+        if v != value:
+            raise ExpressionError("Expected '%s'" % value)
+
+    def plot(self):
+        y = self.expr()
+        x = None
+        if self.peek()[0] == "vs":
+            self.take()
+            x, y = y, self.expr()
+        if self.peek()[0] is not None:
+            raise ExpressionError("Unexpected '%s'" % self.peek()[1])
+        return x, y
+
+    def expr(self):
+        node = self.term()
+        while self.peek() in (("op", "+"), ("op", "-")):
+            node = ("bin", self.take()[1], node, self.term())
+        return node
+
+    def term(self):
+        node = self.unary()
+        while self.peek() in (("op", "*"), ("op", "/")):
+            node = ("bin", self.take()[1], node, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek() in (("op", "-"), ("op", "+")):
+            op = self.take()[1]
+            node = self.unary()
+            return ("neg", node) if op == "-" else node
+        return self.power()
+
+    def power(self):
+        node = self.atom()
+        if self.peek() == ("op", "^"):
+            self.take()
+            node = ("bin", "^", node, self.unary())
+        return node
+
+    def atom(self):
+        kind, value = self.take()
+        if kind == "num":
+            return ("num", value)
+        if kind == "name":
+            return ("name", value)
+        if kind == "func":
+            self.expect("(")
+            arg = self.expr()
+            self.expect(")")
+            return ("func", value, arg)
+        if (kind, value) == ("op", "("):
+            node = self.expr()
+            self.expect(")")
+            return node
+        if kind is None:
+            raise ExpressionError("Expression ends too early")
+        raise ExpressionError("Unexpected '%s'" % value)
+
+
+_BINARY = {
+    "+": np.add,
+    "-": np.subtract,
+    "*": np.multiply,
+    "/": np.true_divide,
+    "^": np.power,
+}
+
+
+def _format(node):
+    """Source text of a tree (nested operations in parentheses)."""
+    kind = node[0]
+    if kind == "num":
+        return "%g" % node[1]
+    if kind == "name":
+        return node[1]
+    if kind == "func":
+        return "%s(%s)" % (node[1], _format(node[2]))
+
+    def operand(child):
+        text = _format(child)
+        return "(%s)" % text if child[0] in ("bin", "neg") else text
+
+    if kind == "neg":
+        return "-" + operand(node[1])
+    return "%s %s %s" % (operand(node[2]), node[1], operand(node[3]))
+
+
+def _names(node):
+    if node is None:
+        return set()
+    if node[0] == "name":
+        return {node[1]}
+    return set().union(*(_names(n) for n in node[1:] if isinstance(n, tuple)))
+
+
+class PlotExpression:
+    """A compiled "Plot Function" expression."""
+
+    def __init__(self, text, names):
+        self.text = text
+        tokens = _tokenize(text, names)
+        if not tokens:
+            raise ExpressionError("Enter an expression")
+        self.x_tree, self.y_tree = _Parser(tokens).plot()
+        self.names = _names(self.x_tree) | _names(self.y_tree)
+        if not self.names:
+            raise ExpressionError("Use at least one node or branch")
+
+    @property
+    def has_vs(self):
+        return self.x_tree is not None
+
+    @property
+    def x_text(self):
+        """The operand before ``vs`` (None without ``vs``), for the axis."""
+        return None if self.x_tree is None else _format(self.x_tree)
+
+    @property
+    def y_text(self):
+        return _format(self.y_tree)
+
+    def _eval(self, node, dataset, scale):
+        kind = node[0]
+        if kind == "num":
+            return node[1]
+        if kind == "name":
+            return dataset.column(node[1])
+        if kind == "neg":
+            return np.negative(self._eval(node[1], dataset, scale))
+        if kind == "bin":
+            return _BINARY[node[1]](self._eval(node[2], dataset, scale),
+                                    self._eval(node[3], dataset, scale))
+        if kind == "func":
+            return FUNCTIONS[node[1]][0](
+                self._eval(node[2], dataset, scale), scale)
+        raise ExpressionError("Bad expression")
+
+    def evaluate(self, dataset):
+        """
+        Returns (x, y) arrays ready to plot: x is the dataset scale unless
+        the expression used ``vs``; complex results are plotted by magnitude.
+        """
+        scale = dataset.x
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            y = self._eval(self.y_tree, dataset, scale)
+            x = scale if self.x_tree is None else \
+                self._eval(self.x_tree, dataset, scale)
+
+        x = np.broadcast_to(np.abs(x) if np.iscomplexobj(x) else x,
+                            scale.shape)
+        y = np.broadcast_to(np.abs(y) if np.iscomplexobj(y) else y,
+                            scale.shape)
+        return x, y
+
+
+def compile_expression(text, names):
+    """Compile ``text`` against the vector ``names`` of a dataset."""
+    return PlotExpression(text, names)
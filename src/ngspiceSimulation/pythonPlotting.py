@@ -2,7 +2,7 @@ from __future__ import division  # Used for decimal division
 # eg: 2/3=0.66 and not '0' 6/2=3.0 and 6//2=3
 import os
 from PyQt5 import QtGui, QtCore, QtWidgets
-from decimal import Decimal, getcontext
+from decimal import getcontext
 from matplotlib.backends.backend_qt5agg\
     import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg\
@@ -11,6 +11,11 @@ from matplotlib.figure import Figure
 from configuration.Appconfig import Appconfig
 import numpy as np
 
+from .decimation import LODAxes
+from . import resultCache
+from .plotData import load_simulation, pick_plot
+from .plotExpression import compile_expression, ExpressionError, FUNCTIONS
+
 
 # This class creates Python Plotting window
 class plotWindow(QtWidgets.QMainWindow):
@@ -31,9 +36,6 @@ class plotWindow(QtWidgets.QMainWindow):
             'Ngspice simulation is called : ' + self.fpath)
         self.obj_appconfig.print_info(
             'PythonPlotting is called : ' + self.fpath)
-        self.combo = []
-        self.combo1 = []
-        self.combo1_rev = []
         # Creating Frame
         self.createMainFrame()
 
@@ -45,6 +47,9 @@ class plotWindow(QtWidgets.QMainWindow):
         self.canvas = FigureCanvas(self.fig)
         self.canvas.setParent(self.mainFrame)
         self.axes = self.fig.add_subplot(111)
+        # traces are drawn decimated to the visible range and kept as
+        # artists, so zoom/pan only updates their data
+        self.lod = LODAxes(self.axes, self.canvas)
         self.navToolBar = NavigationToolbar(self.canvas, self.mainFrame)
 
         # LeftVbox hold navigation tool bar and canvas
@@ -60,7 +65,7 @@ class plotWindow(QtWidgets.QMainWindow):
 
         # Get DataExtraction Details
         self.obj_dataext = DataExtraction()
-        self.plotType = self.obj_dataext.openFile(self.fpath)
+        self.plotType = self.obj_dataext.openFile(self.fpath, self.projectName)
 
         self.obj_dataext.computeAxes()
         self.a = self.obj_dataext.numVals()
@@ -184,11 +189,14 @@ class plotWindow(QtWidgets.QMainWindow):
         self.funcName.setText(
             "<font color='indigo'>Standard functions</font>\
                 <br><br>Addition:<br>Subtraction:<br>\
-                Multiplication:<br>Division:<br>Comparison:"
+                Multiplication:<br>Division:<br>Power:<br>Comparison:\
+                <br>Functions:"
         )
         self.funcExample.setText(
             "\n\nNode1 + Node2\nNode1 - Node2\nNode1 * Node2\nNode1 / Node2\
-                \nNode1 vs Node2")
+                \nNode1 ^ 2\nNode1 vs Node2\ndb(Node1), deriv(Node1)")
+        self.funcExample.setToolTip(
+            "Functions: " + ", ".join(sorted(FUNCTIONS)))
 
         # Connecting to plot and clear function
         self.clear.clicked.connect(self.pushedClear)
@@ -216,273 +224,105 @@ class plotWindow(QtWidgets.QMainWindow):
     # definition of functions pushedClear, pushedPlotFunc.
     def pushedClear(self):
         self.text.clear()
-        self.axes.cla()
+        self.lod.clear()
         self.canvas.draw()
 
     def pushedPlotFunc(self):
-        self.parts = str(self.text.text())
-        self.parts = self.parts.split(" ")
-
-        if self.parts[len(self.parts) - 1] == '':
-            self.parts = self.parts[0:-1]
-
-        self.values = self.parts
-        self.comboAll = []
-        self.axes.cla()
-
-        self.plotType2 = self.obj_dataext.openFile(self.fpath)
-
-        if len(self.parts) <= 2:
-            self.warnning.setText("Too few arguments!\nRefer syntax below!")
-            QtWidgets.QMessageBox.about(
-                self, "Warning!!", "Too Few Arguments/SYNTAX Error!\
-                    \n Refer Examples")
-            return
-        else:
-            self.warnning.setText("")
-
-        a = []
-        finalResult = []
-        # p = 0
-
-        for i in range(len(self.parts)):
-            if i % 2 == 0:
-                for j in range(len(self.obj_dataext.NBList)):
-                    if self.parts[i] == self.obj_dataext.NBList[j]:
-                        a.append(j)
-
-        if len(a) != len(self.parts) // 2 + 1:
-            QtWidgets.QMessageBox.about(
-                self, "Warning!!",
-                "One of the operands doesn't belong to "
-                "the above list of Nodes!!"
-            )
-            return
-
-        for i in a:
-            self.comboAll.append(self.obj_dataext.y[i])
+        text = str(self.text.text()).strip()
+        self.lod.clear()
 
-        for i in range(len(a)):
-
-            if a[i] == len(self.obj_dataext.NBList):
-                QtWidgets.QMessageBox.about(
-                    self, "Warning!!", "One of the operands doesn't belong " +
-                    "to the above list!!"
-                )
-                self.warnning.setText(
-                    "<font color='red'>To Err Is Human!<br>One of the " +
-                    "operands doesn't belong to the above list!!</font>"
-                )
-                return
-
-        if self.parts[1] == 'vs':
-            if len(self.parts) > 3:
-                self.warnning.setText("Enter two operands only!!")
-                QtWidgets.QMessageBox.about(
-                    self, "Warning!!", "Recheck the expression syntax!"
-                )
-                return
-            else:
-                self.axes.cla()
-
-                for i in range(len(self.obj_dataext.y[a[0]])):
-                    self.combo.append(self.obj_dataext.y[a[0]][i])
-                    self.combo1.append(self.obj_dataext.y[a[1]][i])
-
-                self.axes.plot(
-                    self.combo,
-                    self.combo1,
-                    c=self.color[1],
-                    label=str(2))  # _rev
-
-                if max(a) < self.volts_length:
-                    self.axes.set_ylabel('Voltage(V)-->')
-                    self.axes.set_xlabel('Voltage(V)-->')
-                else:
-                    self.axes.set_ylabel('Current(I)-->')
-                    self.axes.set_ylabel('Current(I)-->')
-
-        elif max(a) >= self.volts_length and min(a) < self.volts_length:
+        try:
+            expr = compile_expression(text, self.obj_dataext.NBList)
+            # evaluated once over whole columns of the already loaded data
+            xdata, ydata = expr.evaluate(self.obj_dataext.dataset)
+        except ExpressionError as e:
+            self.warnning.setText(
+                "<font color='red'>" + str(e) +
+                "<br>Refer syntax below!</font>")
             QtWidgets.QMessageBox.about(
-                self, "Warning!!", "Do not combine Voltage and Current!!"
-            )
+                self, "Warning!!", str(e) + "\nRefer Examples")
+            self.canvas.draw()
             return
 
+        if np.isfinite(ydata).all():
+            self.warnning.setText("")
         else:
-            for j in range(len(self.comboAll[0])):
-                for i in range(len(self.values)):
-                    if i % 2 == 0:
-                        self.values[i] = str(self.comboAll[i // 2][j])
-                        re = " ".join(self.values[:])
-                try:
-                    finalResult.append(eval(re))
-                except ArithmeticError:
-                    QtWidgets.QMessageBox.about(
-                        self, "Warning!!", "Dividing by zero!!"
-                    )
-                    return
-
-            if self.plotType2[0] == 0:
-                # self.setWindowTitle('AC Analysis')
-                if self.plotType2[1] == 1:
-                    self.axes.semilogx(
-                        self.obj_dataext.x,
-                        finalResult,
-                        c=self.color[0],
-                        label=str(1))
-                else:
-                    self.axes.plot(
-                        self.obj_dataext.x,
-                        finalResult,
-                        c=self.color[0],
-                        label=str(1))
+            self.warnning.setText(
+                "<font color='red'>Some points are undefined<br>"
+                "(e.g. division by zero)</font>")
+
+        volts = set(self.obj_dataext.NBList[:self.volts_length])
+        if expr.names <= volts:
+            ylabel = 'Voltage(V)-->'
+        elif not expr.names & volts:
+            ylabel = 'Current(I)-->'
+        else:
+            ylabel = expr.y_text + '-->'
 
+        if expr.has_vs:
+            self.lod.set_trace("func", xdata, ydata,
+                               c=self.color[1], label=str(2))
+            self.axes.set_xlabel(expr.x_text + '-->')
+        else:
+            self.lod.set_trace("func", xdata, ydata,
+                               c=self.color[0], label=str(1))
+            if self.plotType[0] == 0:
+                if self.plotType[1] == 1:
+                    self.axes.set_xscale('log')
                 self.axes.set_xlabel('freq-->')
-
-                if max(a) < self.volts_length:
-                    self.axes.set_ylabel('Voltage(V)-->')
-                else:
-                    self.axes.set_ylabel('Current(I)-->')
-
-            elif self.plotType2[0] == 1:
-                # self.setWindowTitle('Transient Analysis')
-                self.axes.plot(
-                    self.obj_dataext.x,
-                    finalResult,
-                    c=self.color[0],
-                    label=str(1))
+            elif self.plotType[0] == 1:
                 self.axes.set_xlabel('time-->')
-                if max(a) < self.volts_length:
-                    self.axes.set_ylabel('Voltage(V)-->')
-                else:
-                    self.axes.set_ylabel('Current(I)-->')
-
             else:
-                # self.setWindowTitle('DC Analysis')
-                self.axes.plot(
-                    self.obj_dataext.x,
-                    finalResult,
-                    c=self.color[0],
-                    label=str(1))
                 self.axes.set_xlabel('I/P Voltage-->')
-                if max(a) < self.volts_length:
-                    self.axes.set_ylabel('Voltage(V)-->')
-                else:
-                    self.axes.set_ylabel('Current(I)-->')
-
+        self.axes.set_ylabel(ylabel)
         self.axes.grid(True)
-        self.canvas.draw()
-        self.combo = []
-        self.combo1 = []
-        self.combo1_rev = []
+        self.lod.fit()
 
     # definition of functions onPush_decade, onPush_ac, onPush_trans,\
     # onPush_dc, color and multimeter and getRMSValue.
-    def onPush_decade(self):
-        boxCheck = 0
-        self.axes.cla()
-
-        for i, j in zip(self.chkbox, list(range(len(self.chkbox)))):
-            if i.isChecked():
-                boxCheck += 1
-                self.axes.semilogx(
-                    self.obj_dataext.x,
-                    self.obj_dataext.y[j],
-                    c=self.color[j],
-                    label=str(
-                        j + 1))
-                self.axes.set_xlabel('freq-->')
-                if j < self.volts_length:
-                    self.axes.set_ylabel('Voltage(V)-->')
-                else:
-                    self.axes.set_ylabel('Current(I)-->')
-
-                self.axes.grid(True)
-        if boxCheck == 0:
+    def plotChecked(self, xlabel, logx=False, warning=None):
+        """
+        Shows the checked nodes/branches. Traces already on the axes keep
+        their artists; unchecked ones are removed and new ones added.
+        """
+        checked = [j for j, box in enumerate(self.chkbox) if box.isChecked()]
+        if not checked:
             QtWidgets.QMessageBox.about(
-                self, "Warning!!", "Please select at least one Node OR Branch"
+                self, "Warning!!",
+                warning or "Please select at least one Node OR Branch"
             )
             return
 
-        self.canvas.draw()
+        if "func" in self.lod.traces:
+            # a Plot Function result is on screen, start over
+            self.lod.clear()
+        self.lod.keep_only(checked)
+        for j in checked:
+            self.lod.set_trace(
+                j, self.obj_dataext.x, self.obj_dataext.y[j],
+                c=self.color[j], label=str(j + 1))
+
+        self.axes.set_xscale('log' if logx else 'linear')
+        self.axes.set_xlabel(xlabel)
+        if checked[-1] < self.volts_length:
+            self.axes.set_ylabel('Voltage(V)-->')
+        else:
+            self.axes.set_ylabel('Current(I)-->')
+        self.axes.grid(True)
+        self.lod.fit()
 
-    def onPush_ac(self):
-        self.axes.cla()
-        boxCheck = 0
-        for i, j in zip(self.chkbox, list(range(len(self.chkbox)))):
-            if i.isChecked():
-                boxCheck += 1
-                self.axes.plot(
-                    self.obj_dataext.x,
-                    self.obj_dataext.y[j],
-                    c=self.color[j],
-                    label=str(
-                        j + 1))
-                self.axes.set_xlabel('freq-->')
-                if j < self.volts_length:
-                    self.axes.set_ylabel('Voltage(V)-->')
-                else:
-                    self.axes.set_ylabel('Current(I)-->')
-                self.axes.grid(True)
-        if boxCheck == 0:
-            QtWidgets.QMessageBox.about(
-                self, "Warning!!", "Please select at least one Node OR Branch"
-            )
-            return
+    def onPush_decade(self):
+        self.plotChecked('freq-->', logx=True)
 
-        self.canvas.draw()
+    def onPush_ac(self):
+        self.plotChecked('freq-->')
 
     def onPush_trans(self):
-        self.axes.cla()
-        boxCheck = 0
-        for i, j in zip(self.chkbox, list(range(len(self.chkbox)))):
-            if i.isChecked():
-                boxCheck += 1
-                self.axes.plot(
-                    self.obj_dataext.x,
-                    self.obj_dataext.y[j],
-                    c=self.color[j],
-                    label=str(
-                        j + 1))
-                self.axes.set_xlabel('time-->')
-                if j < self.volts_length:
-                    self.axes.set_ylabel('Voltage(V)-->')
-                else:
-                    self.axes.set_ylabel('Current(I)-->')
-                self.axes.grid(True)
-        if boxCheck == 0:
-            QtWidgets.QMessageBox.about(
-                self, "Warning!!", "Please select at least one Node OR Branch"
-            )
-            return
-        self.canvas.draw()
+        self.plotChecked('time-->')
 
     def onPush_dc(self):
-        boxCheck = 0
-        self.axes.cla()
-        for i, j in zip(self.chkbox, list(range(len(self.chkbox)))):
-            if i.isChecked():
-                boxCheck += 1
-                self.axes.plot(
-                    self.obj_dataext.x,
-                    self.obj_dataext.y[j],
-                    c=self.color[j],
-                    label=str(
-                        j + 1))
-                self.axes.set_xlabel('Voltage Sweep(V)-->')
-
-                if j < self.volts_length:
-                    self.axes.set_ylabel('Voltage(V)-->')
-                else:
-                    self.axes.set_ylabel('Current(I)-->')
-                self.axes.grid(True)
-        if boxCheck == 0:
-            QtWidgets.QMessageBox.about(
-                self, "Warning!!", "Please select atleast one Node OR Branch"
-            )
-            return
-
-        self.canvas.draw()
+        self.plotChecked('Voltage Sweep(V)-->',
+                         warning="Please select atleast one Node OR Branch")
 
     def colorName(self, letter):
         return {
@@ -564,107 +404,51 @@ class MultimeterWidgetClass(QtWidgets.QWidget):
 
 
 class DataExtraction:
+    """
+    Loads the simulation results of a project (the ``.raw`` rawfile, or
+    the ``print`` text dumps when there is none) into a :class:`PlotData`
+    and exposes them the way the plot window expects:
+
+    - ``x``: scale column (time / frequency / sweep)
+    - ``y[k]``: column of ``NBList[k]`` (magnitude for AC results)
+    - ``NBList``: voltage nodes followed by branch currents (``NBIList``)
+    """
+
     def __init__(self):
         self.obj_appconfig = Appconfig()
-        self.data = []
+        self.dataset = None
         # consists of all the columns of data belonging to nodes and branches
         self.y = []  # stores y-axis data
         self.x = []  # stores x-axis data
+        self.NBList = []
+        self.NBIList = []
+        self.volts_length = 0
 
-    def numberFinder(self, fpath):
-        # Opening Analysis file
+    def readAnalysisType(self, fpath):
+        """Returns [analysisType, dec]: 0 AC / 1 transient / 2 DC."""
         with open(os.path.join(fpath, "analysis")) as f3:
             self.analysisInfo = f3.read()
         self.analysisInfo = self.analysisInfo.split(" ")
 
-        # Reading data file for voltage
-        with open(os.path.join(fpath, "plot_data_v.txt")) as f2:
-            self.voltData = f2.read()
-
-        self.voltData = self.voltData.split("\n")
-
-        # Initializing variable
-        # 'p' gives no. of lines of data for each node/branch
-        # 'npv' gives the no of partitions for a single voltage node
-        # 'vnumber' gives total number of voltage
-        # 'inumber' gives total number of current
-
-        p = npv = vnumber = inumber = 0
-
-        # Finding totla number of voltage node
-        for i in self.voltData[3:]:
-            # it has possible names of voltage nodes in NgSpice
-            if "Index" in i:  # "V(" in i or "x1" in i or "u3" in i:
-                vnumber += 1
-
-        # Reading Current Source Data
-        with open(os.path.join(fpath, "plot_data_i.txt")) as f1:
-            self.currentData = f1.read()
-        self.currentData = self.currentData.split("\n")
-
-        # Finding Number of Branch
-        for i in self.currentData[3:]:
-            if "#branch" in i:
-                inumber += 1
-
         self.dec = 0
-
-        # For AC
         if self.analysisInfo[0][-3:] == ".ac":
             self.analysisType = 0
             if "dec" in self.analysisInfo:
                 self.dec = 1
-
-            for i in self.voltData[3:]:
-                p += 1  # 'p' gives no. of lines of data for each node/branch
-                if "Index" in i:
-                    npv += 1
-                # 'npv' gives the no of partitions for a single voltage node
-                # print("npv:", npv)
-                if "AC" in i:  # DC for dc files and AC for ac ones
-                    break
-
         elif ".tran" in self.analysisInfo:
             self.analysisType = 1
-            for i in self.voltData[3:]:
-                p += 1
-                if "Index" in i:
-                    npv += 1
-                # 'npv' gives the no of partitions for a single voltage node
-                # print("npv:", npv)
-                if "Transient" in i:  # DC for dc files and AC for ac ones
-                    break
-
-        # For DC:
         else:
             self.analysisType = 2
-            for i in self.voltData[3:]:
-                p += 1
-                if "Index" in i:
-                    npv += 1
-                # 'npv' gives the no of partitions for a single voltage node
-                # print("npv:", npv)
-                if "DC" in i:  # DC for dc files and AC for ac ones
-                    break
 
-        vnumber = vnumber // npv  # vnumber gives the no of voltage nodes
-        inumber = inumber // npv  # inumber gives the no of branches
+        return [self.analysisType, self.dec]
 
-        p = [p, vnumber, self.analysisType, self.dec, inumber]
-
-        return p
-
-    def openFile(self, fpath):
+    def openFile(self, fpath, projectName=None):
         try:
-            with open(os.path.join(fpath, "plot_data_i.txt")) as f2:
-                alli = f2.read()
-
-            alli = alli.split("\n")
-            self.NBIList = []
-
-            with open(os.path.join(fpath, "plot_data_v.txt")) as f1:
-                allv = f1.read()
-
+            dec = self.readAnalysisType(fpath)
+            self.dataset = self.loadCached(fpath, projectName)
+            if self.dataset is None:
+                self.dataset = load_simulation(
+                    fpath, projectName, self.analysisType)
         except Exception as e:
             print("Exception Message : ", str(e))
             self.obj_appconfig.print_error('Exception Message :' + str(e))
@@ -673,138 +457,40 @@ class DataExtraction:
             self.msg.setWindowTitle("Error Message")
             self.msg.showMessage('Unable to open plot data files.')
             self.msg.exec_()
+            raise
 
-        try:
-            for l in alli[3].split(" "):
-                if len(l) > 0:
-                    self.NBIList.append(l)
-            self.NBIList = self.NBIList[2:]
-            len_NBIList = len(self.NBIList)
-        except Exception as e:
-            print("Exception Message : ", str(e))
-            self.obj_appconfig.print_error('Exception Message :' + str(e))
-            self.msg = QtWidgets.QErrorMessage()
-            self.msg.setModal(True)
-            self.msg.setWindowTitle("Error Message")
-            self.msg.showMessage('Unable to read Analysis File.')
-            self.msg.exec_()
-
-        d = self.numberFinder(fpath)
-        d1 = int(d[0] + 1)
-        d2 = int(d[1])
-        d3 = d[2]
-        d4 = d[4]
-
-        dec = [d3, d[3]]
-        self.NBList = []
-        allv = allv.split("\n")
-        for l in allv[3].split(" "):
-            if len(l) > 0:
-                self.NBList.append(l)
-        self.NBList = self.NBList[2:]
-        len_NBList = len(self.NBList)
+        self.volts_length = self.dataset.volts_length
+        self.NBList = list(self.dataset.names)
+        self.NBIList = self.NBList[self.volts_length:]
         print("NBLIST", self.NBList)
 
-        ivals = []
-        inum = len(allv[5].split("\t"))
-        inum_i = len(alli[5].split("\t"))
-
-        full_data = []
-
-        # Creating list of data:
-        if d3 < 3:
-            for i in range(1, d2):
-                for l in allv[3 + i * d1].split(" "):
-                    if len(l) > 0:
-                        self.NBList.append(l)
-                self.NBList.pop(len_NBList)
-                self.NBList.pop(len_NBList)
-                len_NBList = len(self.NBList)
-
-            for n in range(1, d4):
-                for l in alli[3 + n * d1].split(" "):
-                    if len(l) > 0:
-                        self.NBIList.append(l)
-                self.NBIList.pop(len_NBIList)
-                self.NBIList.pop(len_NBIList)
-                len_NBIList = len(self.NBIList)
-
-            p = 0
-            k = 0
-            m = 0
-
-            for i in alli[5:d1 - 1]:
-                if len(i.split("\t")) == inum_i:
-                    j2 = i.split("\t")
-                    j2.pop(0)
-                    j2.pop(0)
-                    j2.pop()
-                    if d3 == 0:  # not in trans
-                        j2.pop()
-
-                    for l in range(1, d4):
-                        j3 = alli[5 + l * d1 + k].split("\t")
-                        j3.pop(0)
-                        j3.pop(0)
-                        if d3 == 0:
-                            j3.pop()  # not required for dc
-                        j3.pop()
-                        j2 = j2 + j3
-
-                    full_data.append(j2)
-
-                k += 1
-
-            for i in allv[5:d1 - 1]:
-                if len(i.split("\t")) == inum:
-                    j = i.split("\t")
-                    j.pop()
-                    if d3 == 0:
-                        j.pop()
-                    for l in range(1, d2):
-                        j1 = allv[5 + l * d1 + p].split("\t")
-                        j1.pop(0)
-                        j1.pop(0)
-                        if d3 == 0:
-                            j1.pop()  # not required for dc
-                        if self.NBList[len(self.NBList) - 1] == 'v-sweep':
-                            self.NBList.pop()
-                            j1.pop()
-
-                        j1.pop()
-                        j = j + j1
-                    j = j + full_data[m]
-                    m += 1
-
-                    j = "\t".join(j[1:])
-                    j = j.replace(",", "")
-                    ivals.append(j)
-
-                p += 1
-
-            self.data = ivals
-
-        self.volts_length = len(self.NBList)
-        self.NBList = self.NBList + self.NBIList
-
         print(dec)
         return dec
 
+    def loadCached(self, fpath, projectName):
+        """Results of the current netlist from the simulation cache."""
+        if not (projectName and self.obj_appconfig.sim_cache):
+            return None
+        netlist = os.path.join(fpath, projectName + ".cir.out")
+        try:
+            plots = resultCache.lookup(
+                fpath, resultCache.netlist_key(netlist))
+        except OSError:
+            return None
+        if not plots:
+            return None
+        return pick_plot(plots, self.analysisType)
+
     def numVals(self):
         a = self.volts_length        # No of voltage nodes
-        b = len(self.data[0].split("\t"))
+        b = len(self.NBList) + 1     # x axis + one column per node/branch
         return [b, a]
 
     def computeAxes(self):
-        nums = len(self.data[0].split("\t"))
-        self.y = []
-        var = self.data[0].split("\t")
-        for i in range(1, nums):
-            self.y.append([Decimal(var[i])])
-        for i in self.data[1:]:
-            temp = i.split("\t")
-            for j in range(1, nums):
-                self.y[j - 1].append(Decimal(temp[j]))
-        for i in self.data:
-            temp = i.split("\t")
-            self.x.append(Decimal(temp[0]))
+        # Column views into the dataset: no per-sample conversion
+        self.x = self.dataset.x
+        data = self.dataset.data
+        if self.dataset.is_complex:
+            self.y = [np.abs(data[:, k]) for k in range(1, data.shape[1])]
+        else:
+            self.y = [data[:, k] for k in range(1, data.shape[1])]
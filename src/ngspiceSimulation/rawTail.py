@@ -0,0 +1,197 @@
+"""
+Follow an ngspice rawfile while the simulation is still writing it.
+
+In batch mode (``ngspice -b -r file.raw``) ngspice writes the plot header
+with ``No. Points: 0`` and then appends one binary row per accepted time
+step, patching the point count when the analysis ends. :class:`RawTail`
+reads whatever complete rows have been appended since the last poll and
+keeps the most recent ones in a fixed-size :class:`RingBuffer`, so memory
+stays bounded however long the run is.
+"""
+import os
+
+import numpy as np
+
+from .plotData import PlotDataError, _read_raw_header
+
+
+class RingBuffer:
+    """Fixed-capacity buffer of rows; the oldest rows are overwritten."""
+
+    def __init__(self, capacity, width, dtype=np.float64):
+        self.data = np.empty((max(1, capacity), width), dtype=dtype)
+        self.start = 0
+        self.count = 0
+        self.total = 0
+
+    @property
+    def capacity(self):
+        return len(self.data)
+
+    def extend(self, rows):
+        n = len(rows)
+        if not n:
+            return
+        cap = self.capacity
+        self.total += n
+        if n >= cap:
+            self.data[:] = rows[-cap:]
+            self.start = 0
+            self.count = cap
+            return
+
+        end = (self.start + self.count) % cap
+        first = min(n, cap - end)
+        self.data[end:end + first] = rows[:first]
+        self.data[:n - first] = rows[first:]
+
+        overflow = self.count + n - cap
+        if overflow > 0:
+            self.start = (self.start + overflow) % cap
+            self.count = cap
+        else:
+            self.count += n
+
+    def ordered(self):
+        """Rows oldest first (a view unless the buffer has wrapped)."""
+        end = self.start + self.count
+        if end <= self.capacity:
+            return self.data[self.start:end]
+        return np.concatenate(
+            (self.data[self.start:], self.data[:end - self.capacity]))
+
+    def __len__(self):
+        return self.count
+
+
+class RawTail:
+    """
+    Incremental reader of the binary rawfile at ``path``.
+
+    Call :meth:`start` when ngspice is (re)started and :meth:`poll`
+    periodically; ``names``, ``plotname`` and ``buffer`` describe the plot
+    currently being written. ``generation`` changes whenever a new plot
+    (or a new run) begins.
+    """
+
+    def __init__(self, path, capacity=200000):
+        self.path = path
+        self.capacity = capacity
+        self.generation = 0
+        self.start()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def start(self):
+        """Forget the current file; a rawfile left by the last run is
+        ignored until ngspice rewrites it."""
+        self.stale = self._stat()
+        self._reset(0)
+
+    def _reset(self, offset):
+        self.plot_offset = offset
+        self.data_offset = None
+        self.names = []
+        self.volts_length = 0
+        self.plotname = ""
+        self.is_complex = False
+        self.read_rows = 0
+        self.buffer = None
+        self.generation += 1
+
+    def _header(self, f):
+        f.seek(self.plot_offset)
+        head = f.read(65536)
+        if b"Binary:\n" not in head and b"Values:\n" not in head:
+            return None         # header not completely written yet
+        f.seek(self.plot_offset)
+        try:
+            return _read_raw_header(f)
+        except (PlotDataError, IndexError, ValueError):
+            return None
+
+    def poll(self):
+        """Read newly appended rows; returns how many were added."""
+        stat = self._stat()
+        if stat is None or stat == self.stale:
+            return 0
+        self.stale = None
+        size = stat[1]
+        if size < self.plot_offset or (
+                self.data_offset is not None and
+                size < self.data_offset + self.read_rows * self.stride):
+            # truncated: ngspice started writing the file again
+            self._reset(0)
+
+        added = 0
+        with open(self.path, "rb") as f:
+            while True:
+                parsed = self._header(f)
+                if parsed is None:
+                    return added
+                header, variables, kind = parsed
+                if kind != "binary":
+                    raise PlotDataError(
+                        "Live view needs a binary rawfile")
+
+                if self.data_offset is None:
+                    self._begin_plot(header, variables, f.tell())
+
+                final = int(header.get("no. points", "0") or 0)
+                available = (size - self.data_offset) // self.stride
+                if final:
+                    available = min(available, final)
+                added += self._read_rows(f, available)
+
+                next_plot = self.data_offset + final * self.stride
+                if not final or self.read_rows < final or next_plot >= size:
+                    return added
+                # this analysis is finished and another one follows
+                self._reset(next_plot)
+
+    def _begin_plot(self, header, variables, data_offset):
+        self.data_offset = data_offset
+        self.is_complex = "complex" in header.get("flags", "").lower()
+        self.dtype = np.dtype("<c16" if self.is_complex else "<f8")
+        self.stride = len(variables) * self.dtype.itemsize
+        self.plotname = header.get("plotname", "")
+
+        # voltages first, then currents, like plotData.PlotData
+        kinds = [k.lower() for _, k in variables]
+        self.order = [0] + \
+            [k for k in range(1, len(kinds)) if kinds[k] != "current"] + \
+            [k for k in range(1, len(kinds)) if kinds[k] == "current"]
+        self.names = [variables[k][0] for k in self.order]
+        self.volts_length = sum(1 for k in kinds[1:] if k != "current")
+        self.buffer = RingBuffer(self.capacity, len(variables), self.dtype)
+
+    def _read_rows(self, f, available):
+        new = available - self.read_rows
+        if new <= 0:
+            return 0
+        # only the last `capacity` rows can end up in the buffer
+        skip = max(0, new - self.buffer.capacity)
+        self.read_rows += skip
+        new -= skip
+
+        f.seek(self.data_offset + self.read_rows * self.stride)
+        raw = f.read(new * self.stride)
+        rows = np.frombuffer(raw, dtype=self.dtype,
+                             count=len(raw) // self.dtype.itemsize)
+        rows = rows.reshape(-1, len(self.order))[:, self.order]
+        self.buffer.extend(rows)
+        self.read_rows += len(rows)
+        return len(rows) + skip
+
+    def columns(self):
+        """(x, [y...]) of the buffered points; complex values by magnitude."""
+        data = self.buffer.ordered() if self.buffer is not None else \
+            np.empty((0, 1))
+        if self.is_complex:
+            data = np.abs(data)
+        return data[:, 0], [data[:, k] for k in range(1, data.shape[1])]
@@ -0,0 +1,161 @@
+"""
+Content-addressed cache of simulation results.
+
+The key is a SHA-256 over the final ``.cir.out`` and every file it pulls in
+through ``.include`` / ``.lib`` (followed transitively, as added by
+``Convert.addDeviceLibrary`` / ``addSubcircuit``). The analysis settings are
+part of the netlist, so an unchanged key means ngspice would produce the
+same rawfile again.
+
+Entries live in ``<project>/.simcache/<key>/``: one ``plot<n>.npy`` per
+rawfile plot (loaded memory-mapped) and a ``meta.json`` with the vector
+names. Whole entries are evicted, least recently used first, once the
+cache grows beyond its size limit.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+
+import numpy as np
+
+from .plotData import PlotData, read_raw_file
+
+
+CACHE_DIR = ".simcache"
+_INCLUDE = re.compile(
+    r"^\s*\.(?:include|inc|lib)\s+(\"[^\"]+\"|'[^']+'|\S+)", re.IGNORECASE)
+
+
+def netlist_files(netlist):
+    """The netlist followed by every file it includes, transitively."""
+    files = []
+    seen = set()
+    pending = [os.path.abspath(netlist)]
+    while pending:
+        path = pending.pop(0)
+        if path in seen:
+            continue
+        seen.add(path)
+        files.append(path)
+        try:
+            with open(path, errors="replace") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            continue
+        base = os.path.dirname(path)
+        for line in lines:
+            m = _INCLUDE.match(line)
+            if m:
+                name = m.group(1).strip("\"'")
+                pending.append(os.path.normpath(os.path.join(base, name)))
+    return files
+
+
+def netlist_key(netlist):
+    """Hash of the netlist and its includes (missing files count too)."""
+    digest = hashlib.sha256()
+    for k, path in enumerate(netlist_files(netlist)):
+        # the netlist itself is keyed by content only, so copies of a
+        # project share entries; includes also by where they are
+        digest.update(b"netlist\0" if k == 0 else
+                      path.encode("utf-8", "replace") + b"\0")
+        try:
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        except OSError:
+            digest.update(b"<missing>")
+        digest.update(b"\0")
+    return digest.hexdigest()[:32]
+
+
+def _entry(project_dir, key):
+    return os.path.join(project_dir, CACHE_DIR, key)
+
+
+def has(project_dir, key):
+    return os.path.exists(os.path.join(_entry(project_dir, key), "meta.json"))
+
+
+def lookup(project_dir, key):
+    """The cached plots of `key` (memory-mapped) or None."""
+    entry = _entry(project_dir, key)
+    meta_path = os.path.join(entry, "meta.json")
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        plots = []
+        for k, p in enumerate(meta["plots"]):
+            data = np.load(os.path.join(entry, "plot%d.npy" % k),
+                           mmap_mode="r")
+            plots.append(PlotData(p["scale_name"], p["names"], data,
+                                  volts_length=p["volts_length"],
+                                  plotname=p["plotname"]))
+    except (OSError, ValueError, KeyError):
+        return None
+    # recently used entries are evicted last
+    os.utime(meta_path)
+    return plots
+
+
+def store(project_dir, key, raw, max_bytes=None):
+    """Copy the plots of rawfile `raw` into the cache under `key`."""
+    plots = read_raw_file(raw)
+    root = os.path.join(project_dir, CACHE_DIR)
+    entry = _entry(project_dir, key)
+    tmp = "%s.tmp%d" % (entry, os.getpid())
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    meta = {"created": time.time(), "plots": []}
+    for k, plot in enumerate(plots):
+        np.save(os.path.join(tmp, "plot%d.npy" % k), plot.data)
+        meta["plots"].append({
+            "plotname": plot.plotname,
+            "scale_name": plot.scale_name,
+            "names": plot.names,
+            "volts_length": plot.volts_length,
+        })
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(tmp, entry)
+    if max_bytes is not None:
+        evict(root, max_bytes, keep=key)
+    return plots
+
+
+def _size(path):
+    total = 0
+    for dirpath, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def evict(root, max_bytes, keep=None):
+    """Remove least recently used entries until the cache fits."""
+    entries = []
+    for key in os.listdir(root):
+        path = os.path.join(root, key)
+        try:
+            used = os.path.getmtime(os.path.join(path, "meta.json"))
+        except OSError:
+            used = 0    # leftover of an interrupted store()
+        entries.append((used, key, path, _size(path)))
+
+    total = sum(e[3] for e in entries)
+    for used, key, path, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        if key == keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
@@ -0,0 +1,385 @@
+"""
+Parameter sweeps and Monte-Carlo runs of a converted netlist.
+
+By the time ``<project>.cir.out`` exists, KicadtoNgspice has already replaced
+every ``{param}`` with its ``.param`` value. The runner reads the parameters of
+``<project>.cir`` with :meth:`PrcocessNetlist.readParamInfo` and finds the
+component fields each one was substituted into (same reference, nominal
+value). Every job then gets its own copy of the ``.cir.out``, with those
+fields rewritten, in its own temporary directory.
+
+Jobs run as ``ngspice -b -r`` on a process pool limited to ``workers`` cores,
+and each rawfile is read back in the worker. The results are gathered in a
+:class:`SweepResult`, which is saved as a single ``.npz`` file.
+
+A spec is a dict (or JSON file)::
+
+    {"mode": "sweep",
+     "params": {"rval": ["1k", "2k", "4.7k"],
+                "cval": {"start": "1n", "stop": "100n", "points": 5,
+                         "scale": "log"}}}
+
+    {"mode": "montecarlo", "runs": 200, "seed": 1,
+     "params": {"rval": {"dist": "gauss", "sigma": 0.05},
+                "cval": {"dist": "uniform", "tol": 0.1}}}
+
+A sweep runs the cartesian product of the values. Monte-Carlo deviations
+are relative to the nominal value.
+
+Usage::
+
+    python -m ngspiceSimulation.sweepRunner <project>.cir.out spec.json
+        [-j workers] [-o result.npz] [--keep]
+"""
+import argparse
+import itertools
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from kicadtoNgspice.Processing import PrcocessNetlist
+from ngspiceSimulation.plotData import PlotDataError, read_raw_file
+from ngspiceSimulation.plotExpression import parse_spice_number
+
+
+class SweepError(ValueError):
+    """Raised for specs or netlists the runner cannot use."""
+
+
+_PARAM_USE = re.compile(r"\{([^{}]+)\}")
+# Node (or controlling device) fields that follow an element's name, by its
+# first letter; a substituted value never sits in them.
+_NODE_FIELDS = {
+    "r": 2, "c": 2, "l": 2, "d": 2, "b": 2, "v": 2, "i": 2, "k": 2,
+    "f": 3, "h": 3, "w": 3, "q": 3, "j": 3, "z": 3,
+    "m": 4, "e": 4, "g": 4, "s": 4, "t": 4,
+}
+_INCLUDE = re.compile(r"^(\s*\.(?:include|lib)\s+)(\"?)([^\"\s]+)(\"?)(.*)$",
+                      re.IGNORECASE)
+
+
+def read_params(cir_path):
+    """{name: nominal value} from the .param lines of the KiCad netlist."""
+    obj_proc = PrcocessNetlist()
+    return obj_proc.readParamInfo(obj_proc.readNetlist(cir_path))
+
+
+def bind_params(cir_lines, cirout_lines, param):
+    """
+    Where each parameter ended up in the converted netlist.
+
+    Returns {name: [(line, token), ...]}: positions in `cirout_lines` of the
+    components whose KiCad line used ``{name}`` and whose field now holds
+    the nominal value. Fields are matched from the end of the line and node
+    fields are skipped, so ``r1 1 2 1`` binds the value, not node ``1``.
+    """
+    uses = {}
+    for line in cir_lines:
+        words = line.strip().split()
+        if not words or words[0][0] in ".*+":
+            continue
+        for name in _PARAM_USE.findall(line):
+            if name in param:
+                uses.setdefault(words[0].lower(), []).append(name)
+
+    bindings = {}
+    taken = set()
+    for i, line in enumerate(cirout_lines):
+        words = line.split()
+        if not words:
+            continue
+        first = _NODE_FIELDS.get(words[0][0].lower(), 0)
+        for name in uses.get(words[0].lower(), ()):
+            nominal = param[name].lower()
+            for k in range(len(words) - 1, first, -1):
+                if (i, k) not in taken and words[k].lower() == nominal:
+                    taken.add((i, k))
+                    bindings.setdefault(name, []).append((i, k))
+                    break
+    return bindings
+
+
+def _values(spec):
+    if isinstance(spec, dict):
+        start = parse_spice_number(spec["start"])
+        stop = parse_spice_number(spec["stop"])
+        points = int(spec.get("points", 2))
+        if spec.get("scale", "lin") == "log":
+            return list(np.geomspace(start, stop, points))
+        return list(np.linspace(start, stop, points))
+    if isinstance(spec, (list, tuple)):
+        return [parse_spice_number(v) for v in spec]
+    return [parse_spice_number(spec)]
+
+
+def make_jobs(spec, nominal):
+    """
+    Expand a spec into (names, values) where values is a (jobs x params)
+    float array. `nominal` is {name: value string} from read_params().
+    """
+    params = spec.get("params") or {}
+    unknown = sorted(set(params) - set(nominal))
+    if unknown:
+        raise SweepError("Unknown parameters: " + ", ".join(unknown))
+    names = sorted(params)
+    if not names:
+        raise SweepError("The spec does not vary any parameter")
+
+    try:
+        mode = spec.get("mode", "sweep")
+        if mode == "sweep":
+            axes = [_values(params[n]) for n in names]
+            values = np.array(list(itertools.product(*axes)), dtype=float)
+
+        elif mode == "montecarlo":
+            runs = int(spec.get("runs", 100))
+            rng = np.random.default_rng(spec.get("seed"))
+            values = np.empty((runs, len(names)))
+            for k, n in enumerate(names):
+                dist = params[n]
+                if not isinstance(dist, dict):
+                    raise SweepError(
+                        "Monte-Carlo parameter %s needs {\"sigma\": ...} or "
+                        "{\"dist\": \"uniform\", \"tol\": ...}" % n)
+                base = parse_spice_number(nominal[n])
+                if dist.get("dist", "gauss") == "uniform":
+                    dev = rng.uniform(-1.0, 1.0, runs) * float(dist["tol"])
+                else:
+                    dev = rng.standard_normal(runs) * float(dist["sigma"])
+                values[:, k] = base * (1.0 + dev)
+        else:
+            raise SweepError("Unknown mode '%s'" % mode)
+    except SweepError:
+        raise
+    except (KeyError, TypeError, AttributeError, ValueError) as e:
+        # ValueError: a bad number (ExpressionError is one too)
+        raise SweepError("Bad spec: %s" % e)
+    return names, values
+
+
+def job_netlist(cirout_lines, bindings, names, row, project_dir):
+    """The .cir.out text of one job."""
+    lines = list(cirout_lines)
+    for name, value in zip(names, row):
+        for i, k in bindings[name]:
+            words = lines[i].split()
+            words[k] = "%.9g" % value
+            lines[i] = " ".join(words)
+
+    # jobs run elsewhere; keep .include/.lib pointing at the project
+    for i, line in enumerate(lines):
+        m = _INCLUDE.match(line)
+        if m and not os.path.isabs(m.group(3)):
+            path = os.path.join(project_dir, m.group(3))
+            lines[i] = m.group(1) + m.group(2) + path + m.group(4) + m.group(5)
+    return "\n".join(lines) + "\n"
+
+
+def run_job(index, netlist, timeout=None, keep=False, ngspice="ngspice"):
+    """
+    Run one netlist in a fresh temp directory (process pool worker).
+
+    Returns (index, ok, message, plotname, names, x, data, seconds).
+    """
+    started = time.time()
+    workdir = tempfile.mkdtemp(prefix="esim-sweep-%d-" % index)
+    try:
+        cir = os.path.join(workdir, "job.cir.out")
+        raw = os.path.join(workdir, "job.raw")
+        with open(cir, "w") as f:
+            f.write(netlist)
+        try:
+            proc = subprocess.run(
+                [ngspice, "-b", "-r", raw, cir], cwd=workdir,
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return (index, False, "timed out", "", [], None, None,
+                    time.time() - started)
+        log = proc.stdout.decode("utf-8", "replace")
+        if proc.returncode != 0 or not os.path.exists(raw):
+            tail = "\n".join(log.strip().splitlines()[-5:])
+            return (index, False, "ngspice exit %d: %s" % (
+                proc.returncode, tail), "", [], None, None,
+                time.time() - started)
+
+        try:
+            # the analysis is the last plot (an .op, if any, comes first)
+            plot = read_raw_file(raw)[-1]
+        except PlotDataError as e:
+            return (index, False, str(e), "", [], None, None,
+                    time.time() - started)
+        return (index, True, "", plot.plotname, [plot.scale_name] +
+                plot.names, np.array(plot.x), np.array(plot.data[:, 1:]),
+                time.time() - started)
+    finally:
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+class SweepResult:
+    """
+    Outcome of a sweep: one row of parameter values per job and, for
+    the jobs that succeeded, their scale and data columns.
+    """
+
+    def __init__(self, param_names, values):
+        self.param_names = list(param_names)
+        self.values = np.asarray(values, dtype=float)
+        n = len(self.values)
+        self.ok = np.zeros(n, dtype=bool)
+        self.messages = [""] * n
+        self.seconds = np.zeros(n)
+        self.plotname = ""
+        self.names = []
+        self.x = [None] * n
+        self.data = [None] * n
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, index, ok, message, plotname, names, x, data, seconds):
+        self.ok[index] = ok
+        self.messages[index] = message
+        self.seconds[index] = seconds
+        if ok:
+            self.plotname = self.plotname or plotname
+            self.names = self.names or list(names)
+            self.x[index] = x
+            self.data[index] = data
+
+    def column(self, name):
+        """[array per job] of one vector (None for failed jobs)."""
+        k = self.names.index(name) - 1
+        return [d[:, k] if d is not None else None for d in self.data]
+
+    def save(self, path):
+        arrays = {
+            "param_names": np.array(self.param_names),
+            "values": self.values,
+            "ok": self.ok,
+            "messages": np.array(self.messages),
+            "seconds": self.seconds,
+            "plotname": np.array(self.plotname),
+            "names": np.array(self.names),
+        }
+        for i in range(len(self)):
+            if self.ok[i]:
+                arrays["x_%d" % i] = self.x[i]
+                arrays["data_%d" % i] = self.data[i]
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            result = cls(f["param_names"].tolist(), f["values"])
+            result.ok = f["ok"]
+            result.messages = f["messages"].tolist()
+            result.seconds = f["seconds"]
+            result.plotname = str(f["plotname"])
+            result.names = f["names"].tolist()
+            for i in range(len(result)):
+                if result.ok[i]:
+                    result.x[i] = f["x_%d" % i]
+                    result.data[i] = f["data_%d" % i]
+        return result
+
+
+def run_sweep(cirout_path, spec, workers=None, timeout=None, keep=False,
+              progress=None):
+    """
+    Run every job of `spec` against `cirout_path` and return a SweepResult.
+
+    :param workers: process pool size (default: all cores)
+    :param timeout: seconds before a single ngspice job is killed
+    :param progress: optional callable(done, total, index, ok)
+    """
+    if not cirout_path.endswith(".cir.out"):
+        raise SweepError("Expected a .cir.out netlist")
+    cir_path = cirout_path[:-len(".out")]
+    if not os.path.exists(cir_path):
+        raise SweepError("%s not found; parameters are read from it"
+                         % cir_path)
+
+    nominal = read_params(cir_path)
+    names, values = make_jobs(spec, nominal)
+
+    with open(cir_path) as f:
+        cir_lines = f.read().splitlines()
+    with open(cirout_path) as f:
+        cirout_lines = f.read().splitlines()
+    bindings = bind_params(cir_lines, cirout_lines, nominal)
+    unbound = [n for n in names if n not in bindings]
+    if unbound:
+        raise SweepError(
+            "Could not find where these parameters are used in %s: %s"
+            % (os.path.basename(cirout_path), ", ".join(unbound)))
+
+    project_dir = os.path.dirname(os.path.abspath(cirout_path))
+    result = SweepResult(names, values)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(values)))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(run_job, i, job_netlist(
+                cirout_lines, bindings, names, row, project_dir),
+                timeout, keep)
+            for i, row in enumerate(values)]
+        for done, future in enumerate(as_completed(futures), 1):
+            outcome = future.result()
+            result.add(*outcome)
+            if progress:
+                progress(done, len(futures), outcome[0], outcome[1])
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run a parameter sweep / Monte-Carlo over a .cir.out")
+    parser.add_argument("netlist", help="<project>.cir.out")
+    parser.add_argument("spec", help="JSON spec file")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="parallel ngspice jobs (default: all cores)")
+    parser.add_argument("-o", "--output", default=None,
+                        help="result file (default: <project>_sweep.npz)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="seconds per job")
+    parser.add_argument("--keep", action="store_true",
+                        help="keep the per-job temp directories")
+    args = parser.parse_args(argv)
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+    output = args.output or \
+        args.netlist[:-len(".cir.out")] + "_sweep.npz"
+
+    def progress(done, total, index, ok):
+        print("[%d/%d] job %d %s" % (done, total, index,
+                                     "ok" if ok else "FAILED"), flush=True)
+
+    started = time.time()
+    try:
+        result = run_sweep(args.netlist, spec, args.workers, args.timeout,
+                           args.keep, progress)
+    except SweepError as e:
+        print("Error:", e)
+        return 1
+    result.save(output)
+
+    for i in np.flatnonzero(~result.ok):
+        print("job %d failed: %s" % (i, result.messages[i]))
+    print("%d/%d jobs ok in %.1f s -> %s" % (
+        result.ok.sum(), len(result), time.time() - started, output))
+    return 0 if result.ok.all() else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""
+Tests for the ngspice output readers (run from ``src``)::
+
+    python -m unittest ngspiceSimulation.test_plotData
+"""
+import os
+import unittest
+
+from ngspiceSimulation.plotData import read_print_dumps
+
+
+LIBRARY = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       os.pardir, os.pardir, "library", "SubcircuitLibrary")
+
+
+class PrintDumpTest(unittest.TestCase):
+
+    def check(self, project, voltages, currents):
+        plot = read_print_dumps(os.path.join(LIBRARY, project))
+        self.assertEqual(len(plot.names), voltages + currents)
+        self.assertEqual(plot.volts_length, voltages)
+        self.assertEqual(plot.data.shape, (len(plot), 1 + len(plot.names)))
+        # one column per name, even where ngspice truncated names alike
+        self.assertEqual(len(set(plot.names)), len(plot.names))
+
+    def test_truncated_names_are_kept(self):
+        self.check("9348", 95, 13)
+        self.check("LOG_100", 107, 6)
+        self.check("Logic_Gates", 15, 7)
+
+    def test_repeats_are_different_vectors(self):
+        plot = read_print_dumps(os.path.join(LIBRARY, "Logic_Gates"))
+        first = plot.column("xu1.net-_m3-pad")
+        second = plot.column("xu1.net-_m3-pad#2")
+        self.assertFalse((first == second).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Tests for the "Plot Function" expression compiler (run from ``src``)::
+
+    python -m unittest ngspiceSimulation.test_plotExpression
+"""
+import unittest
+
+import numpy as np
+
+from ngspiceSimulation.plotData import PlotData
+from ngspiceSimulation.plotExpression import (
+    ExpressionError, compile_expression, parse_spice_number)
+
+
+NAMES = ["v(in)", "v(out)", "net-_r1-pad1_", "v1#branch"]
+
+
+def dataset():
+    t = np.linspace(0.0, 1.0, 5)
+    data = np.column_stack([t, t + 1, 2 * t, t * t, -t])
+    return PlotData("time", NAMES, data, volts_length=3)
+
+
+def evaluate(text):
+    return compile_expression(text, NAMES).evaluate(dataset())
+
+
+class PlotExpressionTest(unittest.TestCase):
+
+    def test_operators(self):
+        t = dataset().x
+        x, y = evaluate("v(out) - v(in) * 2 ^ 2 / 4")
+        np.testing.assert_allclose(x, t)
+        np.testing.assert_allclose(y, 2 * t - (t + 1))
+        _, y = evaluate("-(v(in) + 1) ** 2")
+        np.testing.assert_allclose(y, -(t + 2) ** 2)
+
+    def test_names_and_functions(self):
+        t = dataset().x
+        _, y = evaluate("abs(v1#branch) + net-_r1-pad1_")
+        np.testing.assert_allclose(y, t + t * t)
+        _, y = evaluate("deriv(v(out))")
+        np.testing.assert_allclose(y, np.full_like(t, 2.0))
+
+    def test_suffixes(self):
+        self.assertAlmostEqual(parse_spice_number("2.2u"), 2.2e-6)
+        self.assertAlmostEqual(parse_spice_number("10meg"), 1e7)
+        self.assertAlmostEqual(parse_spice_number("-1kOhm"), -1e3)
+        _, y = evaluate("v(in) * 1k")
+        np.testing.assert_allclose(y, (dataset().x + 1) * 1e3)
+
+    def test_vs(self):
+        t = dataset().x
+        expr = compile_expression("v(in) + 1 vs v(out)", NAMES)
+        self.assertTrue(expr.has_vs)
+        self.assertEqual(expr.x_text, "v(in) + 1")
+        self.assertEqual(expr.y_text, "v(out)")
+        x, y = expr.evaluate(dataset())
+        np.testing.assert_allclose(x, t + 2)
+        np.testing.assert_allclose(y, 2 * t)
+        self.assertIsNone(compile_expression("v(in)", NAMES).x_text)
+
+    def test_rejects_python(self):
+        for text in ("__import__('os')", "v(in).real", "lambda: 1",
+                     "v(in); 1", "open(v(in))", "v(in) +", ""):
+            with self.assertRaises(ExpressionError, msg=text):
+                compile_expression(text, NAMES)
+        with self.assertRaises(ExpressionError):
+            compile_expression("1 + 2", NAMES)
+
+
+if __name__ == "__main__":
+    unittest.main()